@@ -1,87 +1,116 @@
-from flask import Flask, jsonify
+import os
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .models import db
 from .routes import bp as routes_bp
-from flask_swagger import swagger
-from flask_swagger_ui import get_swaggerui_blueprint
+from .docs import register_swagger
+from .cache import init_response_cache
+from .migrations import register_migrations, setup_database
+from .stats import register_statistics
+from .config import database_config, configure_sqlite, env_bool, env_int
+from .instrumentation import register_instrumentation
+from .logs import configure_logging, restart_listener
+from .serialization import create_json_provider
+from .allocation import init_allocation, reseed
+from .jobs import register_jobs
+from .idempotency import register_idempotency, IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_KEYS
+from .admission import init_admission
+
+TEST_CONFIG = {
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    # Sin registros de acceso ni de errores en la salida de las pruebas
+    'LOG_LEVEL': 'CRITICAL'
+}
+
+def load_config(environ=os.environ):
+    """
+        Configuración de la aplicación a partir de variables de entorno.
+        :param environ: Variables de entorno
+        :return: Diccionario de configuración
+    """
+    config = database_config(environ)
+    config.update({
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'DB_SETUP_ON_STARTUP': env_bool(environ, 'DB_SETUP_ON_STARTUP', True),
+        'SWAGGER_SPEC_PATH': environ.get('SWAGGER_SPEC_PATH'),
+        'RESPONSE_CACHE_URL': environ.get('RESPONSE_CACHE_URL'),
+        'PROFILE_THRESHOLD_MS': environ.get('PROFILE_THRESHOLD_MS'),
+        'PROFILE_SAMPLE_RATE': environ.get('PROFILE_SAMPLE_RATE'),
+        'PROFILE_DIR': environ.get('PROFILE_DIR'),
+        'LOG_LEVEL': environ.get('LOG_LEVEL'),
+        'LOG_LEVELS': environ.get('LOG_LEVELS'),
+        'JSON_PROVIDER': environ.get('JSON_PROVIDER'),
+        'GRIMORIO_SEED': environ.get('GRIMORIO_SEED'),
+        'GRIMORIO_QUOTAS': environ.get('GRIMORIO_QUOTAS'),
+        'ASYNC_APPROVALS': env_bool(environ, 'ASYNC_APPROVALS', False),
+        'IDEMPOTENCY_TTL': env_int(environ, 'IDEMPOTENCY_TTL', IDEMPOTENCY_TTL),
+        'IDEMPOTENCY_MAX_KEYS': env_int(environ, 'IDEMPOTENCY_MAX_KEYS', IDEMPOTENCY_MAX_KEYS),
+        'ADMISSION_CONTROL': env_bool(environ, 'ADMISSION_CONTROL', False),
+        'ADMISSION_STORE': environ.get('ADMISSION_STORE'),
+        'ADMISSION_RATE_LIMITS': environ.get('ADMISSION_RATE_LIMITS'),
+        'ADMISSION_CONCURRENCY': environ.get('ADMISSION_CONCURRENCY'),
+        'ADMISSION_CLIENT_HEADER': environ.get('ADMISSION_CLIENT_HEADER'),
+        'TRUSTED_PROXIES': env_int(environ, 'TRUSTED_PROXIES', 0)
+    })
+    return config
 
 def create_app(test_config=None):
+    """
+        Crea la aplicación.
+
+        Sin ``test_config`` la configuración se lee de las variables de entorno.
+        Con ``DB_SETUP_ON_STARTUP`` (activo por defecto) se crean las tablas y
+        se aplican las migraciones pendientes; gunicorn lo desactiva en los
+        workers y prepara el esquema una sola vez al arrancar (ver gunicorn.conf.py).
+        :param test_config: Configuración que reemplaza a las variables de entorno
+        :return: Aplicación Flask
+    """
     app = Flask(__name__)
+    app.config.from_mapping(test_config if test_config else load_config())
 
-    if test_config:
-        app.config.from_mapping(test_config)
-    else:
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
-        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
+    configure_logging(app)
+    # Detrás de proxies de confianza, la dirección del cliente es la que añadió el último de ellos
+    if app.config.get('TRUSTED_PROXIES'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+    app.json = create_json_provider(app)
     db.init_app(app)
 
     with app.app_context():
-        db.create_all()
-
+        configure_sqlite(app, db.engine)
+        register_instrumentation(app, db.engine)
+        if app.config.get('DB_SETUP_ON_STARTUP', True):
+            setup_database()
+
+    register_migrations(app)
+    register_statistics(app)
+    register_jobs(app)
+    register_idempotency(app)
+    init_allocation(app)
+    init_admission(app)
+    init_response_cache(app)
     app.register_blueprint(routes_bp)
 
     # Configuración de Swagger
-    @app.route("/apidocs/swagger.json")
-    def create_swagger_spec():
-        swag = swagger(app)
-        swag['info'] = {
-            'title': 'API de la Academia de Magia del Reino del Trébol',
-            'version': '1.0',
-            'description': "En el Reino del Trébol, el Rey Mago necesita un sistema para la academia de magia que administre el registro de solicitud de estudiantes y la asignación aleatoria de sus Grimorios. Los Grimorios se clasifican según el tipo de trébol en la portada, y los estudiantes según sus afinidades mágicas específicas."
-        }
-        return jsonify(swag)
-
-    SWAGGER_URL = '/apidocs'
-    API_URL = '/apidocs/swagger.json'
-
-    swaggerui_blueprint = get_swaggerui_blueprint(
-        SWAGGER_URL,
-        API_URL,
-        config={
-            'app_name': "Academia de Magia - Swagger"
-        }
-    )
-    app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
+    register_swagger(app)
 
     return app
 
 def create_app_test():
-    app = Flask(__name__)
-
-    app.config.from_mapping({
-            'TESTING': True,
-            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
-            'SQLALCHEMY_TRACK_MODIFICATIONS': False
-    })
-
-    db.init_app(app)
-
+    return create_app(TEST_CONFIG)
+
+def after_fork(app):
+    """
+        Prepara en un worker una aplicación creada antes del fork (gunicorn con ``preload_app``).
+
+        Las conexiones del pool heredadas del proceso padre se descartan sin
+        cerrarlas (siguen siendo del padre), se vuelve a arrancar el hilo de
+        los registros, que no sobrevive al fork, y el sorteo de Grimorios se
+        vuelve a sembrar con el ``WORKER_ID`` del worker.
+        :param app: Aplicación Flask
+    """
     with app.app_context():
-        db.create_all()
-
-    app.register_blueprint(routes_bp)
-
-    # Configuración de Swagger
-    @app.route("/apidocs/swagger.json")
-    def create_swagger_spec():
-        swag = swagger(app)
-        swag['info'] = {
-            'title': 'API de la Academia de Magia del Reino del Trébol',
-            'version': '1.0',
-            'description': "En el Reino del Trébol, el Rey Mago necesita un sistema para la academia de magia que administre el registro de solicitud de estudiantes y la asignación aleatoria de sus Grimorios. Los Grimorios se clasifican según el tipo de trébol en la portada, y los estudiantes según sus afinidades mágicas específicas."
-        }
-        return jsonify(swag)
-
-    SWAGGER_URL = '/apidocs'
-    API_URL = '/apidocs/swagger.json'
-
-    swaggerui_blueprint = get_swaggerui_blueprint(
-        SWAGGER_URL,
-        API_URL,
-        config={
-            'app_name': "Academia de Magia - Swagger"
-        }
-    )
-    app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
-
-    return app
+        db.engine.dispose(close=False)
+    restart_listener()
+    reseed(app)
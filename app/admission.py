@@ -0,0 +1,271 @@
+"""
+    Control de admisión: límite de peticiones por cliente y de peticiones
+    simultáneas por ruta, compartidos entre los workers de gunicorn.
+
+    Cada regla se indica como "MÉTODO /ruta" (la regla de Flask, por ejemplo
+    ``GET /solicitudes``). Los límites por cliente son cubetas de tokens
+    (peticiones por segundo y ráfaga máxima) y los de concurrencia cuentan las
+    peticiones en curso de la ruta en todos los workers. Una petición que
+    supera cualquiera de ellos recibe 429 con la cabecera ``Retry-After``.
+
+    Con ``ADMISSION_STORE`` el estado se guarda en un archivo SQLite local que
+    comparten todos los procesos; sin él, cada proceso lleva sus propios contadores.
+"""
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from flask import g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# Peticiones por segundo y ráfaga de cada cliente en los listados y exportaciones
+DEFAULT_RATE_LIMITS = {
+    'GET /solicitudes': (5.0, 20),
+    'GET /asignaciones': (5.0, 20),
+    'GET /solicitudes/export': (0.1, 2),
+    'GET /asignaciones/export': (0.1, 2)
+}
+
+# Peticiones simultáneas de cada ruta entre todos los workers
+DEFAULT_CONCURRENCY = {
+    'GET /solicitudes': 4,
+    'GET /asignaciones': 4,
+    'GET /solicitudes/export': 1,
+    'GET /asignaciones/export': 1
+}
+
+# Segundos tras los que se libera el lugar de una petición que no terminó (worker detenido)
+ADMISSION_SLOT_TIMEOUT = 300
+
+# Máximo de cubetas en memoria y operaciones por proceso entre dos purgas del archivo SQLite
+ADMISSION_MAX_BUCKETS = 10000
+ADMISSION_PURGE_EVERY = 10000
+
+
+def refill(tokens, updated, rate, burst, now):
+    """
+        Tokens disponibles en una cubeta tras recargarla hasta ``now``.
+    """
+    return min(burst, tokens + max(0.0, now - updated) * rate)
+
+
+class MemoryAdmissionStore:
+    """
+        Estado del control de admisión en memoria del proceso.
+    """
+
+    def __init__(self, max_buckets=ADMISSION_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._slots = Counter()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = refill(tokens, updated, rate, burst, now)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            return allowed, tokens
+
+    def acquire(self, route, limit, now):
+        with self._lock:
+            if self._slots[route] >= limit:
+                return None
+            self._slots[route] += 1
+            return route
+
+    def release(self, route, token):
+        with self._lock:
+            self._slots[route] -= 1
+
+
+class SQLiteAdmissionStore:
+    """
+        Estado del control de admisión en un archivo SQLite compartido entre procesos.
+
+        Cada operación es una única sentencia, atómica en SQLite, por lo que
+        no hacen falta bloqueos entre workers. El archivo sólo guarda estado
+        efímero: se escribe sin sincronizar a disco.
+    """
+
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS token_bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, '
+        'updated REAL NOT NULL, allowed INTEGER NOT NULL)',
+        'CREATE TABLE IF NOT EXISTS slot (token TEXT PRIMARY KEY, route TEXT NOT NULL, expires REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_slot_route ON slot (route, expires)'
+    ]
+
+    # Recarga la cubeta y consume un token si hay al menos uno
+    TAKE = '''
+        INSERT INTO token_bucket (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            allowed = min(:burst, tokens + max(0, :now - updated) * :rate) >= 1,
+            tokens = min(:burst, tokens + max(0, :now - updated) * :rate)
+                     - (min(:burst, tokens + max(0, :now - updated) * :rate) >= 1),
+            updated = :now
+        RETURNING allowed, tokens
+    '''
+
+    ACQUIRE = '''
+        INSERT INTO slot (token, route, expires)
+        SELECT :token, :route, :expires
+        WHERE (SELECT count(*) FROM slot WHERE route = :route AND expires > :now) < :limit
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._operations = 0
+        connection = sqlite3.connect(path)
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def connection(self):
+        # Una conexión por hilo; tras un fork el proceso hijo abre las suyas
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=5)
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def take(self, key, rate, burst, now):
+        allowed, tokens = self.connection().execute(
+            self.TAKE, {'key': key, 'rate': rate, 'burst': burst, 'now': now}).fetchone()
+        self._operations += 1
+        if self._operations % ADMISSION_PURGE_EVERY == 0:
+            self.purge(now)
+        return bool(allowed), tokens
+
+    def acquire(self, route, limit, now):
+        token = f'{random.getrandbits(64):016x}'
+        cursor = self.connection().execute(self.ACQUIRE, {'token': token, 'route': route, 'now': now, 'limit': limit,
+                                                          'expires': now + ADMISSION_SLOT_TIMEOUT})
+        return token if cursor.rowcount == 1 else None
+
+    def release(self, route, token):
+        self.connection().execute('DELETE FROM slot WHERE token = ?', (token,))
+
+    def purge(self, now):
+        """
+            Elimina los lugares vencidos y las cubetas inactivas desde hace una hora (llenas de nuevo).
+        """
+        connection = self.connection()
+        connection.execute('DELETE FROM slot WHERE expires <= ?', (now,))
+        connection.execute('DELETE FROM token_bucket WHERE updated < ?', (now - 3600,))
+
+
+def parse_rules(value, parse_value):
+    """
+        Convierte "GET /solicitudes=5/20,GET /asignaciones=5/20" en un diccionario regla -> valor.
+    """
+    rules = {}
+    for item in (value or '').split(','):
+        if item.strip():
+            rule, _, limit = item.rpartition('=')
+            method, _, path = rule.strip().partition(' ')
+            if not path.startswith('/'):
+                raise ValueError(f'Regla de admisión inválida: {item.strip()}')
+            rules[f'{method.upper()} {path.strip()}'] = parse_value(limit.strip())
+    return rules
+
+def parse_rate(value):
+    rate, _, burst = value.partition('/')
+    rate = float(rate)
+    burst = int(burst) if burst else max(1, math.ceil(rate))
+    if rate <= 0 or burst < 1:
+        raise ValueError('Los límites de ADMISSION_RATE_LIMITS deben ser positivos')
+    return rate, burst
+
+def parse_concurrency(value):
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('Los límites de ADMISSION_CONCURRENCY deben ser positivos')
+    return limit
+
+def too_many_requests(retry_after):
+    response = jsonify({'message': 'Demasiadas peticiones, intente más tarde'})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, 429
+
+def client_id(header):
+    """
+        Identifica al cliente por su dirección o por la cabecera configurada.
+
+        Los primeros valores de una cabecera como X-Forwarded-For los elige el
+        propio cliente, por lo que se usa el último, el que añadió el proxy de
+        confianza. Para X-Forwarded-For es preferible ``TRUSTED_PROXIES``, que
+        deja en la dirección del cliente la que vio el primer proxy de confianza.
+    """
+    value = request.headers.get(header) if header else None
+    return value.rsplit(',', 1)[-1].strip() if value else request.remote_addr
+
+def init_admission(app):
+    """
+        Registra el control de admisión si ``ADMISSION_CONTROL`` está activo.
+
+        ``ADMISSION_RATE_LIMITS`` ("GET /solicitudes=5/20") y
+        ``ADMISSION_CONCURRENCY`` ("GET /solicitudes=4") reemplazan los
+        límites por defecto de las reglas que indican; ``ADMISSION_CLIENT_HEADER``
+        indica la cabecera, escrita por un proxy de confianza, que identifica al
+        cliente en lugar de su dirección. Si el estado compartido
+        falla, las peticiones se admiten.
+        :param app: Aplicación Flask
+    """
+    if not app.config.get('ADMISSION_CONTROL'):
+        return
+
+    path = app.config.get('ADMISSION_STORE')
+    store = SQLiteAdmissionStore(path) if path else MemoryAdmissionStore()
+    rate_limits = {**DEFAULT_RATE_LIMITS, **parse_rules(app.config.get('ADMISSION_RATE_LIMITS'), parse_rate)}
+    concurrency = {**DEFAULT_CONCURRENCY, **parse_rules(app.config.get('ADMISSION_CONCURRENCY'), parse_concurrency)}
+    header = app.config.get('ADMISSION_CLIENT_HEADER')
+    app.extensions['admission'] = store
+
+    @app.before_request
+    def admit_request():
+        if request.url_rule is None:
+            return None
+        rule = f'{request.method} {request.url_rule.rule}'
+        rate_limit = rate_limits.get(rule)
+        limit = concurrency.get(rule)
+        if rate_limit is None and limit is None:
+            return None
+        try:
+            now = time.time()
+            if rate_limit is not None:
+                allowed, tokens = store.take(f'{client_id(header)} {rule}', *rate_limit, now)
+                if not allowed:
+                    return too_many_requests((1 - tokens) / rate_limit[0])
+            if limit is not None:
+                token = store.acquire(rule, limit, now)
+                if token is None:
+                    return too_many_requests(1)
+                g.admission_slot = (rule, token)
+        except Exception:
+            logger.exception('Error en el control de admisión')
+        return None
+
+    @app.teardown_request
+    def release_slot(error=None):
+        slot = g.pop('admission_slot', None)
+        if slot is not None:
+            try:
+                store.release(*slot)
+            except Exception:
+                logger.exception('Error al liberar el lugar del control de admisión')
@@ -0,0 +1,189 @@
+import os
+import random
+from collections import Counter
+from flask import current_app
+from .models import db, Statistic
+from .stats import CLOVER, bump_statistics, ensure_statistics
+
+# Un trébol de una o dos hojas es común, uno de tres es poco habitual,
+# uno de cuatro es inusual, y uno de cinco hojas muy raro.
+CLOVERS = {
+    'Trébol una hoja': 4,
+    'Trébol dos hojas': 3,
+    'Trébol tres hojas': 2,
+    'Trébol cuatro hojas': 1,
+    'Trébol cinco hojas': 0.5
+}
+
+
+class GrimorioStockExhausted(Exception):
+    """
+        No quedan Grimorios de ningún tipo de trébol dentro de las cuotas.
+    """
+
+
+class AliasSampler:
+    """
+        Sorteo ponderado en O(1) por elemento con el método de alias (Vose).
+
+        La tabla se construye una sola vez a partir de las ponderaciones; cada
+        sorteo usa un único número aleatorio para elegir una columna y decidir
+        entre su valor y su alias.
+    """
+
+    def __init__(self, weights, rng=None):
+        if not weights or any(weight <= 0 for weight in weights.values()):
+            raise ValueError('Las ponderaciones deben ser positivas')
+        self.weights = dict(weights)
+        self.values = list(weights)
+        self.random = rng if rng is not None else random.Random()
+
+        size = len(self.values)
+        total = sum(weights.values())
+        scaled = [weights[value] * size / total for value in self.values]
+        self.probability = [1.0] * size
+        self.alias = list(range(size))
+        small = [index for index, weight in enumerate(scaled) if weight < 1]
+        large = [index for index, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1 - scaled[less]
+            (small if scaled[more] < 1 else large).append(more)
+        # Los restos por redondeo quedan con probabilidad 1
+
+    def draw(self, k=1):
+        """
+            Sortea ``k`` valores.
+            :return: Lista de valores
+        """
+        values, probability, alias = self.values, self.probability, self.alias
+        size = len(values)
+        rand = self.random.random
+        draws = []
+        for _ in range(k):
+            position = rand() * size
+            column = int(position)
+            draws.append(values[column] if position - column < probability[column] else values[alias[column]])
+        return draws
+
+    def without(self, excluded):
+        """
+            Sorteador con los mismos pesos y generador, sin los valores excluidos.
+            :return: AliasSampler, o None si no queda ningún valor
+        """
+        weights = {value: weight for value, weight in self.weights.items() if value not in excluded}
+        return AliasSampler(weights, self.random) if weights else None
+
+
+def parse_quotas(value):
+    """
+        Convierte ``GRIMORIO_QUOTAS`` ("Trébol cinco hojas=10,Trébol cuatro hojas=100") en un diccionario.
+    """
+    if isinstance(value, dict):
+        quotas = dict(value)
+    else:
+        quotas = {}
+        for item in (value or '').split(','):
+            if item.strip():
+                clover_type, _, quota = item.rpartition('=')
+                quotas[clover_type.strip()] = int(quota)
+    unknown = set(quotas) - set(CLOVERS)
+    if unknown:
+        raise ValueError(f'Tipos de trébol desconocidos en GRIMORIO_QUOTAS: {", ".join(sorted(unknown))}')
+    if any(quota < 0 for quota in quotas.values()):
+        raise ValueError('Las cuotas de GRIMORIO_QUOTAS no pueden ser negativas')
+    return quotas
+
+def worker_seed(seed, worker=None):
+    """
+        Semilla del generador de un worker: la misma semilla y el mismo worker
+        reproducen la misma secuencia de tréboles, y cada worker tiene la suya.
+    """
+    if seed in (None, ''):
+        return None
+    return f'{seed}:{worker if worker is not None else os.environ.get("WORKER_ID", "0")}'
+
+def init_allocation(app):
+    """
+        Prepara el sorteo de Grimorios de la aplicación.
+
+        ``GRIMORIO_SEED`` fija la semilla (combinada con ``WORKER_ID``, que
+        gunicorn.conf.py asigna a cada worker) para poder auditar los sorteos;
+        sin semilla se usa la entropía del sistema. ``GRIMORIO_QUOTAS`` limita
+        los Grimorios existentes de cada tipo de trébol.
+        :param app: Aplicación Flask
+    """
+    app.extensions['grimorio_quotas'] = parse_quotas(app.config.get('GRIMORIO_QUOTAS'))
+    app.extensions['grimorio_sampler'] = AliasSampler(CLOVERS, random.Random(worker_seed(app.config.get('GRIMORIO_SEED'))))
+
+def reseed(app, worker=None):
+    """
+        Vuelve a sembrar el generador, por ejemplo tras el fork de un worker.
+    """
+    app.extensions['grimorio_sampler'].random.seed(worker_seed(app.config.get('GRIMORIO_SEED'), worker))
+
+def reserve(clover_type, count, quota):
+    """
+        Reserva hasta ``count`` Grimorios de un tipo dentro de su cuota.
+
+        El contador de estadísticas del tipo de trébol es el stock consumido: la
+        reserva es un UPDATE condicional sobre esa única fila, por lo que nunca
+        se cuentan las tablas y dos transacciones concurrentes no pueden
+        superar la cuota.
+        :return: Número de Grimorios reservados (de 0 a ``count``)
+    """
+    ensure_statistics([(CLOVER, clover_type)])
+    counter = db.select(Statistic.count).where(Statistic.category == CLOVER, Statistic.key == clover_type)
+    while count > 0:
+        result = db.session.execute(db.update(Statistic)
+                                    .where(Statistic.category == CLOVER, Statistic.key == clover_type,
+                                           Statistic.count + count <= quota)
+                                    .values(count=Statistic.count + count)
+                                    .execution_options(synchronize_session=False))
+        if result.rowcount:
+            return count
+        # No alcanza para todos: se reserva lo que queda según el contador actual
+        count = min(count, quota - db.session.execute(counter).scalar_one())
+    return 0
+
+def allocate_clover_types(k):
+    """
+        Sortea ``k`` tipos de trébol y los descuenta del stock.
+
+        Los tipos sin cuota sólo incrementan su contador; los tipos con cuota
+        se reservan con ``reserve`` y, si se agotan, los sorteos sobrantes se
+        repiten entre los tipos que aún tienen stock. No confirma la
+        transacción: el llamador decide cuándo hacer commit.
+        :param k: Número de Grimorios a asignar
+        :return: Lista de tipos de trébol, en el orden del sorteo
+    """
+    sampler = current_app.extensions['grimorio_sampler']
+    quotas = current_app.extensions['grimorio_quotas']
+    assigned = []
+    unlimited = Counter()
+    exhausted = {clover_type for clover_type, quota in quotas.items() if quota == 0}
+
+    while len(assigned) < k:
+        if exhausted:
+            sampler = sampler.without(exhausted)
+            if sampler is None:
+                raise GrimorioStockExhausted()
+        drawn = sampler.draw(k - len(assigned))
+        granted = {}
+        for clover_type, count in Counter(drawn).items():
+            if clover_type in quotas:
+                granted[clover_type] = reserve(clover_type, count, quotas[clover_type])
+                if granted[clover_type] < count:
+                    exhausted.add(clover_type)
+            else:
+                granted[clover_type] = count
+                unlimited[clover_type] += count
+        for clover_type in drawn:
+            if granted[clover_type]:
+                granted[clover_type] -= 1
+                assigned.append(clover_type)
+
+    bump_statistics({(CLOVER, clover_type): count for clover_type, count in unlimited.items()})
+    return assigned
@@ -0,0 +1,215 @@
+import hashlib
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, make_response, request
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import db, CacheCounter
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Segundos que una respuesta cacheada se considera vigente y máximo de respuestas en memoria
+RESPONSE_CACHE_TTL = 30
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+
+# Cabeceras de la respuesta original que se conservan en la caché
+CACHED_HEADERS = ('X-Next-Cursor', 'Link')
+
+
+class MemoryCache:
+    """
+        Caché en memoria del proceso con expiración (TTL) y desalojo LRU.
+
+        Los contadores (usados como generación de la caché) se guardan aparte
+        para que el desalojo LRU nunca los reinicie.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisCache:
+    """
+        Caché compartida entre procesos sobre cualquier servidor compatible con Redis.
+
+        El desalojo LRU queda a cargo del servidor (``maxmemory-policy allkeys-lru``).
+    """
+
+    def __init__(self, url, prefix='academia:'):
+        if redis is None:
+            raise RuntimeError('RESPONSE_CACHE_URL requiere el paquete redis')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+
+    def counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+
+class DatabaseCounters:
+    """
+        Contadores de la caché guardados en la base de datos.
+
+        Con la caché en memoria cada proceso guarda sus propias respuestas,
+        pero la generación se lee de la base de datos: una escritura hecha en
+        cualquier worker de gunicorn (o en el worker de tareas) invalida las
+        respuestas cacheadas en todos ellos. Leerla es una consulta por clave primaria.
+    """
+
+    def counter(self, key):
+        return db.session.execute(db.select(CacheCounter.value).where(CacheCounter.key == key)).scalar() or 0
+
+    def incr(self, key):
+        insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+        statement = insert(CacheCounter).values(key=key, value=1)
+        db.session.execute(statement.on_conflict_do_update(index_elements=[CacheCounter.key],
+                                                           set_={'value': CacheCounter.value + 1}))
+        db.session.commit()
+
+
+class ResponseCache:
+    """
+        Caché de respuestas de los listados.
+
+        Cada clave incluye la generación actual de la caché; las escrituras la
+        incrementan, con lo que todas las respuestas anteriores dejan de usarse
+        sin tener que recorrerlas.
+    """
+    GENERATION_KEY = 'listings:generation'
+
+    def __init__(self, backend, ttl=RESPONSE_CACHE_TTL, counters=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.counters = counters if counters is not None else backend
+
+    def key(self, path):
+        return f'listings:{self.counters.counter(self.GENERATION_KEY)}:{path}'
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, entry):
+        self.backend.set(key, entry, self.ttl)
+
+    def invalidate(self):
+        self.counters.incr(self.GENERATION_KEY)
+
+
+def init_response_cache(app):
+    """
+        Configura la caché de respuestas según ``RESPONSE_CACHE_*``.
+        :param app: Aplicación Flask
+    """
+    if not app.config.get('RESPONSE_CACHE_ENABLED', True):
+        return
+
+    url = app.config.get('RESPONSE_CACHE_URL')
+    ttl = app.config.get('RESPONSE_CACHE_TTL', RESPONSE_CACHE_TTL)
+    if url:
+        cache = ResponseCache(RedisCache(url), ttl)
+    else:
+        # Las respuestas quedan en el proceso, pero la generación se comparte a través de la base de datos
+        cache = ResponseCache(MemoryCache(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', RESPONSE_CACHE_MAX_ENTRIES)),
+                              ttl, DatabaseCounters())
+    app.extensions['response_cache'] = cache
+
+def invalidate_listings():
+    """
+        Descarta las respuestas cacheadas de los listados tras una escritura.
+
+        Se llama después de confirmar la escritura: si la invalidación falla
+        (por ejemplo, la base de datos está bloqueada) sólo se registra el
+        error y los listados se actualizan al expirar su TTL, en lugar de
+        responder 500 a una escritura que ya se guardó.
+    """
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        try:
+            cache.invalidate()
+        except Exception:
+            logger.exception('Error al invalidar la caché de listados')
+            db.session.rollback()
+
+def cached_listing(view):
+    """
+        Decorador que cachea las respuestas 200 de un listado.
+
+        La respuesta incluye un ETag calculado sobre su contenido; si el
+        cliente lo envía en ``If-None-Match`` y la respuesta sigue en caché se
+        devuelve 304 sin consultar la base de datos.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions.get('response_cache')
+        # La clave se calcula antes de consultar para que una escritura concurrente
+        # deje la respuesta guardada bajo la generación anterior
+        key = cache.key(request.full_path) if cache is not None else None
+        entry = cache.get(key) if cache is not None else None
+
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            entry = {
+                'body': body,
+                'mimetype': response.mimetype,
+                'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+                'etag': hashlib.sha256(body).hexdigest()
+            }
+            if cache is not None:
+                cache.set(key, entry)
+
+        response = Response(entry['body'], mimetype=entry['mimetype'], headers=entry['headers'])
+        response.set_etag(entry['etag'])
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    return wrapper
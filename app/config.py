@@ -0,0 +1,92 @@
+import os
+from sqlalchemy import event
+
+DEFAULT_DATABASE_URL = 'sqlite:///database.db'
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS_LEVELS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def env_int(environ, name, default):
+    """
+        Lee una variable de entorno entera.
+    """
+    value = environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+def env_bool(environ, name, default):
+    """
+        Lee una variable de entorno booleana (1/true/yes/on).
+    """
+    value = environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def database_config(environ=os.environ):
+    """
+        Configuración de la base de datos a partir de variables de entorno.
+
+        DATABASE_URL           URL de SQLAlchemy (por defecto sqlite:///database.db;
+                               se acepta el esquema postgres:// de algunos proveedores)
+        DB_POOL_SIZE           Conexiones permanentes por worker (5)
+        DB_MAX_OVERFLOW        Conexiones adicionales en picos (10)
+        DB_POOL_RECYCLE        Segundos tras los que se renueva una conexión (1800)
+        DB_POOL_PRE_PING       Verificar la conexión antes de usarla (true)
+        DB_STATEMENT_TIMEOUT   Tiempo máximo por sentencia en ms, sólo PostgreSQL (0 = sin límite)
+        SQLITE_BUSY_TIMEOUT    Espera máxima por el bloqueo del archivo en ms (5000)
+        SQLITE_JOURNAL_MODE    Modo de journal de SQLite (WAL)
+        SQLITE_SYNCHRONOUS     Nivel de sincronización de SQLite (NORMAL)
+        :param environ: Variables de entorno
+        :return: Diccionario para ``app.config``
+    """
+    url = environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+
+    options = {'pool_pre_ping': env_bool(environ, 'DB_POOL_PRE_PING', True)}
+    in_memory = url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') == 'sqlite:')
+    if not in_memory:
+        options['pool_size'] = env_int(environ, 'DB_POOL_SIZE', 5)
+        options['max_overflow'] = env_int(environ, 'DB_MAX_OVERFLOW', 10)
+        options['pool_recycle'] = env_int(environ, 'DB_POOL_RECYCLE', 1800)
+
+    statement_timeout = env_int(environ, 'DB_STATEMENT_TIMEOUT', 0)
+    if statement_timeout and url.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+
+    return {
+        'SQLALCHEMY_DATABASE_URI': url,
+        'SQLALCHEMY_ENGINE_OPTIONS': options,
+        'SQLITE_BUSY_TIMEOUT': env_int(environ, 'SQLITE_BUSY_TIMEOUT', 5000),
+        'SQLITE_JOURNAL_MODE': environ.get('SQLITE_JOURNAL_MODE') or 'WAL',
+        'SQLITE_SYNCHRONOUS': environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    }
+
+def configure_sqlite(app, engine):
+    """
+        Configura cada conexión SQLite nueva: journal WAL (los lectores no
+        bloquean al escritor), synchronous=NORMAL (sin fsync en cada commit,
+        seguro con WAL) y un busy timeout para que los escritores de distintos
+        workers esperen el bloqueo en lugar de fallar.
+        :param app: Aplicación Flask
+        :param engine: Engine de SQLAlchemy
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    busy_timeout = int(app.config.get('SQLITE_BUSY_TIMEOUT', 5000))
+    journal_mode = app.config.get('SQLITE_JOURNAL_MODE', 'WAL').upper()
+    synchronous = app.config.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f'SQLITE_JOURNAL_MODE inválido: {journal_mode}')
+    if synchronous not in SQLITE_SYNCHRONOUS_LEVELS:
+        raise ValueError(f'SQLITE_SYNCHRONOUS inválido: {synchronous}')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {busy_timeout}')
+        cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+        cursor.execute(f'PRAGMA synchronous = {synchronous}')
+        cursor.close()
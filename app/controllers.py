@@ -1,19 +1,48 @@
+import logging
 from flask import jsonify
 from .models import db, Application, Grimorio
-from .utils import assign_grimorio
-from jsonschema import validate, ValidationError
-
-
-solicitud_schema = {
-    "type": "object",
-    "properties": {
-        "nombre": {"type": "string", "pattern": "^[a-zA-zñÑ]*$", "maxLength": 20, "minLength": 1},
-        "apellido": {"type": "string", "pattern": "^[a-zA-zñÑ]*$", "maxLength": 20, "minLength": 1},
-        "identificacion": {"type": "string", "pattern": "^[0-9a-zA-z]*$", "maxLength": 10, "minLength": 1},
-        "edad": {"type": "integer", "minimum": 0, "maximum": 99},
-        "afinidad_magica": {"type": "string", "enum": ["Oscuridad", "Luz", "Fuego", "Agua", "Viento", "Tierra"]}
-    },
-    "required": ["nombre", "apellido", "identificacion", "edad", "afinidad_magica"]
+from .utils import assign_grimorio, assign_grimorios
+from .pagination import parse_page_args, parse_fields, paginated_response, cursor_int
+from .export import ndjson_response
+from .read_model import fetch_rows
+from .allocation import GrimorioStockExhausted
+from .validators import solicitud_validator
+from .cache import invalidate_listings
+from .stats import bump_statistics, application_changes, get_statistics, STATUS, AFFINITY, CLOVER
+from .search import parse_application_filters, parse_sort, sort_key, order_by, keyset_condition
+from sqlalchemy.exc import IntegrityError
+from jsonschema import ValidationError
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+# Máximo de solicitudes por carga masiva y de identificaciones por cada IN (...)
+BULK_MAX_RECORDS = 50000
+IN_CHUNK_SIZE = 900
+
+# Máximo de solicitudes por cambio de estatus masivo. Todas se actualizan con un
+# único UPDATE ... WHERE id IN (...), dentro del límite de parámetros de SQLite (32766)
+BATCH_STATUS_MAX_RECORDS = 10000
+
+# Campos que se pueden solicitar con ``fields=`` en cada listado
+APPLICATION_FIELDS = {
+    'id': Application.id,
+    'name': Application.name,
+    'lastname': Application.lastname,
+    'identity': Application.identity,
+    'age': Application.age,
+    'magical_affinity': Application.magical_affinity,
+    'status': Application.status
+}
+
+ASSIGNMENT_FIELDS = {
+    'Nombre': Application.name,
+    'Apellido': Application.lastname,
+    'Identificación': Application.identity,
+    'Edad': Application.age,
+    'Afinidad Mágica': Application.magical_affinity,
+    'Grimorio': Grimorio.rarity
 }
 
 def create_application(data):
@@ -23,23 +52,92 @@ def create_application(data):
         :return: Mensaje de éxito o error
     """
     try:
-        validate(instance=data, schema=solicitud_schema)
-
-        # Verificar si ya existe una solicitud con la misma identificación
-        existing_solicitud = Application.query.filter_by(identity=data['identificacion']).first()
-        if existing_solicitud:
-            return jsonify({'message': 'Ya existe una solicitud con esta identificación'}), 409
+        solicitud_validator.validate(data)
 
+        # La restricción única sobre la identificación detecta los duplicados en el
+        # mismo INSERT, también entre peticiones concurrentes
         nueva_solicitud = Application(name=data['nombre'], lastname=data['apellido'],
                                     identity=data['identificacion'], age=data['edad'],
                                     magical_affinity=data['afinidad_magica'])
         db.session.add(nueva_solicitud)
+        db.session.flush()
+        bump_statistics(application_changes('Pending', data['afinidad_magica']))
         db.session.commit()
+        invalidate_listings()
         return jsonify({'message': 'Solicitud creada correctamente'}), 201
 
     except ValidationError as e:
         return jsonify({'message': 'Error en la validación de datos', 'details': e.message}), 400
-    except Exception as error:
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Ya existe una solicitud con esta identificación'}), 409
+    except Exception:
+        logger.exception('Error al crear la solicitud')
+        db.session.rollback()
+        return jsonify({'message': 'Internal server error'}), 500
+
+def create_applications_bulk(records):
+    """
+        Función para crear varias solicitudes de aprendizaje en una sola transacción.
+
+        Valida todos los registros, busca identificaciones duplicadas con
+        consultas ``IN (...)`` por bloques e inserta las solicitudes válidas
+        en un único ``executemany``.
+        :param records: Lista de solicitudes
+        :return: Resultado de cada registro (201, 400 o 409)
+    """
+    if not isinstance(records, list) or not records:
+        return jsonify({'message': 'Error en la validación de datos', 'details': 'Se esperaba una lista de solicitudes'}), 400
+    if len(records) > BULK_MAX_RECORDS:
+        return jsonify({'message': 'Error en la validación de datos', 'details': f'Máximo {BULK_MAX_RECORDS} solicitudes por carga'}), 400
+
+    try:
+        results = [None] * len(records)
+        pending = {}
+
+        for index, record in enumerate(records):
+            error = solicitud_validator.error_for(record)
+            if error is not None:
+                results[index] = {'index': index, 'status': 400, 'message': 'Error en la validación de datos', 'details': error.message}
+            elif record['identificacion'] in pending:
+                results[index] = {'index': index, 'status': 409, 'message': 'Ya existe una solicitud con esta identificación'}
+            else:
+                pending[record['identificacion']] = index
+
+        # Verificar en bloque qué identificaciones ya existen
+        identities = list(pending)
+        existing = set()
+        for start in range(0, len(identities), IN_CHUNK_SIZE):
+            chunk = identities[start:start + IN_CHUNK_SIZE]
+            existing.update(db.session.scalars(db.select(Application.identity).where(Application.identity.in_(chunk))))
+
+        nuevas_solicitudes = []
+        for identity, index in pending.items():
+            if identity in existing:
+                results[index] = {'index': index, 'status': 409, 'message': 'Ya existe una solicitud con esta identificación'}
+                continue
+            record = records[index]
+            nuevas_solicitudes.append({'name': record['nombre'], 'lastname': record['apellido'],
+                                       'identity': identity, 'age': record['edad'],
+                                       'magical_affinity': record['afinidad_magica']})
+            results[index] = {'index': index, 'status': 201, 'message': 'Solicitud creada correctamente'}
+
+        if nuevas_solicitudes:
+            db.session.execute(db.insert(Application), nuevas_solicitudes)
+            changes = Counter(((AFFINITY, solicitud['magical_affinity']) for solicitud in nuevas_solicitudes))
+            changes[(STATUS, 'Pending')] = len(nuevas_solicitudes)
+            bump_statistics(changes)
+        db.session.commit()
+        invalidate_listings()
+        return jsonify({'message': 'Carga de solicitudes procesada', 'created': len(nuevas_solicitudes), 'results': results})
+
+    except IntegrityError:
+        # Otra petición registró alguna de las identificaciones entre la verificación y la inserción
+        db.session.rollback()
+        return jsonify({'message': 'Ya existe una solicitud con esta identificación'}), 409
+    except Exception:
+        logger.exception('Error en la carga masiva de solicitudes')
+        db.session.rollback()
         return jsonify({'message': 'Internal server error'}), 500
 
 def update_application(data, application):
@@ -50,28 +148,32 @@ def update_application(data, application):
         :return: Mensaje de éxito o error
     """
     try:
-        validate(instance=data, schema=solicitud_schema)
+        solicitud_validator.validate(data)
 
         # Validar que la solicitud siga pendiente
         if application.status != 'Pending':
             return jsonify({'message': 'No se puede modificar una solicitud aprobada'}), 400
 
-        # Verificar si ya existe una solicitud con la nueva identificación
-        if 'identificacion' in data and data['identificacion'] != application.identity:
-            existing_solicitud = Application.query.filter_by(identity=data['identificacion']).first()
-            if existing_solicitud:
-                return jsonify({'message': 'Ya existe una solicitud con esta identificación'}), 409
-
+        # Una identificación repetida la rechaza la restricción única al confirmar
+        application.identity = data.get('identificacion', application.identity)
         application.name = data.get('nombre', application.name)
         application.lastname = data.get('apellido', application.lastname)
         application.age = data.get('edad', application.age)
-        application.magical_affinity = data.get('afinidad_magica', application.magical_affinity)
+        new_affinity = data.get('afinidad_magica', application.magical_affinity)
+        if new_affinity != application.magical_affinity:
+            bump_statistics({(AFFINITY, application.magical_affinity): -1, (AFFINITY, new_affinity): 1})
+        application.magical_affinity = new_affinity
         db.session.commit()
+        invalidate_listings()
         return jsonify({'message': 'Solicitud actualizada correctamente'})
     except ValidationError as e:
         return jsonify({'message': 'Error en la validación de datos', 'details': e.message}), 400
-    except Exception as error:
-        print(error)
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'message': 'Ya existe una solicitud con esta identificación'}), 409
+    except Exception:
+        logger.exception('Error al actualizar la solicitud')
+        db.session.rollback()
         return jsonify({'message': 'Internal server error'}), 500
 
 def delete_application(application):
@@ -81,15 +183,19 @@ def delete_application(application):
         :return: Mensaje de éxito o error
     """
     try:
-        grimorio = Grimorio.query.filter_by(assignment=application.id).first()
-        if grimorio:
-            db.session.delete(grimorio)
+        changes = application_changes(application.status, application.magical_affinity, delta=-1)
+        if application.grimorio:
+            changes[(CLOVER, application.grimorio.clover_type)] -= 1
+            db.session.delete(application.grimorio)
 
         db.session.delete(application)
+        bump_statistics(changes)
         db.session.commit()
+        invalidate_listings()
         return jsonify({'message': 'Solicitud eliminada correctamente'})
-    except Exception as error:
-        print(error)
+    except Exception:
+        logger.exception('Error al eliminar la solicitud')
+        db.session.rollback()
         return jsonify({'message': 'Internal server error'}), 500
 
 def update_application_status(data, application):
@@ -103,66 +209,207 @@ def update_application_status(data, application):
         if 'estatus' not in data or data['estatus'] not in ['aprobada', 'rechazada']:
             return jsonify({'message': 'El estatus indicado es inválido'}), 400
 
-        # Validar que la solicitud siga pendiente
-        if application.status == 'rechazada':
+        # El cambio de estatus es un UPDATE condicional: si dos peticiones aprueban
+        # la misma solicitud a la vez, sólo una encuentra el estatus Pending
+        result = db.session.execute(db.update(Application)
+                                    .where(Application.id == application.id, Application.status == 'Pending')
+                                    .values(status=data['estatus'])
+                                    .execution_options(synchronize_session=False))
+        if result.rowcount == 0:
+            db.session.rollback()
+            if application.status == 'aprobada':
+                return jsonify({'message': 'Esta solicitud ya fue aprobada.'}), 400
             return jsonify({'message': 'No se puede modificar el estatus de esta solicitud.'}), 400
-        if application.status == 'aprobada':
-            return jsonify({'message': 'Esta solicitud ya fue aprobada.'}), 400
 
+        bump_statistics({(STATUS, 'Pending'): -1, (STATUS, data['estatus']): 1})
         if data['estatus'] == 'aprobada':
-            message = assign_grimorio(application)
-            application.status = data['estatus']
+            # El Grimorio se crea en la misma transacción que el cambio de estatus
+            message = assign_grimorio(application, commit=False)
             db.session.commit()
+            invalidate_listings()
             return jsonify({'message': 'Solicitud Aprobada', 'Grimorio': message})
 
-        application.status = data['estatus']
         db.session.commit()
+        invalidate_listings()
         return jsonify({'message': 'Solicitud Rechazada'})
-    except Exception as error:
-        print(error)
+    except GrimorioStockExhausted:
+        db.session.rollback()
+        return jsonify({'message': 'No quedan Grimorios disponibles'}), 409
+    except Exception:
+        logger.exception('Error al actualizar el estatus de la solicitud')
+        db.session.rollback()
+        return jsonify({'message': 'Internal server error'}), 500
+
+def update_applications_status(data):
+    """
+        Función para aprobar o rechazar varias solicitudes pendientes en una sola transacción.
+
+        Las solicitudes se indican con una lista de ``ids`` o con un ``filtro``
+        por afinidad mágica. Al aprobar, los tipos de trébol se sortean en una
+        sola pasada y los Grimorios se insertan en bloque; el estatus de todas
+        las solicitudes se cambia con un único UPDATE.
+        :param data: Estatus y solicitudes a actualizar
+        :return: Solicitudes actualizadas y Grimorios asignados
+    """
+    if not isinstance(data, dict) or data.get('estatus') not in ['aprobada', 'rechazada']:
+        return jsonify({'message': 'El estatus indicado es inválido'}), 400
+
+    ids = data.get('ids')
+    filtro = data.get('filtro')
+    if (ids is None) == (filtro is None):
+        return jsonify({'message': 'Error en la validación de datos', 'details': 'Se debe indicar ids o filtro'}), 400
+    # bool es subclase de int: true no debe tomarse como el id 1
+    if ids is not None and (not isinstance(ids, list)
+                            or not all(isinstance(id, int) and not isinstance(id, bool) for id in ids)
+                            or len(ids) > BATCH_STATUS_MAX_RECORDS):
+        return jsonify({'message': 'Error en la validación de datos',
+                        'details': f'ids debe ser una lista de hasta {BATCH_STATUS_MAX_RECORDS} enteros'}), 400
+    if filtro is not None and (not isinstance(filtro, dict) or set(filtro) != {'afinidad_magica'}):
+        return jsonify({'message': 'Error en la validación de datos', 'details': 'El filtro admite únicamente afinidad_magica'}), 400
+
+    try:
+        query = (db.select(Application.id, Application.identity)
+                 .where(Application.status == 'Pending')
+                 .order_by(Application.id)
+                 .with_for_update())
+        if ids is not None:
+            query = query.where(Application.id.in_(ids))
+        else:
+            query = query.where(Application.magical_affinity == filtro['afinidad_magica']).limit(BATCH_STATUS_MAX_RECORDS)
+        solicitudes = db.session.execute(query).all()
+        selected_ids = [solicitud.id for solicitud in solicitudes]
+
+        grimorios = {}
+        if data['estatus'] == 'aprobada':
+            grimorios = assign_grimorios([solicitud.identity for solicitud in solicitudes])
+
+        if selected_ids:
+            result = db.session.execute(db.update(Application)
+                                        .where(Application.id.in_(selected_ids), Application.status == 'Pending')
+                                        .values(status=data['estatus'])
+                                        .execution_options(synchronize_session=False))
+            if result.rowcount != len(selected_ids):
+                # Otra petición modificó alguna de las solicitudes mientras tanto
+                db.session.rollback()
+                return jsonify({'message': 'No se puede modificar el estatus de esta solicitud.'}), 409
+            bump_statistics({(STATUS, 'Pending'): -len(selected_ids), (STATUS, data['estatus']): len(selected_ids)})
+        db.session.commit()
+        invalidate_listings()
+
+        response = {
+            'message': 'Solicitudes Aprobadas' if data['estatus'] == 'aprobada' else 'Solicitudes Rechazadas',
+            'updated': len(selected_ids)
+        }
+        if ids is not None:
+            response['skipped'] = sorted(set(ids) - set(selected_ids))
+        if data['estatus'] == 'aprobada':
+            response['Grimorios'] = [{'id': solicitud.id, 'identificacion': solicitud.identity,
+                                      'Grimorio': grimorios[solicitud.identity]} for solicitud in solicitudes]
+        return jsonify(response)
+    except GrimorioStockExhausted:
+        db.session.rollback()
+        return jsonify({'message': 'No quedan Grimorios suficientes para aprobar todas las solicitudes'}), 409
+    except Exception:
+        logger.exception('Error al actualizar el estatus de las solicitudes')
+        db.session.rollback()
         return jsonify({'message': 'Internal server error'}), 500
 
-def get_applications_info():
+def get_applications_info(args):
     """
-        Función para obtener todas las solicitudes existentes.
+        Función para obtener las solicitudes existentes, filtradas, ordenadas y paginadas.
+        :param args: Filtros (estatus, afinidad_magica, edad_min, edad_max, desde, hasta),
+                     orden y parámetros de paginación (limit, cursor, fields)
         :return: Lista de solicitudes
     """
     try:
-        applications = Application.query.all()
-        if applications is None:
-            return jsonify([])
+        limit, cursor, fields = parse_page_args(args, APPLICATION_FIELDS)
+        criteria = parse_application_filters(args)
+        sort_column, descending = parse_sort(args)
+        if cursor:
+            criteria.append(keyset_condition(sort_column, descending, cursor))
+    except ValueError as e:
+        return jsonify({'message': 'Error en la validación de datos', 'details': str(e)}), 400
+
+    try:
+        key = sort_key(sort_column)
+        query = (db.select(*[APPLICATION_FIELDS[field] for field in fields], *key)
+                 .where(*criteria)
+                 .order_by(*order_by(sort_column, descending))
+                 .limit(limit + 1))
 
-        return jsonify([application.serialize() for application in applications])
-    except Exception as error:
-        print(error)
+        return paginated_response(fetch_rows(query), fields, limit, len(key))
+    except Exception:
+        logger.exception('Error al consultar las solicitudes')
         return jsonify({'message': 'Internal server error'}), 500
 
-def get_assignments_info():
+def get_assignments_info(args):
     """
-        Función para obtener todas las asignaciones existentes.
+        Función para obtener las asignaciones existentes, paginadas por id.
+        :param args: Parámetros de paginación (limit, cursor, fields)
         :return: Lista de asignaciones
     """
     try:
-        asignaciones = Grimorio.query.all()
-        if not asignaciones:
-            return jsonify([])
-
-        asignaciones_info = []
-        for asignacion in asignaciones:
-            solicitud = Application.query.filter_by(identity=asignacion.assignment).first()
-            if solicitud:
-                asignacion_info = dict()
-                asignacion_info['Nombre'] = solicitud.name
-                asignacion_info['Apellido'] = solicitud.lastname
-                asignacion_info['Identificación'] = solicitud.identity
-                asignacion_info['Edad'] = solicitud.age
-                asignacion_info['Afinidad Mágica'] = solicitud.magical_affinity
-                asignacion_info['Grimorio'] = asignacion.rarity
-                asignaciones_info.append(asignacion_info)
-            else:
-                print(f"No se encontró la solicitud para la asignación {asignacion.id}")
+        limit, cursor, fields = parse_page_args(args, ASSIGNMENT_FIELDS)
+        if cursor and len(cursor) != 1:
+            raise ValueError('El cursor no corresponde al orden indicado')
+        after_id = cursor_int(cursor[0]) if cursor else None
+    except ValueError as e:
+        return jsonify({'message': 'Error en la validación de datos', 'details': str(e)}), 400
 
-        return jsonify(asignaciones_info)
-    except Exception as error:
-        print(error)
+    try:
+        # Una sola consulta (Grimorio ⨝ Application) en lugar de una por asignación
+        query = (db.select(*[ASSIGNMENT_FIELDS[field] for field in fields], Grimorio.id)
+                 .join(Grimorio.application)
+                 .order_by(Grimorio.id)
+                 .limit(limit + 1))
+        if after_id is not None:
+            query = query.where(Grimorio.id > after_id)
+
+        return paginated_response(fetch_rows(query), fields, limit)
+    except Exception:
+        logger.exception('Error al consultar las asignaciones')
+        return jsonify({'message': 'Internal server error'}), 500
+
+def export_applications_info(args, compress=False):
+    """
+        Función para exportar todas las solicitudes como NDJSON en streaming.
+        :param args: Parámetros de la exportación (fields)
+        :param compress: Si la respuesta se comprime con gzip
+        :return: Respuesta en streaming con una solicitud por línea
+    """
+    try:
+        fields = parse_fields(args, APPLICATION_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': 'Error en la validación de datos', 'details': str(e)}), 400
+
+    query = db.select(*[APPLICATION_FIELDS[field] for field in fields]).order_by(Application.id)
+    return ndjson_response(query, fields, compress)
+
+def export_assignments_info(args, compress=False):
+    """
+        Función para exportar todas las asignaciones como NDJSON en streaming.
+        :param args: Parámetros de la exportación (fields)
+        :param compress: Si la respuesta se comprime con gzip
+        :return: Respuesta en streaming con una asignación por línea
+    """
+    try:
+        fields = parse_fields(args, ASSIGNMENT_FIELDS)
+    except ValueError as e:
+        return jsonify({'message': 'Error en la validación de datos', 'details': str(e)}), 400
+
+    query = (db.select(*[ASSIGNMENT_FIELDS[field] for field in fields])
+             .join(Grimorio.application)
+             .order_by(Grimorio.id))
+    return ndjson_response(query, fields, compress)
+
+def get_statistics_info():
+    """
+        Función para obtener las estadísticas de solicitudes y Grimorios.
+        Se leen de los contadores mantenidos en cada escritura, sin recorrer las tablas.
+        :return: Conteos por estatus, afinidad mágica y tipo de trébol
+    """
+    try:
+        return jsonify(get_statistics())
+    except Exception:
+        logger.exception('Error al consultar las estadísticas')
         return jsonify({'message': 'Internal server error'}), 500
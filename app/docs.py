@@ -0,0 +1,89 @@
+import hashlib
+import os
+import click
+from flask import Response, request
+from flask_swagger_ui import get_swaggerui_blueprint
+
+SWAGGER_URL = '/apidocs'
+API_URL = '/apidocs/swagger.json'
+
+SWAGGER_INFO = {
+    'title': 'API de la Academia de Magia del Reino del Trébol',
+    'version': '1.0',
+    'description': "En el Reino del Trébol, el Rey Mago necesita un sistema para la academia de magia que administre el registro de solicitud de estudiantes y la asignación aleatoria de sus Grimorios. Los Grimorios se clasifican según el tipo de trébol en la portada, y los estudiantes según sus afinidades mágicas específicas."
+}
+
+# Segundos que los clientes pueden reutilizar la especificación sin revalidarla
+SWAGGER_CACHE_MAX_AGE = 300
+
+
+def build_swagger_spec(app):
+    """
+        Genera la especificación Swagger leyendo los docstrings de las rutas.
+
+        flask_swagger (y con él el parser de YAML) se importa aquí y no al
+        cargar el módulo, para que los workers no lo carguen hasta que se pida
+        la especificación.
+        :param app: Aplicación Flask
+        :return: Especificación serializada en JSON
+    """
+    from flask_swagger import swagger
+
+    swag = swagger(app)
+    swag['info'] = SWAGGER_INFO
+    return app.json.dumps(swag).encode('utf-8')
+
+def get_swagger_spec(app):
+    """
+        Devuelve la especificación Swagger, generándola sólo la primera vez.
+
+        Si ``SWAGGER_SPEC_PATH`` apunta a un archivo existente (generado con
+        ``flask swagger-export``) se sirve ese archivo y no se procesa ningún
+        docstring.
+        :param app: Aplicación Flask
+        :return: Tupla (especificación en bytes, ETag)
+    """
+    cached = app.extensions.get('swagger_spec')
+    if cached is None:
+        path = app.config.get('SWAGGER_SPEC_PATH')
+        if path and os.path.exists(path):
+            with open(path, 'rb') as spec_file:
+                body = spec_file.read()
+        else:
+            body = build_swagger_spec(app)
+        cached = (body, hashlib.sha256(body).hexdigest())
+        app.extensions['swagger_spec'] = cached
+    return cached
+
+def register_swagger(app):
+    """
+        Registra la especificación Swagger y la interfaz de documentación.
+        :param app: Aplicación Flask
+    """
+    def create_swagger_spec():
+        body, etag = get_swagger_spec(app)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config.get('SWAGGER_CACHE_MAX_AGE', SWAGGER_CACHE_MAX_AGE)
+        return response.make_conditional(request)
+
+    app.add_url_rule(API_URL, 'create_swagger_spec', create_swagger_spec)
+
+    @app.cli.command('swagger-export')
+    @click.argument('path', required=False)
+    def swagger_export(path):
+        """Escribe la especificación Swagger en un archivo estático."""
+        path = path or app.config.get('SWAGGER_SPEC_PATH') or 'swagger.json'
+        with open(path, 'wb') as spec_file:
+            spec_file.write(build_swagger_spec(app))
+        click.echo(f'Especificación Swagger escrita en {path}')
+
+    swaggerui_blueprint = get_swaggerui_blueprint(
+        SWAGGER_URL,
+        API_URL,
+        config={
+            'app_name': "Academia de Magia - Swagger"
+        }
+    )
+    app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
@@ -0,0 +1,71 @@
+import json
+import zlib
+from flask import Response, current_app, request, stream_with_context
+from .read_model import stream_rows
+from .serialization import serialize_rows
+
+# Filas que se leen de la base de datos (y se escriben en la respuesta) por lote
+EXPORT_BATCH_SIZE = 1000
+
+
+def accepts_gzip():
+    """
+        Indica si el cliente acepta la respuesta comprimida con gzip.
+        :return: True si ``Accept-Encoding`` incluye gzip
+    """
+    return 'gzip' in request.accept_encodings
+
+def parse_ndjson(text):
+    """
+        Convierte un cuerpo NDJSON en una lista de objetos.
+
+        Las líneas vacías se ignoran y las que no son JSON válido se devuelven
+        como ``None`` para que la validación las rechace individualmente.
+        :param text: Cuerpo de la petición
+        :return: Lista con un elemento por línea
+    """
+    records = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            records.append(None)
+    return records
+
+def ndjson_response(query, fields, compress=False):
+    """
+        Devuelve el resultado de una consulta como un flujo NDJSON.
+
+        La consulta se ejecuta con ``yield_per`` para que el driver utilice un
+        cursor del lado del servidor cuando lo soporte, y las filas se
+        serializan por lotes directamente desde las tuplas a medida que llegan, de modo que la memoria no
+        crece con el tamaño de la tabla.
+        :param query: Consulta ``select`` con los campos a exportar
+        :param fields: Nombres de los campos, en el orden de las columnas
+        :param compress: Si la respuesta se comprime con gzip al vuelo
+        :return: Respuesta en streaming con un objeto JSON por línea
+    """
+    dumps_lines = current_app.json.dumps_lines
+
+    def generate():
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        result = stream_rows(query, EXPORT_BATCH_SIZE)
+        try:
+            for partition in result.partitions():
+                chunk = dumps_lines(serialize_rows(fields, partition))
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+        finally:
+            result.close()
+        if compressor:
+            yield compressor.flush()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,206 @@
+"""
+    Claves de idempotencia para las escrituras (cabecera ``Idempotency-Key``).
+
+    La primera petición con una clave la reserva en la tabla ``idempotency_key``,
+    se ejecuta y guarda su respuesta. Los reintentos con la misma clave y la
+    misma petición reciben la respuesta guardada, con la cabecera
+    ``Idempotent-Replayed: true``, tras una única lectura por clave primaria y
+    sin ejecutar el controlador. La tabla se comparte entre todos los workers.
+
+    Las respuestas se conservan ``IDEMPOTENCY_TTL`` segundos y como máximo
+    ``IDEMPOTENCY_MAX_KEYS`` claves; las vencidas se purgan periódicamente o con:
+
+        flask --app run idempotency-purge
+"""
+import datetime
+import hashlib
+import itertools
+import logging
+from functools import wraps
+import click
+from flask import Response, current_app, jsonify, make_response, request
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import db, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Segundos que se conserva una respuesta y máximo de claves guardadas
+IDEMPOTENCY_TTL = 24 * 3600
+IDEMPOTENCY_MAX_KEYS = 100000
+
+# Segundos tras los que la clave reservada por una petición que no terminó
+# (por ejemplo, un worker detenido) puede volver a usarse
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Respuestas guardadas por proceso entre dos purgas de claves vencidas
+IDEMPOTENCY_PURGE_EVERY = 1000
+
+# Cabeceras de la respuesta original que se conservan para repetirla
+STORED_HEADERS = ('Location',)
+
+
+def request_fingerprint():
+    """
+        Huella de la petición: método, ruta y cuerpo.
+        :return: Resumen SHA-256 en hexadecimal
+    """
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def lookup(key):
+    """
+        Lee la respuesta guardada para una clave.
+
+        Las claves vencidas y las reservadas por una petición que no terminó se
+        eliminan y se tratan como inexistentes.
+        :return: Fila guardada, o None si la clave está libre
+    """
+    stored = db.session.execute(db.select(IdempotencyKey.fingerprint, IdempotencyKey.status_code,
+                                          IdempotencyKey.body, IdempotencyKey.mimetype,
+                                          IdempotencyKey.headers, IdempotencyKey.created_at)
+                                .where(IdempotencyKey.key == key)).first()
+    if stored is None:
+        return None
+
+    now = datetime.datetime.now()
+    expired = stored.created_at < now - datetime.timedelta(seconds=current_app.config.get('IDEMPOTENCY_TTL', IDEMPOTENCY_TTL))
+    abandoned = stored.status_code is None and stored.created_at < now - datetime.timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)
+    if not (expired or abandoned):
+        return stored
+    # La condición sobre created_at evita borrar una clave que otra petición acaba de reservar
+    db.session.execute(db.delete(IdempotencyKey)
+                       .where(IdempotencyKey.key == key, IdempotencyKey.created_at == stored.created_at))
+    db.session.commit()
+    return None
+
+def reserve(key, fingerprint):
+    """
+        Reserva una clave libre antes de ejecutar la petición.
+
+        El INSERT ... ON CONFLICT DO NOTHING es atómico: si dos peticiones con
+        la misma clave llegan a la vez, sólo una la reserva.
+        :return: True si la clave quedó reservada por esta petición
+    """
+    insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    result = db.session.execute(insert(IdempotencyKey)
+                                .values(key=key, fingerprint=fingerprint, created_at=datetime.datetime.now())
+                                .on_conflict_do_nothing(index_elements=[IdempotencyKey.key]))
+    db.session.commit()
+    return result.rowcount == 1
+
+def release(key):
+    """
+        Libera una clave reservada cuya petición falló, para que pueda reintentarse.
+    """
+    db.session.rollback()
+    db.session.execute(db.delete(IdempotencyKey)
+                       .where(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None)))
+    db.session.commit()
+
+def store(key, response):
+    """
+        Guarda la respuesta de la petición que reservó la clave.
+    """
+    db.session.execute(db.update(IdempotencyKey)
+                       .where(IdempotencyKey.key == key)
+                       .values(status_code=response.status_code, body=response.get_data(),
+                               mimetype=response.mimetype,
+                               headers={name: response.headers[name] for name in STORED_HEADERS if name in response.headers}))
+    db.session.commit()
+    if next(current_app.extensions['idempotency_stores']) % IDEMPOTENCY_PURGE_EVERY == 0:
+        purge_idempotency_keys()
+
+def replay(stored, fingerprint):
+    """
+        Respuesta a un reintento con una clave ya usada.
+    """
+    if stored.fingerprint != fingerprint:
+        return jsonify({'message': 'La Idempotency-Key ya se usó con una petición distinta'}), 422
+    if stored.status_code is None:
+        response = jsonify({'message': 'Hay una petición en curso con esta Idempotency-Key'})
+        response.headers['Retry-After'] = '1'
+        return response, 409
+    response = Response(stored.body, status=stored.status_code, mimetype=stored.mimetype, headers=stored.headers or {})
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(view):
+    """
+        Decorador que hace idempotente una escritura con la cabecera ``Idempotency-Key``.
+
+        Sin cabecera la petición se atiende como siempre. Se guardan las
+        respuestas 2xx, 3xx y 4xx; tras un 5xx o una excepción la clave se
+        libera y el reintento vuelve a ejecutar la petición. Reutilizar una
+        clave con otra petición devuelve 422, y mientras la primera sigue en
+        curso, 409.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'message': 'Error en la validación de datos',
+                            'details': f'Idempotency-Key debe tener entre 1 y {IDEMPOTENCY_KEY_MAX_LENGTH} caracteres'}), 400
+
+        fingerprint = request_fingerprint()
+        stored = lookup(key)
+        if stored is None:
+            if reserve(key, fingerprint):
+                try:
+                    response = make_response(view(*args, **kwargs))
+                except Exception:
+                    release(key)
+                    raise
+                try:
+                    if response.status_code >= 500:
+                        release(key)
+                    else:
+                        store(key, response)
+                except Exception:
+                    logger.exception('Error al guardar la respuesta de la Idempotency-Key')
+                    db.session.rollback()
+                return response
+            stored = lookup(key)
+            if stored is None:
+                return jsonify({'message': 'Hay una petición en curso con esta Idempotency-Key'}), 409
+        return replay(stored, fingerprint)
+    return wrapper
+
+def purge_idempotency_keys():
+    """
+        Elimina las claves vencidas y, si aún superan ``IDEMPOTENCY_MAX_KEYS``
+        (0 indica sin máximo), las más antiguas.
+        :return: Número de claves eliminadas
+    """
+    ttl = current_app.config.get('IDEMPOTENCY_TTL', IDEMPOTENCY_TTL)
+    max_keys = current_app.config.get('IDEMPOTENCY_MAX_KEYS', IDEMPOTENCY_MAX_KEYS)
+    deleted = db.session.execute(db.delete(IdempotencyKey).where(
+        IdempotencyKey.created_at < datetime.datetime.now() - datetime.timedelta(seconds=ttl))).rowcount
+    if max_keys:
+        oldest_kept = db.session.execute(db.select(IdempotencyKey.created_at)
+                                         .order_by(IdempotencyKey.created_at.desc())
+                                         .offset(max_keys - 1).limit(1)).scalar()
+        if oldest_kept is not None:
+            deleted += db.session.execute(db.delete(IdempotencyKey).where(IdempotencyKey.created_at < oldest_kept)).rowcount
+    db.session.commit()
+    return deleted
+
+def register_idempotency(app):
+    """
+        Prepara el almacén de claves de idempotencia y registra el comando
+        ``flask idempotency-purge``.
+        :param app: Aplicación Flask
+    """
+    if app.config.get('IDEMPOTENCY_MAX_KEYS', IDEMPOTENCY_MAX_KEYS) < 0:
+        raise ValueError('IDEMPOTENCY_MAX_KEYS no puede ser negativo (0 indica sin máximo)')
+    app.extensions['idempotency_stores'] = itertools.count(1)
+
+    @app.cli.command('idempotency-purge')
+    def idempotency_purge():
+        """Elimina las claves de idempotencia vencidas o que superan el máximo."""
+        click.echo(f'Claves eliminadas: {purge_idempotency_keys()}')
@@ -0,0 +1,260 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from flask import Response, g, has_app_context, request
+from flask.json.provider import JSONProvider
+from sqlalchemy import event
+
+# Límites (en segundos) de los buckets del histograma de duración de las peticiones
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS_URL = '/metrics'
+
+# cProfile sólo admite un perfilador activo a la vez en el proceso
+_profiler_lock = threading.Lock()
+
+
+class RequestTimings:
+    """
+        Tiempos acumulados durante una petición.
+    """
+    __slots__ = ('start', 'sql_count', 'sql_time', 'serialize_time')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+
+
+def current_timings():
+    """
+        Tiempos de la petición en curso, o None fuera de una petición instrumentada.
+    """
+    if not has_app_context():
+        return None
+    return g.get('request_timings')
+
+
+class TimedJSONProvider(JSONProvider):
+    """
+        Envoltorio del proveedor JSON de la aplicación que suma a la petición
+        en curso el tiempo de serialización.
+    """
+
+    def __init__(self, app, provider):
+        super().__init__(app)
+        self.provider = provider
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def timed(self, function, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings = current_timings()
+            if timings is not None:
+                timings.serialize_time += time.perf_counter() - start
+
+    def dumps(self, obj, **kwargs):
+        return self.timed(self.provider.dumps, obj, **kwargs)
+
+    def dumps_bytes(self, obj, *args, **kwargs):
+        return self.timed(self.provider.dumps_bytes, obj, *args, **kwargs)
+
+    def dumps_lines(self, objs):
+        return self.timed(self.provider.dumps_lines, objs)
+
+    def loads(self, s, **kwargs):
+        return self.provider.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        return self.timed(self.provider.response, *args, **kwargs)
+
+
+class Metrics:
+    """
+        Métricas de las peticiones en el formato de texto de Prometheus.
+
+        Los valores son del proceso: con varios workers de gunicorn cada uno
+        publica los suyos en /metrics.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._requests = {}
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method, route, status, timings, duration):
+        """
+            Registra una petición terminada.
+            :param timings: RequestTimings de la petición
+            :param duration: Duración total en segundos
+        """
+        with self._lock:
+            key = (method, route, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+            series = self._durations.get((method, route))
+            if series is None:
+                series = self._durations[(method, route)] = {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                    'sql_count': 0, 'sql_time': 0.0, 'serialize_time': 0.0
+                }
+            for index, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    series['buckets'][index] += 1
+            series['count'] += 1
+            series['sum'] += duration
+            series['sql_count'] += timings.sql_count
+            series['sql_time'] += timings.sql_time
+            series['serialize_time'] += timings.serialize_time
+
+    def render(self):
+        """
+            Devuelve las métricas en el formato de exposición de Prometheus.
+        """
+        with self._lock:
+            requests = sorted(self._requests.items())
+            durations = sorted((key, dict(series, buckets=list(series['buckets'])))
+                               for key, series in self._durations.items())
+
+        lines = ['# HELP http_requests_total Peticiones atendidas.', '# TYPE http_requests_total counter']
+        for (method, route, status), count in requests:
+            lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+        lines += ['# HELP http_request_duration_seconds Duración de las peticiones.',
+                  '# TYPE http_request_duration_seconds histogram']
+        for (method, route), series in durations:
+            labels = f'method="{method}",route="{route}"'
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {series["sum"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {series["count"]}')
+
+        for name, field, kind, description in (
+            ('db_queries_total', 'sql_count', 'counter', 'Sentencias SQL ejecutadas.'),
+            ('db_query_duration_seconds_total', 'sql_time', 'counter', 'Tiempo total en sentencias SQL.'),
+            ('serialization_duration_seconds_total', 'serialize_time', 'counter', 'Tiempo total serializando JSON.')
+        ):
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+            for (method, route), series in durations:
+                value = series[field]
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'{name}{{method="{method}",route="{route}"}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def route_label():
+    """
+        Regla de la ruta atendida (``/solicitud/<int:id>``) para no crear una serie por id.
+    """
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def instrument_engine(engine):
+    """
+        Cuenta y cronometra las sentencias SQL que se ejecutan durante una petición.
+        :param engine: Engine de SQLAlchemy
+    """
+    # El inicio se guarda en el contexto de ejecución de la sentencia: si falla
+    # no queda nada pendiente en la conexión, que vuelve al pool
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        timings = current_timings()
+        if timings is not None:
+            timings.sql_count += 1
+            timings.sql_time += elapsed
+
+def profile_path(directory, duration):
+    """
+        Nombre del archivo donde se guarda el perfil de la petición en curso.
+    """
+    route = re.sub(r'[^0-9a-zA-Z]+', '_', route_label()).strip('_') or 'root'
+    return os.path.join(directory, f'{int(time.time() * 1000)}-{request.method}-{route}-{duration * 1000:.0f}ms.prof')
+
+def register_instrumentation(app, engine):
+    """
+        Registra la instrumentación de las peticiones.
+
+        Cada respuesta incluye la cabecera ``Server-Timing`` con la duración
+        total (``app``), las sentencias SQL (``db``) y la serialización JSON
+        (``serialize``); los totales se publican en /metrics. La duración se
+        mide hasta que la vista devuelve la respuesta, por lo que no incluye el
+        envío de las respuestas en streaming.
+
+        Si ``PROFILE_THRESHOLD_MS`` está definido, una fracción
+        ``PROFILE_SAMPLE_RATE`` de las peticiones se ejecuta bajo cProfile y
+        las que superan el umbral se guardan en ``PROFILE_DIR`` como archivos
+        .prof (legibles con pstats, snakeviz o flameprof).
+        :param app: Aplicación Flask
+        :param engine: Engine de SQLAlchemy
+    """
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+
+    app.json = TimedJSONProvider(app, app.json)
+    instrument_engine(engine)
+    metrics = app.extensions['metrics'] = Metrics()
+
+    threshold = app.config.get('PROFILE_THRESHOLD_MS')
+    threshold = float(threshold) / 1000 if threshold not in (None, '') else None
+    sample_rate = float(app.config.get('PROFILE_SAMPLE_RATE') or 1.0)
+    profile_dir = app.config.get('PROFILE_DIR') or 'profiles'
+
+    @app.before_request
+    def start_timings():
+        g.request_timings = RequestTimings()
+        if threshold is not None and random.random() < sample_rate and _profiler_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_timings(response):
+        timings = g.pop('request_timings', None)
+        if timings is None:
+            return response
+        duration = time.perf_counter() - timings.start
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            try:
+                profiler.disable()
+                if duration >= threshold:
+                    os.makedirs(profile_dir, exist_ok=True)
+                    profiler.dump_stats(profile_path(profile_dir, duration))
+            finally:
+                _profiler_lock.release()
+
+        response.headers['Server-Timing'] = ', '.join([
+            f'app;dur={duration * 1000:.2f}',
+            f'db;dur={timings.sql_time * 1000:.2f};desc="{timings.sql_count} queries"',
+            f'serialize;dur={timings.serialize_time * 1000:.2f}'
+        ])
+        metrics.observe(request.method, route_label(), response.status_code, timings, duration)
+        return response
+
+    @app.teardown_request
+    def release_profiler(error=None):
+        # Si la petición terminó con una excepción no pasa por after_request
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+
+    def get_metrics():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule(METRICS_URL, 'get_metrics', get_metrics)
@@ -0,0 +1,245 @@
+"""
+    Cola de tareas en segundo plano sobre la tabla ``job``.
+
+    Con ``ASYNC_APPROVALS`` activo, PATCH /solicitud/<id>/estatus encola el
+    cambio de estatus y responde 202 con el id de la tarea, cuyo resultado se
+    consulta en GET /jobs/<id>. Las tareas las procesa un proceso aparte:
+
+        flask --app run jobs-worker --threads 4 --batch-size 100
+
+    Los lotes se reclaman con un UPDATE condicional, por lo que pueden
+    ejecutarse varios procesos ``jobs-worker`` sobre la misma base de datos.
+"""
+import datetime
+import logging
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import groupby
+import click
+from flask import current_app, jsonify, url_for
+from .models import db, Application, Job
+from .controllers import update_application_status, update_applications_status, BATCH_STATUS_MAX_RECORDS
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANGE = 'estatus'
+
+# Tareas por lote, segundos de espera con la cola vacía y segundos tras los que
+# una tarea en curso se considera abandonada (worker detenido) y se reencola
+JOB_BATCH_SIZE = 100
+JOB_POLL_INTERVAL = 0.5
+JOB_STALE_AFTER = 300
+
+
+def enqueue_status_change(data, application):
+    """
+        Encola el cambio de estatus de una solicitud.
+        :param data: Datos de la petición
+        :param application: Solicitud a actualizar
+        :return: 202 con el id de la tarea, o mensaje de error
+    """
+    if not isinstance(data, dict) or data.get('estatus') not in ['aprobada', 'rechazada']:
+        return jsonify({'message': 'El estatus indicado es inválido'}), 400
+    try:
+        job = Job(kind=STATUS_CHANGE, payload={'id': application.id, 'estatus': data['estatus']})
+        db.session.add(job)
+        db.session.commit()
+        response = jsonify({'message': 'Cambio de estatus en cola', 'job_id': job.id})
+        response.headers['Location'] = url_for('routes.get_job', id=job.id)
+        return response, 202
+    except Exception:
+        logger.exception('Error al encolar el cambio de estatus')
+        db.session.rollback()
+        return jsonify({'message': 'Internal server error'}), 500
+
+def get_job_info(id):
+    """
+        Función para consultar el estado y el resultado de una tarea.
+        :param id: Id de la tarea
+        :return: Tarea o mensaje de error
+    """
+    job = db.session.get(Job, id)
+    if job is None:
+        return jsonify({'error': 'Tarea no encontrada'}), 404
+    return jsonify(job.serialize())
+
+def claim_jobs(limit):
+    """
+        Reclama hasta ``limit`` tareas pendientes, en orden de llegada.
+        :return: Lista de filas (id, payload)
+    """
+    token = f'{random.getrandbits(64):016x}'
+    pending = db.select(Job.id).where(Job.status == 'pending').order_by(Job.id).limit(limit)
+    # La condición sobre el estatus se vuelve a evaluar al actualizar: si dos
+    # workers eligen las mismas tareas, cada una queda reclamada por uno solo
+    db.session.execute(db.update(Job)
+                       .where(Job.id.in_(pending), Job.status == 'pending')
+                       .values(status='running', claimed_by=token, started_at=datetime.datetime.now())
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    return db.session.execute(db.select(Job.id, Job.payload)
+                              .where(Job.claimed_by == token, Job.status == 'running')
+                              .order_by(Job.id)).all()
+
+def requeue_stale(older_than=JOB_STALE_AFTER):
+    """
+        Devuelve a la cola las tareas en curso desde hace más de ``older_than`` segundos.
+        :return: Número de tareas reencoladas
+    """
+    started_before = datetime.datetime.now() - datetime.timedelta(seconds=older_than)
+    result = db.session.execute(db.update(Job)
+                                .where(Job.status == 'running', Job.started_at < started_before)
+                                .values(status='pending', claimed_by=None, started_at=None)
+                                .execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount
+
+def fail_jobs(jobs):
+    """
+        Marca como fallidas las tareas de un lote que no se pudo procesar, con
+        el mismo resultado que una petición síncrona que falla.
+        :param jobs: Filas (id, payload) del lote
+    """
+    db.session.execute(db.update(Job)
+                       .where(Job.id.in_([job.id for job in jobs]), Job.status == 'running')
+                       .values(status='failed', status_code=500, result={'message': 'Internal server error'},
+                               finished_at=datetime.datetime.now())
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+
+def call(view, *args):
+    """
+        Ejecuta un controlador y devuelve su código de estado y su cuerpo JSON.
+    """
+    response = current_app.make_response(view(*args))
+    return response.status_code, response.get_json()
+
+def change_status(payload):
+    """
+        Cambio de estatus de una sola solicitud, igual que la petición síncrona.
+    """
+    application = db.session.get(Application, payload['id'])
+    if application is None:
+        return jsonify({'error': 'Solicitud no encontrada'}), 404
+    return update_application_status({'estatus': payload['estatus']}, application)
+
+def change_status_run(estatus, jobs):
+    """
+        Aplica juntas varias tareas consecutivas con el mismo estatus.
+
+        Las solicitudes se actualizan con ``update_applications_status``: una
+        transacción, un único sorteo y una única inserción de Grimorios para
+        todo el grupo. Las tareas omitidas (solicitud ya modificada, eliminada
+        o repetida en el grupo) y los grupos rechazados por completo, por
+        ejemplo por falta de stock para todos, se aplican de a una para que
+        cada tarea obtenga el mismo resultado que la petición síncrona.
+        :return: Diccionario id de tarea -> (código de estado, cuerpo)
+    """
+    first = {}
+    for job in jobs:
+        first.setdefault(job.payload['id'], job.id)
+    status_code, body = call(update_applications_status, {'estatus': estatus, 'ids': list(first)})
+    if status_code != 200:
+        return {job.id: call(change_status, job.payload) for job in jobs}
+
+    skipped = set(body['skipped'])
+    grimorios = {grimorio['id']: grimorio['Grimorio'] for grimorio in body.get('Grimorios', [])}
+    results = {}
+    for job in jobs:
+        id = job.payload['id']
+        if first[id] != job.id or id in skipped:
+            results[job.id] = call(change_status, job.payload)
+        elif estatus == 'aprobada':
+            results[job.id] = (200, {'message': 'Solicitud Aprobada', 'Grimorio': grimorios[id]})
+        else:
+            results[job.id] = (200, {'message': 'Solicitud Rechazada'})
+    return results
+
+def process_batch(jobs):
+    """
+        Procesa un lote de tareas reclamadas y guarda el resultado de cada una.
+        :param jobs: Filas (id, payload) en orden de llegada
+    """
+    results = {}
+    for estatus, run in groupby(jobs, key=lambda job: job.payload['estatus']):
+        results.update(change_status_run(estatus, list(run)))
+
+    finished_at = datetime.datetime.now()
+    db.session.execute(db.update(Job), [
+        {'id': id, 'status': 'done' if status_code < 500 else 'failed', 'status_code': status_code,
+         'result': body, 'finished_at': finished_at}
+        for id, (status_code, body) in results.items()
+    ])
+    db.session.commit()
+
+def run_worker(app, threads=1, batch_size=JOB_BATCH_SIZE, poll_interval=JOB_POLL_INTERVAL, drain=False):
+    """
+        Procesa la cola de tareas.
+
+        El hilo principal reclama lotes y los reparte en un pool de ``threads``
+        hilos, con a lo sumo un lote en curso por hilo.
+        :param app: Aplicación Flask
+        :param threads: Hilos del pool
+        :param batch_size: Tareas por lote
+        :param poll_interval: Segundos de espera cuando la cola está vacía
+        :param drain: Si es True termina al quedar la cola vacía
+        :return: Número de tareas procesadas
+    """
+    def work(jobs):
+        with app.app_context():
+            try:
+                process_batch(jobs)
+            except Exception:
+                # Las tareas del lote se marcan como fallidas en una transacción nueva
+                logger.exception('Error al procesar un lote de tareas')
+                db.session.rollback()
+                try:
+                    fail_jobs(jobs)
+                except Exception:
+                    # Siguen en curso y ``requeue_stale`` las reencola al iniciar otro worker
+                    logger.exception('Error al marcar como fallidas las tareas del lote')
+                    db.session.rollback()
+                return 0
+        return len(jobs)
+
+    processed = 0
+    running = set()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        while True:
+            jobs = []
+            if len(running) < threads:
+                with app.app_context():
+                    jobs = claim_jobs(batch_size)
+            if jobs:
+                running.add(pool.submit(work, jobs))
+            elif running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                processed += sum(future.result() for future in done)
+            elif drain:
+                return processed
+            else:
+                time.sleep(poll_interval)
+
+def register_jobs(app):
+    """
+        Registra el comando ``flask jobs-worker``.
+        :param app: Aplicación Flask
+    """
+    @app.cli.command('jobs-worker')
+    @click.option('--threads', type=click.IntRange(min=1), default=1, show_default=True,
+                  envvar='JOBS_THREADS', help='Lotes procesados en paralelo.')
+    @click.option('--batch-size', type=click.IntRange(1, BATCH_STATUS_MAX_RECORDS), default=JOB_BATCH_SIZE,
+                  show_default=True, envvar='JOBS_BATCH_SIZE', help='Tareas por lote.')
+    @click.option('--poll-interval', type=float, default=JOB_POLL_INTERVAL, show_default=True,
+                  help='Segundos de espera con la cola vacía.')
+    @click.option('--stale-after', type=int, default=JOB_STALE_AFTER, show_default=True,
+                  help='Segundos tras los que una tarea en curso se reencola al iniciar.')
+    @click.option('--drain', is_flag=True, help='Termina cuando la cola queda vacía.')
+    def jobs_worker(threads, batch_size, poll_interval, stale_after, drain):
+        """Procesa las tareas en cola (cambios de estatus asíncronos)."""
+        requeued = requeue_stale(stale_after)
+        if requeued:
+            click.echo(f'Tareas reencoladas: {requeued}')
+        processed = run_worker(current_app._get_current_object(), threads, batch_size, poll_interval, drain)
+        click.echo(f'Tareas procesadas: {processed}')
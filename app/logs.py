@@ -0,0 +1,261 @@
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from flask import g, has_request_context, request
+
+# Atributos estándar de LogRecord, para distinguir los campos pasados con ``extra``
+RESERVED_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+ACCESS_LOGGER = 'app.access'
+
+# Segundos entre cada vaciado de la cola de registros
+LOG_FLUSH_INTERVAL = 0.1
+
+# Listener del proceso; los handlers de la cola se comparten entre las aplicaciones creadas
+_listener = None
+_queue_handler = None
+
+
+class JSONFormatter(logging.Formatter):
+    """
+        Formatea cada registro como una línea JSON.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for name, value in vars(record).items():
+            if name not in RESERVED_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """
+        StreamHandler que escribe en el ``sys.stdout`` vigente en cada registro,
+        aunque haya sido reemplazado después de crear el handler. No hace flush
+        por registro: BatchQueueListener lo hace al final de cada lote.
+    """
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+        QueueHandler que encola el registro sin formatearlo, conservando los
+        campos ``extra``; el formateo queda a cargo del hilo del listener.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # La traza se convierte en texto aquí porque el traceback no debe cruzar de hilo
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class BatchQueueListener:
+    """
+        Hilo que vacía la cola de registros cada ``interval`` segundos.
+
+        A diferencia de QueueListener no espera bloqueado en la cola, por lo que
+        encolar un registro no despierta a ningún hilo: la petición sólo añade
+        el registro a la cola y los registros acumulados se escriben por lotes,
+        con un único flush por lote.
+    """
+
+    def __init__(self, queue, handler, interval=LOG_FLUSH_INTERVAL):
+        self.queue = queue
+        self.handler = handler
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.drain()
+
+    def drain(self):
+        wrote = False
+        while True:
+            try:
+                record = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record.levelno >= self.handler.level:
+                self.handler.handle(record)
+                wrote = True
+        if wrote:
+            self.handler.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.drain()
+
+
+class RequestContextFilter(logging.Filter):
+    """
+        Añade el id, el método y la ruta de la petición en curso a cada registro.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.route = request.url_rule.rule if request.url_rule is not None else None
+        return True
+
+
+def parse_levels(value):
+    """
+        Convierte ``LOG_LEVELS`` ("app.controllers=DEBUG,sqlalchemy.engine=INFO") en un diccionario.
+    """
+    levels = {}
+    for item in (value or '').split(','):
+        if item.strip():
+            name, _, level = item.partition('=')
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def start_listener(handler=None):
+    """
+        Arranca (una vez por proceso) el hilo que escribe los registros encolados.
+
+        Los loggers sólo encolan el registro, por lo que la petición nunca espera
+        a que se escriba; el formateo y la escritura ocurren en el hilo del listener.
+        :param handler: Handler final; por defecto líneas JSON en la salida estándar
+        :return: QueueHandler para añadir a los loggers
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        if handler is None:
+            handler = StdoutHandler()
+            handler.setFormatter(JSONFormatter())
+        log_queue = queue.SimpleQueue()
+        _queue_handler = RecordQueueHandler(log_queue)
+        _queue_handler.addFilter(RequestContextFilter())
+        _listener = BatchQueueListener(log_queue, handler)
+        _listener.start()
+        atexit.register(stop_listener)
+    return _queue_handler
+
+def restart_listener():
+    """
+        Vuelve a arrancar el hilo del listener en un proceso creado con fork
+        (gunicorn con ``preload_app``): el proceso hereda la cola y los
+        handlers, pero no el hilo.
+    """
+    if _listener is not None and not _listener._thread.is_alive():
+        _listener.start()
+
+def stop_listener():
+    """
+        Vacía la cola y detiene el hilo del listener.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger('app').removeHandler(_queue_handler)
+        _listener = None
+        _queue_handler = None
+
+def outcome(status_code):
+    """
+        Resultado de la petición según su código de respuesta.
+    """
+    if status_code >= 500:
+        return 'server_error'
+    if status_code >= 400:
+        return 'client_error'
+    return 'success'
+
+def configure_logging(app):
+    """
+        Configura el registro estructurado de la aplicación.
+
+        Los loggers del paquete ``app`` escriben líneas JSON a través de una
+        cola; cada petición recibe un id (el de la cabecera ``X-Request-ID`` o
+        uno nuevo), que se devuelve en la respuesta y se añade a todos sus
+        registros, y al terminar se registra en ``app.access`` con la ruta, el
+        código, la latencia y el resultado.
+
+        ``LOG_LEVEL`` fija el nivel del paquete (INFO) y ``LOG_LEVELS`` el de
+        loggers concretos, por ejemplo ``app.access=WARNING,app.utils=DEBUG``.
+        :param app: Aplicación Flask
+    """
+    logger = logging.getLogger('app')
+    logger.setLevel(app.config.get('LOG_LEVEL') or 'INFO')
+    logger.propagate = False
+    queue_handler = start_listener()
+    if queue_handler not in logger.handlers:
+        logger.addHandler(queue_handler)
+    for name, level in parse_levels(app.config.get('LOG_LEVELS')).items():
+        module_logger = logging.getLogger(name)
+        module_logger.setLevel(level)
+        # Los loggers de otras librerías (sqlalchemy.engine, ...) también escriben a través de la cola
+        if name != 'app' and not name.startswith('app.') and queue_handler not in module_logger.handlers:
+            module_logger.addHandler(queue_handler)
+            module_logger.propagate = False
+
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+
+    @app.before_request
+    def assign_request_id():
+        # 64 bits aleatorios bastan para correlacionar registros y evitan la llamada
+        # al sistema de uuid4 en cada petición
+        g.request_id = request.headers.get('X-Request-ID') or f'{random.getrandbits(64):016x}'
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        request_id = g.get('request_id')
+        if request_id is None:
+            return response
+        response.headers['X-Request-ID'] = request_id
+        if access_logger.isEnabledFor(logging.INFO):
+            access_logger.info('request', extra={
+                'status': response.status_code,
+                'latency_ms': round((time.perf_counter() - g.request_start) * 1000, 2),
+                'outcome': outcome(response.status_code)
+            })
+        return response
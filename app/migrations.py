@@ -0,0 +1,88 @@
+"""
+    Migraciones del esquema de la base de datos.
+
+    ``db.create_all()`` sólo crea las tablas que no existen, por lo que los
+    cambios sobre tablas ya creadas (por ejemplo índices nuevos) se aplican
+    aquí. Cada migración tiene un identificador ordenado y una función
+    ``upgrade(connection)``; las aplicadas se registran en la tabla
+    ``schema_migrations``. Las migraciones deben ser idempotentes, ya que en una
+    base de datos nueva ``create_all`` ya deja el esquema en su versión final.
+
+        flask --app run db-upgrade
+
+    ``setup_database`` hace ambas cosas; ``create_app`` la ejecuta al arrancar
+    salvo con ``DB_SETUP_ON_STARTUP=false``.
+"""
+import datetime
+import click
+from .models import db, Application, Grimorio
+from .stats import reconcile_statistics
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.String(100), primary_key=True),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+def create_indexes(*names):
+    """
+        Genera una migración que crea índices declarados en los modelos.
+        :param names: Nombres de los índices
+        :return: Función upgrade(connection)
+    """
+    def upgrade(connection):
+        indexes = {index.name: index for model in (Application, Grimorio) for index in model.__table__.indexes}
+        for name in names:
+            indexes[name].create(connection, checkfirst=True)
+    return upgrade
+
+MIGRATIONS = [
+    ('0001_indices_consultas_frecuentes', create_indexes(
+        'ix_grimorio_assignment',
+        'ix_application_status',
+        'ix_application_magical_affinity',
+        'ix_application_created_at'
+    )),
+    ('0002_contadores_estadisticas', reconcile_statistics),
+    ('0003_indice_edad', create_indexes('ix_application_age_id')),
+]
+
+def upgrade():
+    """
+        Aplica, en orden, las migraciones pendientes.
+        :return: Lista de migraciones aplicadas
+    """
+    schema_migrations.create(db.engine, checkfirst=True)
+    applied = []
+    with db.engine.begin() as connection:
+        done = set(connection.execute(db.select(schema_migrations.c.version)).scalars())
+        for version, migration in MIGRATIONS:
+            if version in done:
+                continue
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.datetime.now()))
+            applied.append(version)
+    return applied
+
+def setup_database():
+    """
+        Crea las tablas que no existen y aplica las migraciones pendientes.
+        :return: Lista de migraciones aplicadas
+    """
+    db.create_all()
+    return upgrade()
+
+def register_migrations(app):
+    """
+        Registra el comando ``flask db-upgrade``.
+        :param app: Aplicación Flask
+    """
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Crea las tablas que falten y aplica las migraciones pendientes del esquema."""
+        applied = setup_database()
+        for version in applied:
+            click.echo(f'Migración aplicada: {version}')
+        if not applied:
+            click.echo('El esquema ya está actualizado')
@@ -16,15 +16,21 @@ class Application(db.Model):
         magical_affinity: str
         created_at: datetime
         status: str
+        grimorio: Grimorio
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(20), nullable=False)
     lastname = db.Column(db.String(20), nullable=False)
     identity = db.Column(db.String(10), nullable=False, unique=True)
     age = db.Column(db.Integer, nullable=False)
-    magical_affinity = db.Column(db.String(20), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.datetime.now())
-    status = db.Column(db.String(20), default='Pending')
+    magical_affinity = db.Column(db.String(20), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.now, index=True)
+    status = db.Column(db.String(20), default='Pending', index=True)
+
+    grimorio = db.relationship('Grimorio', back_populates='application', uselist=False)
+
+    # Orden y filtros por edad (``orden=edad``, ``edad_min``, ``edad_max``) con el id como desempate
+    __table_args__ = (db.Index('ix_application_age_id', 'age', 'id'),)
 
     def serialize(self):
         return {
@@ -46,11 +52,14 @@ class Grimorio(db.Model):
         clover_type: str
         rarity: int
         assignment: str
+        application: Application
     """
     id = db.Column(db.Integer, primary_key=True)
     clover_type = db.Column(db.String(20), nullable=False)
     rarity = db.Column(db.Integer, nullable=False)
-    assignment = db.Column(db.String(10), db.ForeignKey('application.id'))
+    assignment = db.Column(db.String(10), db.ForeignKey('application.identity'), index=True)
+
+    application = db.relationship('Application', back_populates='grimorio')
 
     def serialize(self):
         return {
@@ -60,3 +69,86 @@ class Grimorio(db.Model):
             'assignment': self.assignment
         }
 
+class Statistic(db.Model):
+    """
+        Counter maintained in the same transaction as the writes, used by
+        the statistics endpoint instead of scanning the tables
+        Attributes:
+        ----------
+        category: str
+        key: str
+        count: int
+    """
+    category = db.Column(db.String(20), primary_key=True)
+    key = db.Column(db.String(40), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    """
+        Background task stored in the database, processed by ``flask jobs-worker``
+        Attributes:
+        ----------
+        id: int
+        kind: str
+        payload: dict
+        status: str
+        claimed_by: str
+        status_code: int
+        result: dict
+        created_at: datetime
+        started_at: datetime
+        finished_at: datetime
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending', index=True)
+    claimed_by = db.Column(db.String(32))
+    status_code = db.Column(db.Integer)
+    result = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def serialize(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'status_code': self.status_code,
+            'result': self.result,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class IdempotencyKey(db.Model):
+    """
+        Response stored for an Idempotency-Key, replayed on retries
+        Attributes:
+        ----------
+        key: str
+        fingerprint: str
+        status_code: int
+        body: bytes
+        mimetype: str
+        headers: dict
+        created_at: datetime
+    """
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer)
+    body = db.Column(db.LargeBinary)
+    mimetype = db.Column(db.String(100))
+    headers = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class CacheCounter(db.Model):
+    """
+        Counter shared by every process using the database (generation of the response cache)
+        Attributes:
+        ----------
+        key: str
+        value: int
+    """
+    key = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,116 @@
+import base64
+import datetime
+import json
+from urllib.parse import urlencode
+from flask import current_app, request
+from .serialization import serialize_rows
+
+# Número de registros por página si no se indica ``limit`` y máximo permitido
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def encode_cursor(values):
+    """
+        Codifica la clave de la última fila de una página como un token opaco.
+        :param values: Lista con los valores de la clave de ordenamiento
+        :return: Token en base64 apto para URL
+    """
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """
+        Decodifica un token generado por ``encode_cursor``.
+        :param token: Token recibido en el parámetro ``cursor``
+        :return: Lista con los valores de la clave de ordenamiento
+    """
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+    except (ValueError, TypeError):
+        raise ValueError('El cursor indicado es inválido')
+    if not isinstance(values, list) or not values:
+        raise ValueError('El cursor indicado es inválido')
+    return values
+
+def cursor_int(value):
+    """
+        Valida un valor entero del cursor (id o edad); los booleanos no se aceptan.
+        :param value: Valor decodificado del cursor
+        :return: El mismo valor
+    """
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError('El cursor indicado es inválido')
+    return value
+
+def parse_fields(args, available_fields):
+    """
+        Lee el parámetro ``fields`` de una petición de listado.
+        :param args: Parámetros de la query string
+        :param available_fields: Campos que se pueden solicitar, en su orden por defecto
+        :return: Lista de campos solicitados
+    """
+    fields = args.get('fields')
+    if not fields:
+        return list(available_fields)
+
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available_fields]
+    if unknown or not fields:
+        raise ValueError(f'Campos inválidos: {", ".join(unknown)}')
+    return fields
+
+def parse_page_args(args, available_fields):
+    """
+        Lee los parámetros de paginación y proyección de una petición de listado.
+        :param args: Parámetros de la query string
+        :param available_fields: Campos que se pueden solicitar, en su orden por defecto
+        :return: Tupla (limit, cursor, fields)
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('El parámetro limit debe ser un número entero')
+    if limit < 1 or limit > MAX_LIMIT:
+        raise ValueError(f'El parámetro limit debe estar entre 1 y {MAX_LIMIT}')
+
+    cursor = args.get('cursor')
+    if cursor:
+        cursor = decode_cursor(cursor)
+    else:
+        cursor = None
+
+    fields = parse_fields(args, available_fields)
+
+    return limit, cursor, fields
+
+def paginated_response(rows, fields, limit, key_size=1):
+    """
+        Construye la respuesta de una página de resultados.
+
+        Cada fila trae primero los campos solicitados y al final las
+        ``key_size`` columnas de la clave de ordenamiento, de modo que las filas
+        se serializan directamente desde las tuplas de la consulta. Se espera
+        recibir hasta ``limit + 1`` filas: si sobra una, existe una página
+        siguiente y su cursor se devuelve en las cabeceras ``X-Next-Cursor`` y
+        ``Link``.
+        :param rows: Filas obtenidas de la base de datos
+        :param fields: Nombres de los campos solicitados
+        :param limit: Tamaño de la página
+        :param key_size: Número de columnas de la clave de ordenamiento
+        :return: Respuesta JSON con la lista de registros
+    """
+    page = rows[:limit]
+    response = current_app.json.response(serialize_rows(fields, page))
+
+    if len(rows) > limit:
+        next_cursor = encode_cursor(list(page[-1][-key_size:]))
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        args['limit'] = limit
+        next_url = request.base_url + '?' + urlencode(args)
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
@@ -0,0 +1,28 @@
+from .models import db
+
+
+def fetch_rows(query):
+    """
+        Ejecuta una consulta de lectura por Core y devuelve sus filas.
+
+        La consulta se ejecuta sobre la conexión de la sesión (misma
+        transacción) pero sin pasar por el ORM: no se compila como consulta
+        ORM, no se construyen instancias ni se registran en el identity map.
+        Cada fila es una tupla con nombre (``Row``) con sólo las columnas
+        seleccionadas.
+        :param query: Consulta ``select`` de columnas
+        :return: Lista de filas
+    """
+    return db.session.connection().execute(query).all()
+
+def stream_rows(query, batch_size):
+    """
+        Ejecuta una consulta de lectura por Core y devuelve sus filas por lotes.
+
+        Con ``yield_per`` el driver usa un cursor del lado del servidor cuando
+        lo soporta, por lo que la memoria no crece con el tamaño del resultado.
+        :param query: Consulta ``select`` de columnas
+        :param batch_size: Filas por lote
+        :return: Resultado; ``partitions()`` devuelve los lotes y ``close()`` libera el cursor
+    """
+    return db.session.connection().execute(query.execution_options(yield_per=batch_size))
@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from .models import Application
-from .controllers import create_application, update_application, delete_application, update_application_status, get_applications_info, get_assignments_info
+from .controllers import create_application, create_applications_bulk, update_application, delete_application, update_application_status, update_applications_status, get_applications_info, get_assignments_info, export_applications_info, export_assignments_info, get_statistics_info
+from .export import accepts_gzip, parse_ndjson
+from .cache import cached_listing
+from .jobs import enqueue_status_change, get_job_info
+from .idempotency import idempotent
 
 bp = Blueprint('routes', __name__)
 
 @bp.route('/solicitud', methods=['POST'])
+@idempotent
 def create_request():
     """
     Crear una nueva solicitud de ingreso.
@@ -16,6 +21,11 @@ def create_request():
     tags:
       - Solicitudes
     parameters:
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Clave del cliente para reintentar sin duplicar; los reintentos repiten la primera respuesta.
       - in: body
         name: solicitud
         required: true
@@ -69,11 +79,63 @@ def create_request():
       400:
         description: Error en la validación de datos o solicitud inválida.
       409:
-        description: Ya existe una solicitud con esta identificación.
+        description: Ya existe una solicitud con esta identificación, o hay una petición en curso con la misma Idempotency-Key.
+      422:
+        description: La Idempotency-Key ya se usó con una petición distinta.
     """
     data = request.json
     return create_application(data)
 
+@bp.route('/solicitudes/bulk', methods=['POST'])
+def create_requests_bulk():
+    """
+    Crear varias solicitudes de ingreso.
+
+    Esta función permite registrar muchas solicitudes en una sola petición. El
+    cuerpo puede ser una lista JSON o NDJSON (Content-Type: application/x-ndjson,
+    una solicitud por línea). Todas las solicitudes válidas se insertan en una
+    única transacción y se devuelve el resultado de cada registro.
+
+    ---
+    tags:
+      - Solicitudes
+    consumes:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - in: body
+        name: solicitudes
+        required: true
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              nombre:
+                type: string
+              apellido:
+                type: string
+              identificacion:
+                type: string
+              edad:
+                type: integer
+              afinidad_magica:
+                type: string
+                enum: ["Oscuridad", "Luz", "Fuego", "Agua", "Viento", "Tierra"]
+    responses:
+      200:
+        description: Carga procesada. Cada resultado indica 201 (creada), 400 (datos inválidos) o 409 (identificación duplicada).
+      400:
+        description: El cuerpo no es una lista de solicitudes.
+      409:
+        description: Otra petición registró alguna de las identificaciones durante la carga; no se insertó ninguna solicitud.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        records = parse_ndjson(request.get_data(as_text=True))
+    else:
+        records = request.get_json(silent=True)
+    return create_applications_bulk(records)
+
 @bp.route('/solicitud/<int:id>', methods=['PUT'])
 def update_request(id):
     """
@@ -183,11 +245,14 @@ def delete_request(id):
     return delete_application(application)
 
 @bp.route('/solicitud/<int:id>/estatus', methods=['PATCH'])
+@idempotent
 def update_request_status(id):
     """
     Actualizar el estatus de una solicitud existente.
 
     Esta función permite actualizar el estatus de una solicitud de ingreso existente.
+    Con ASYNC_APPROVALS activo el cambio se encola y se responde 202 con el id de la
+    tarea, cuyo resultado se consulta en /jobs/{id}.
 
     ---
     tags:
@@ -199,6 +264,11 @@ def update_request_status(id):
       schema:
         type: integer
       description: ID de la solicitud a actualizar.
+    - in: header
+      name: Idempotency-Key
+      type: string
+      required: false
+      description: Clave del cliente para reintentar sin duplicar; los reintentos repiten la primera respuesta.
     - in: body
       name: estatus
       required: true
@@ -213,47 +283,280 @@ def update_request_status(id):
     responses:
       200:
         description: Estatus de solicitud actualizado correctamente.
+      202:
+        description: Cambio de estatus en cola (ASYNC_APPROVALS). Incluye job_id y la cabecera Location.
       400:
         description: Error en la validación de datos.
       404:
         description: Solicitud no encontrada.
       409:
-        description: No se puede modificar el estatus de esta solicitud.
+        description: No se puede modificar el estatus de esta solicitud, no quedan Grimorios disponibles o hay una petición en curso con la misma Idempotency-Key.
+      422:
+        description: La Idempotency-Key ya se usó con una petición distinta.
     """
     application = Application.query.get(id)
     if not application:
         return jsonify({'error': 'Solicitud no encontrada'}), 404
     data = request.json
+    if current_app.config.get('ASYNC_APPROVALS'):
+        return enqueue_status_change(data, application)
     return update_application_status(data, application)
 
+@bp.route('/jobs/<int:id>', methods=['GET'])
+def get_job(id):
+    """
+    Consultar una tarea en segundo plano.
+
+    Esta función permite consultar el estado de un cambio de estatus encolado y,
+    una vez procesado, su resultado: el código de estado y el cuerpo que habría
+    devuelto la petición síncrona.
+
+    ---
+    tags:
+      - Tareas
+    parameters:
+    - in: path
+      name: id
+      required: true
+      schema:
+        type: integer
+      description: ID de la tarea.
+    responses:
+      200:
+        description: Tarea con estatus pending, running, done o failed y, si terminó, status_code y result.
+      404:
+        description: Tarea no encontrada.
+    """
+    return get_job_info(id)
+
+@bp.route('/solicitudes/estatus', methods=['PATCH'])
+def update_requests_status():
+    """
+    Actualizar el estatus de varias solicitudes pendientes.
+
+    Esta función permite aprobar o rechazar en una sola transacción una lista de
+    solicitudes (ids) o todas las solicitudes pendientes de una afinidad mágica
+    (filtro). Al aprobar se asigna un Grimorio a cada solicitud. Las solicitudes
+    que no estén pendientes se omiten. Con filtro se procesan como máximo 10000
+    solicitudes por petición.
+
+    ---
+    tags:
+      - Solicitudes
+    parameters:
+    - in: body
+      name: estatus
+      required: true
+      schema:
+        type: object
+        properties:
+          estatus:
+            type: string
+            enum: ["aprobada", "rechazada"]
+          ids:
+            type: array
+            items:
+              type: integer
+          filtro:
+            type: object
+            properties:
+              afinidad_magica:
+                type: string
+                enum: ["Oscuridad", "Luz", "Fuego", "Agua", "Viento", "Tierra"]
+        required:
+          - estatus
+        example:
+          estatus: "aprobada"
+          filtro:
+            afinidad_magica: "Fuego"
+    responses:
+      200:
+        description: Estatus actualizado. Incluye los Grimorios asignados y, si se indicaron ids, las solicitudes omitidas.
+      400:
+        description: Error en la validación de datos.
+      409:
+        description: Otra petición modificó alguna de las solicitudes o no quedan Grimorios suficientes; no se actualizó ninguna.
+    """
+    data = request.get_json(silent=True)
+    return update_applications_status(data)
+
 @bp.route('/solicitudes', methods=['GET'])
+@cached_listing
 def get_requests():
     """
-    Obtener todas las solicitudes existentes.
+    Obtener las solicitudes existentes.
 
-    Esta función permite obtener todas las solicitudes de ingreso existentes.
+    Esta función permite obtener las solicitudes de ingreso existentes. Los filtros
+    y el orden se resuelven en la base de datos y el resultado se pagina con un cursor.
 
     ---
     tags:
       - Solicitudes
+    parameters:
+      - in: query
+        name: estatus
+        type: string
+        enum: ["pendiente", "aprobada", "rechazada"]
+        description: Estatus de la solicitud.
+      - in: query
+        name: afinidad_magica
+        type: string
+        enum: ["Oscuridad", "Luz", "Fuego", "Agua", "Viento", "Tierra"]
+        description: Afinidad mágica del estudiante.
+      - in: query
+        name: edad_min
+        type: integer
+        description: Edad mínima (inclusive).
+      - in: query
+        name: edad_max
+        type: integer
+        description: Edad máxima (inclusive).
+      - in: query
+        name: desde
+        type: string
+        format: date-time
+        description: Fecha de creación mínima (ISO 8601, inclusive).
+      - in: query
+        name: hasta
+        type: string
+        format: date-time
+        description: Fecha de creación máxima (ISO 8601, inclusive; con sólo la fecha incluye el día completo).
+      - in: query
+        name: orden
+        type: string
+        enum: ["id", "-id", "created_at", "-created_at", "edad", "-edad"]
+        default: id
+        description: Columna de ordenamiento; el prefijo - indica orden descendente.
+      - in: query
+        name: limit
+        type: integer
+        minimum: 1
+        maximum: 1000
+        default: 100
+        description: Número máximo de solicitudes a devolver.
+      - in: query
+        name: cursor
+        type: string
+        description: Cursor de la página siguiente, tomado de la cabecera X-Next-Cursor.
+      - in: query
+        name: fields
+        type: string
+        description: "Campos a devolver separados por coma (id, name, lastname, identity, age, magical_affinity, status)."
     responses:
       200:
-        description: Listado de solicitudes obtenidas correctamente.
+        description: Listado de solicitudes obtenidas correctamente. Si hay más resultados, la cabecera X-Next-Cursor contiene el cursor de la página siguiente.
+      304:
+        description: El listado no cambió desde el ETag enviado en If-None-Match.
+      400:
+        description: Filtros, orden o parámetros de paginación inválidos.
     """
-    return get_applications_info()
+    return get_applications_info(request.args)
 
 @bp.route('/asignaciones', methods=['GET'])
+@cached_listing
 def get_assignments():
     """
-    Obtener todas las asignaciones existentes.
+    Obtener las asignaciones existentes.
+
+    Esta función permite obtener las asignaciones de Grimorios existentes, paginadas por id.
+
+    ---
+    tags:
+      - Asignaciones
+    parameters:
+      - in: query
+        name: limit
+        type: integer
+        minimum: 1
+        maximum: 1000
+        default: 100
+        description: Número máximo de asignaciones a devolver.
+      - in: query
+        name: cursor
+        type: string
+        description: Cursor de la página siguiente, tomado de la cabecera X-Next-Cursor.
+      - in: query
+        name: fields
+        type: string
+        description: "Campos a devolver separados por coma (Nombre, Apellido, Identificación, Edad, Afinidad Mágica, Grimorio)."
+    responses:
+      200:
+        description: Listado de asignaciones obtenidas correctamente. Si hay más resultados, la cabecera X-Next-Cursor contiene el cursor de la página siguiente.
+      304:
+        description: El listado no cambió desde el ETag enviado en If-None-Match.
+      400:
+        description: Parámetros de paginación inválidos.
+    """
+    return get_assignments_info(request.args)
 
-    Esta función permite obtener todas las asignaciones de Grimorios existentes.
+@bp.route('/solicitudes/export', methods=['GET'])
+def export_requests():
+    """
+    Exportar todas las solicitudes existentes.
+
+    Esta función devuelve todas las solicitudes de ingreso como NDJSON (un objeto
+    JSON por línea) en streaming. Si el cliente envía Accept-Encoding: gzip la
+    respuesta se comprime al vuelo.
+
+    ---
+    tags:
+      - Solicitudes
+    produces:
+      - application/x-ndjson
+    parameters:
+      - in: query
+        name: fields
+        type: string
+        description: "Campos a exportar separados por coma (id, name, lastname, identity, age, magical_affinity, status)."
+    responses:
+      200:
+        description: Flujo NDJSON con todas las solicitudes.
+      400:
+        description: Campos inválidos.
+    """
+    return export_applications_info(request.args, accepts_gzip())
+
+@bp.route('/asignaciones/export', methods=['GET'])
+def export_assignments():
+    """
+    Exportar todas las asignaciones existentes.
+
+    Esta función devuelve todas las asignaciones de Grimorios como NDJSON (un
+    objeto JSON por línea) en streaming. Si el cliente envía Accept-Encoding: gzip
+    la respuesta se comprime al vuelo.
 
     ---
     tags:
       - Asignaciones
+    produces:
+      - application/x-ndjson
+    parameters:
+      - in: query
+        name: fields
+        type: string
+        description: "Campos a exportar separados por coma (Nombre, Apellido, Identificación, Edad, Afinidad Mágica, Grimorio)."
+    responses:
+      200:
+        description: Flujo NDJSON con todas las asignaciones.
+      400:
+        description: Campos inválidos.
+    """
+    return export_assignments_info(request.args, accepts_gzip())
+
+@bp.route('/estadisticas', methods=['GET'])
+def get_statistics():
+    """
+    Obtener las estadísticas de la academia.
+
+    Esta función devuelve el número de solicitudes por estatus y por afinidad
+    mágica, y el número de Grimorios por tipo de trébol. Los conteos se mantienen
+    en cada escritura, por lo que no se recorren las tablas.
+
+    ---
+    tags:
+      - Estadísticas
     responses:
       200:
-        description: Listado de asignaciones obtenidas correctamente.
+        description: Conteos de solicitudes y Grimorios.
     """
-    return get_assignments_info()
+    return get_statistics_info()
@@ -0,0 +1,139 @@
+import datetime
+from sqlalchemy import and_, or_
+from .models import Application
+from .pagination import cursor_int
+from .schemas import solicitud_schema
+
+AFFINITIES = solicitud_schema['properties']['afinidad_magica']['enum']
+
+# Estatus que se pueden filtrar; "pendiente" es un alias del valor almacenado
+STATUSES = {'pendiente': 'Pending', 'Pending': 'Pending', 'aprobada': 'aprobada', 'rechazada': 'rechazada'}
+
+# Columnas por las que se puede ordenar con ``orden=`` (``-`` indica descendente)
+SORT_COLUMNS = {
+    'id': Application.id,
+    'created_at': Application.created_at,
+    'edad': Application.age
+}
+
+
+def parse_int(args, name):
+    """
+        Lee un parámetro entero opcional de la query string.
+    """
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'El parámetro {name} debe ser un número entero')
+
+def parse_datetime(args, name):
+    """
+        Lee un parámetro de fecha ISO 8601 opcional de la query string.
+    """
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'El parámetro {name} debe ser una fecha ISO 8601')
+
+def parse_application_filters(args):
+    """
+        Convierte los filtros de la query string en condiciones SQL.
+
+        Filtros admitidos: estatus, afinidad_magica, edad_min, edad_max,
+        desde y hasta (fechas ISO 8601 sobre created_at, ambas inclusivas;
+        ``hasta`` con sólo la fecha incluye el día completo).
+        :param args: Parámetros de la query string
+        :return: Lista de condiciones para ``where``
+    """
+    criteria = []
+
+    status = args.get('estatus')
+    if status:
+        if status not in STATUSES:
+            raise ValueError(f'El estatus debe ser uno de: {", ".join(STATUSES)}')
+        criteria.append(Application.status == STATUSES[status])
+
+    affinity = args.get('afinidad_magica')
+    if affinity:
+        if affinity not in AFFINITIES:
+            raise ValueError(f'La afinidad mágica debe ser una de: {", ".join(AFFINITIES)}')
+        criteria.append(Application.magical_affinity == affinity)
+
+    min_age = parse_int(args, 'edad_min')
+    if min_age is not None:
+        criteria.append(Application.age >= min_age)
+    max_age = parse_int(args, 'edad_max')
+    if max_age is not None:
+        criteria.append(Application.age <= max_age)
+
+    since = parse_datetime(args, 'desde')
+    if since is not None:
+        criteria.append(Application.created_at >= since)
+    until = parse_datetime(args, 'hasta')
+    if until is not None:
+        if len(args['hasta']) == 10:
+            criteria.append(Application.created_at < until + datetime.timedelta(days=1))
+        else:
+            criteria.append(Application.created_at <= until)
+
+    return criteria
+
+def parse_sort(args):
+    """
+        Lee el parámetro ``orden``.
+        :param args: Parámetros de la query string
+        :return: Tupla (columna, descendente)
+    """
+    sort = args.get('orden') or 'id'
+    descending = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in SORT_COLUMNS:
+        raise ValueError(f'El orden debe ser uno de: {", ".join(SORT_COLUMNS)} (con - para descendente)')
+    return SORT_COLUMNS[name], descending
+
+def sort_key(column):
+    """
+        Columnas que identifican de forma única la posición de una fila.
+        Para columnas que se pueden repetir se añade el id como desempate.
+    """
+    if column is Application.id:
+        return [Application.id]
+    return [column, Application.id]
+
+def order_by(column, descending):
+    """
+        Cláusula ORDER BY para la columna y dirección indicadas.
+    """
+    return [key.desc() if descending else key.asc() for key in sort_key(column)]
+
+def keyset_condition(column, descending, cursor):
+    """
+        Condición que selecciona las filas posteriores al cursor.
+        :param column: Columna de ordenamiento
+        :param descending: Si el orden es descendente
+        :param cursor: Valores de la clave de la última fila de la página anterior
+        :return: Condición para ``where``
+    """
+    keys = sort_key(column)
+    if len(cursor) != len(keys):
+        raise ValueError('El cursor no corresponde al orden indicado')
+    try:
+        values = [datetime.datetime.fromisoformat(value) if key is Application.created_at else cursor_int(value)
+                  for key, value in zip(keys, cursor)]
+    except (TypeError, ValueError):
+        raise ValueError('El cursor indicado es inválido')
+
+    def after(key, value):
+        return key < value if descending else key > value
+
+    if len(keys) == 1:
+        return after(keys[0], values[0])
+    # La cota sobre la primera columna permite recorrer su índice desde el cursor
+    bound = keys[0] <= values[0] if descending else keys[0] >= values[0]
+    return and_(bound, or_(after(keys[0], values[0]), after(keys[1], values[1])))
@@ -0,0 +1,100 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_PROVIDERS = ('orjson', 'stdlib')
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+        Proveedor JSON de la biblioteca estándar.
+
+        Conserva el orden de las claves (los listados devuelven los campos en
+        el orden de ``fields``) y añade ``dumps_bytes`` y ``dumps_lines`` para
+        escribir las respuestas sin pasar por cadenas intermedias.
+    """
+    sort_keys = False
+
+    def dumps_bytes(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+    def dumps_lines(self, objs):
+        """
+            Serializa cada objeto en una línea (NDJSON).
+            :param objs: Iterable de objetos
+            :return: Bytes con un objeto JSON por línea
+        """
+        dumps = self.dumps
+        return ''.join(dumps(obj) + '\n' for obj in objs).encode('utf-8')
+
+
+class OrjsonProvider(JSONProvider):
+    """
+        Proveedor JSON sobre orjson.
+
+        Las fechas y las dataclasses se delegan en ``default`` para producir
+        exactamente la misma salida que el proveedor de Flask (fechas HTTP).
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            self.options |= orjson.OPT_SORT_KEYS
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options).decode('utf-8')
+
+    def dumps_bytes(self, obj, option=0):
+        return orjson.dumps(obj, default=self.default, option=self.options | option)
+
+    def dumps_lines(self, objs):
+        dumps, default, option = orjson.dumps, self.default, self.options | orjson.OPT_APPEND_NEWLINE
+        return b''.join([dumps(obj, default=default, option=option) for obj in objs])
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_APPEND_NEWLINE
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(self.dumps_bytes(obj, option), mimetype=self.mimetype)
+
+
+def create_json_provider(app):
+    """
+        Crea el proveedor JSON indicado en ``JSON_PROVIDER``.
+
+        Por defecto se usa orjson si está instalado y, si no, la biblioteca estándar.
+        :param app: Aplicación Flask
+        :return: Proveedor JSON para ``app.json``
+    """
+    name = app.config.get('JSON_PROVIDER') or ('orjson' if orjson is not None else 'stdlib')
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f'JSON_PROVIDER debe ser uno de: {", ".join(JSON_PROVIDERS)}')
+    if name == 'orjson':
+        if orjson is None:
+            raise RuntimeError('JSON_PROVIDER=orjson requiere el paquete orjson')
+        return OrjsonProvider(app)
+    return JSONProvider(app)
+
+def serialize_rows(fields, rows):
+    """
+        Convierte filas de una consulta en diccionarios sin construir objetos del ORM.
+
+        Las filas pueden traer columnas adicionales al final (por ejemplo la
+        clave de paginación); ``zip`` se detiene en el último campo.
+        :param fields: Nombres de los campos, en el orden de las columnas
+        :param rows: Filas (tuplas) de la consulta
+        :return: Lista de diccionarios
+    """
+    return [dict(zip(fields, row)) for row in rows]
@@ -0,0 +1,103 @@
+from collections import Counter
+import click
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import db, Application, Grimorio, Statistic
+
+# Categorías de los contadores
+STATUS = 'estatus'
+AFFINITY = 'afinidad_magica'
+CLOVER = 'trebol'
+
+
+def upsert_statement(dialect_name):
+    """
+        INSERT ... ON CONFLICT DO UPDATE que suma el incremento al contador.
+        Es atómico, por lo que dos transacciones concurrentes no pierden incrementos.
+        :param dialect_name: Nombre del dialecto de la base de datos
+        :return: Sentencia para ejecutar con filas {category, key, count}
+    """
+    insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+    statement = insert(Statistic)
+    return statement.on_conflict_do_update(
+        index_elements=[Statistic.category, Statistic.key],
+        set_={'count': Statistic.count + statement.excluded['count']}
+    )
+
+def bump_statistics(changes):
+    """
+        Aplica incrementos a los contadores dentro de la transacción actual.
+        No confirma la transacción: se confirma junto con la escritura que los origina.
+        :param changes: Diccionario (categoría, clave) -> incremento
+    """
+    rows = [{'category': category, 'key': key, 'count': delta}
+            for (category, key), delta in changes.items() if delta]
+    if rows:
+        db.session.execute(upsert_statement(db.session.get_bind().dialect.name), rows)
+
+def ensure_statistics(keys):
+    """
+        Crea con valor 0 los contadores que todavía no existen, sin tocar los demás.
+        :param keys: Lista de (categoría, clave)
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+    db.session.execute(insert(Statistic).on_conflict_do_nothing(index_elements=[Statistic.category, Statistic.key]),
+                       [{'category': category, 'key': key, 'count': 0} for category, key in keys])
+
+def application_changes(status=None, affinity=None, delta=1):
+    """
+        Incrementos correspondientes a crear (delta=1) o eliminar (delta=-1) una solicitud.
+    """
+    changes = Counter()
+    if status is not None:
+        changes[(STATUS, status)] += delta
+    if affinity is not None:
+        changes[(AFFINITY, affinity)] += delta
+    return changes
+
+def get_statistics():
+    """
+        Lee todos los contadores con una sola consulta.
+        :return: Diccionario con los conteos de solicitudes y Grimorios
+    """
+    statistics = {
+        'solicitudes': {'total': 0, STATUS: {}, AFFINITY: {}},
+        'grimorios': {'total': 0, CLOVER: {}}
+    }
+    for category, key, count in db.session.execute(db.select(Statistic.category, Statistic.key, Statistic.count)
+                                                   .order_by(Statistic.category, Statistic.key)):
+        group = statistics['grimorios'] if category == CLOVER else statistics['solicitudes']
+        group.setdefault(category, {})[key] = count
+    statistics['solicitudes']['total'] = sum(statistics['solicitudes'][STATUS].values())
+    statistics['grimorios']['total'] = sum(statistics['grimorios'][CLOVER].values())
+    return statistics
+
+def reconcile_statistics(connection):
+    """
+        Recalcula todos los contadores desde cero a partir de las tablas.
+        :param connection: Conexión con una transacción abierta
+        :return: Número de contadores escritos
+    """
+    rows = []
+    for category, column in [(STATUS, Application.status), (AFFINITY, Application.magical_affinity)]:
+        for key, count in connection.execute(db.select(column, db.func.count()).group_by(column)):
+            rows.append({'category': category, 'key': key, 'count': count})
+    for key, count in connection.execute(db.select(Grimorio.clover_type, db.func.count()).group_by(Grimorio.clover_type)):
+        rows.append({'category': CLOVER, 'key': key, 'count': count})
+
+    connection.execute(db.delete(Statistic))
+    if rows:
+        connection.execute(db.insert(Statistic), rows)
+    return len(rows)
+
+def register_statistics(app):
+    """
+        Registra el comando ``flask stats-reconcile``.
+        :param app: Aplicación Flask
+    """
+    @app.cli.command('stats-reconcile')
+    def stats_reconcile():
+        """Recalcula los contadores de estadísticas desde las tablas."""
+        with db.engine.begin() as connection:
+            count = reconcile_statistics(connection)
+        click.echo(f'Contadores recalculados: {count}')
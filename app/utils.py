@@ -1,28 +1,40 @@
+import logging
 from .models import db, Application, Grimorio
-import random
+from .cache import invalidate_listings
+from .allocation import allocate_clover_types
 
-# Un trébol de una o dos hojas es común, uno de tres es poco habitual, 
-# uno de cuatro es inusual, y uno de cinco hojas muy raro.
-CLOVERS = {
-    'Trébol una hoja': 4,
-    'Trébol dos hojas': 3,
-    'Trébol tres hojas': 2,
-    'Trébol cuatro hojas': 1,
-    'Trébol cinco hojas': 0.5
-}
+logger = logging.getLogger(__name__)
 
-def assign_grimorio(application):
+
+def assign_grimorio(application, commit=True):
     """
         Asigna un Grimorio a una solicitud de magia
+        :param application: Solicitud a la que se asigna el Grimorio
+        :param commit: Si es False el Grimorio queda en la transacción del llamador
+        :return: Tipo de trébol asignado
+        :raises GrimorioStockExhausted: Si no quedan Grimorios dentro de las cuotas
     """
-    print('assign')
-    clover_types = list(CLOVERS.keys())
-    ponderaciones = list(CLOVERS.values())
-    
-    assigned_type = random.choices(clover_types, weights=ponderaciones, k=1)[0]
+    assigned_type = allocate_clover_types(1)[0]
+    logger.debug('Grimorio asignado', extra={'identity': application.identity, 'clover_type': assigned_type})
 
     grimorio = Grimorio(clover_type=assigned_type, rarity=assigned_type, assignment=application.identity)
     db.session.add(grimorio)
-    db.session.commit()
+    if commit:
+        db.session.commit()
+        invalidate_listings()
     return f'{assigned_type}'
 
+def assign_grimorios(identities):
+    """
+        Asigna Grimorios a varias solicitudes con un único sorteo y una única inserción.
+        No confirma la transacción: el llamador decide cuándo hacer commit.
+        :param identities: Identificaciones de las solicitudes
+        :return: Diccionario identificación -> tipo de trébol asignado
+    """
+    assigned_types = allocate_clover_types(len(identities))
+    if identities:
+        db.session.execute(db.insert(Grimorio), [
+            {'clover_type': assigned_type, 'rarity': assigned_type, 'assignment': identity}
+            for identity, assigned_type in zip(identities, assigned_types)
+        ])
+    return dict(zip(identities, assigned_types))
@@ -0,0 +1,107 @@
+import re
+from jsonschema import Draft7Validator
+from jsonschema.exceptions import best_match
+from .schemas import solicitud_schema
+
+# Palabras clave que sabe traducir el validador rápido
+FAST_PATH_KEYWORDS = {'type', 'properties', 'required', 'pattern', 'maxLength', 'minLength', 'minimum', 'maximum', 'enum'}
+
+
+def compile_fast_check(schema):
+    """
+        Genera una función que comprueba rápidamente si una instancia es válida.
+
+        La función es conservadora: si devuelve True la instancia es válida
+        según el esquema, pero si devuelve False puede tratarse de un caso que
+        sólo jsonschema sabe resolver (por ejemplo 1.0 como entero), por lo que
+        la decisión final y el mensaje de error quedan a cargo de jsonschema.
+        :param schema: Esquema JSON
+        :return: Función instancia -> bool, o None si el esquema usa palabras clave no soportadas
+    """
+    if not isinstance(schema, dict) or not set(schema) <= FAST_PATH_KEYWORDS:
+        return None
+
+    checks = []
+    schema_type = schema.get('type')
+    if schema_type == 'object':
+        checks.append(lambda value: type(value) is dict)
+    elif schema_type == 'string':
+        checks.append(lambda value: type(value) is str)
+    elif schema_type == 'integer':
+        checks.append(lambda value: type(value) is int)
+    elif schema_type is not None:
+        return None
+
+    if 'pattern' in schema:
+        pattern = re.compile(schema['pattern'])
+        checks.append(lambda value: type(value) is str and pattern.search(value) is not None)
+    if 'minLength' in schema:
+        min_length = schema['minLength']
+        checks.append(lambda value: type(value) is str and len(value) >= min_length)
+    if 'maxLength' in schema:
+        max_length = schema['maxLength']
+        checks.append(lambda value: type(value) is str and len(value) <= max_length)
+    if 'minimum' in schema:
+        minimum = schema['minimum']
+        checks.append(lambda value: type(value) in (int, float) and value >= minimum)
+    if 'maximum' in schema:
+        maximum = schema['maximum']
+        checks.append(lambda value: type(value) in (int, float) and value <= maximum)
+    if 'enum' in schema:
+        if not all(type(option) is str for option in schema['enum']):
+            return None
+        options = frozenset(schema['enum'])
+        checks.append(lambda value: type(value) is str and value in options)
+    if 'required' in schema:
+        required = tuple(schema['required'])
+        checks.append(lambda value: type(value) is dict and all(name in value for name in required))
+    if 'properties' in schema:
+        properties = []
+        for name, subschema in schema['properties'].items():
+            subcheck = compile_fast_check(subschema)
+            if subcheck is None:
+                return None
+            properties.append((name, subcheck))
+        checks.append(lambda value: type(value) is dict and all(
+            name not in value or subcheck(value[name]) for name, subcheck in properties))
+
+    checks = tuple(checks)
+    return lambda value: all(check(value) for check in checks)
+
+
+class CompiledValidator:
+    """
+        Validador de un esquema JSON compilado una sola vez.
+
+        El esquema se verifica y se construye la instancia de Draft7Validator
+        al crear el objeto; cada validación prueba primero el validador rápido
+        y sólo recurre a jsonschema cuando éste no puede confirmar la instancia.
+    """
+
+    def __init__(self, schema):
+        Draft7Validator.check_schema(schema)
+        self.schema = schema
+        self.validator = Draft7Validator(schema)
+        self.fast_check = compile_fast_check(schema)
+
+    def error_for(self, instance):
+        """
+            Devuelve el error de validación más relevante de la instancia.
+            :param instance: Datos a validar
+            :return: ValidationError o None si la instancia es válida
+        """
+        if self.fast_check is not None and self.fast_check(instance):
+            return None
+        return best_match(self.validator.iter_errors(instance))
+
+    def validate(self, instance):
+        """
+            Valida la instancia y lanza ValidationError si no cumple el esquema.
+            :param instance: Datos a validar
+        """
+        error = self.error_for(instance)
+        if error is not None:
+            raise error
+
+
+solicitud_validator = CompiledValidator(solicitud_schema)
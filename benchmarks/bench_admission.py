@@ -0,0 +1,71 @@
+"""
+    Latencia de POST /solicitud mientras unos pocos clientes piden listados
+    grandes (GET /solicitudes?limit=1000) sin pausa, con y sin control de
+    admisión (ADMISSION_CONTROL), sobre gunicorn con varios workers.
+
+        python -m benchmarks.bench_admission --listing-clients 16 --writers 4
+"""
+import argparse
+import itertools
+import shutil
+import threading
+from app import db
+from .common import gunicorn_server, make_app, report, run_load, sample_application, seed_database
+
+SCENARIOS = {
+    'without_admission': {'ADMISSION_CONTROL': 'false'},
+    'with_admission': {'ADMISSION_CONTROL': 'true', 'ADMISSION_CLIENT_HEADER': 'X-Client-ID'}
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--listing-clients', type=int, default=16)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    results = {'rows': args.rows, 'listing_clients': args.listing_clients, 'writers': args.writers,
+               'workers': args.workers, 'threads': args.threads}
+    for number, (name, scenario) in enumerate(SCENARIOS.items()):
+        app, tmpdir = make_app()
+        try:
+            seed_database(app, args.rows)
+            with app.app_context():
+                db.engine.dispose()
+            env = {
+                'SERVER_MODE': 'gthread',
+                'DATABASE_URL': app.config['SQLALCHEMY_DATABASE_URI'],
+                'WEB_CONCURRENCY': str(args.workers),
+                'WEB_THREADS': str(args.threads),
+                'LOG_LEVEL': 'WARNING',
+                **scenario
+            }
+            identities = itertools.count(args.rows + (number + 1) * 10 ** 7)
+
+            def listing(client, sequence):
+                # Cuatro clientes distintos; ``page`` evita la caché de respuestas
+                return ('GET', f'/solicitudes?limit=1000&page={client}-{sequence}', None,
+                        {'X-Client-ID': f'cliente-{client % 4}'})
+
+            def write(client, sequence):
+                return 'POST', '/solicitud', sample_application(next(identities)), {'X-Client-ID': f'escritor-{client}'}
+
+            with gunicorn_server(env) as base_url:
+                outcome = {}
+                load = threading.Thread(target=lambda: outcome.update(listings=run_load(
+                    base_url, listing, concurrency=args.listing_clients, duration=args.duration)))
+                load.start()
+                outcome['writes'] = run_load(base_url, write, concurrency=args.writers, duration=args.duration)
+                load.join()
+                results[name] = outcome
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+    Costo del sorteo de tipos de trébol: random.choices por Grimorio (el
+    sorteo anterior) contra la tabla de alias precalculada, de a uno y por lotes.
+
+        python -m benchmarks.bench_allocation --draws 100000
+"""
+import argparse
+import random
+import time
+from app.allocation import CLOVERS, AliasSampler
+from .common import report
+
+TYPES = list(CLOVERS)
+CUM_WEIGHTS = [sum(list(CLOVERS.values())[:i + 1]) for i in range(len(CLOVERS))]
+
+
+def per_draw_ns(function, draws):
+    start = time.perf_counter()
+    function()
+    return round((time.perf_counter() - start) * 1e9 / draws, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--draws', type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    sampler = AliasSampler(CLOVERS, random.Random(1))
+    results = {'draws': args.draws, 'per_draw_ns': {
+        'choices_single': per_draw_ns(lambda: [rng.choices(TYPES, cum_weights=CUM_WEIGHTS)[0] for _ in range(args.draws)], args.draws),
+        'choices_batch': per_draw_ns(lambda: rng.choices(TYPES, cum_weights=CUM_WEIGHTS, k=args.draws), args.draws),
+        'alias_single': per_draw_ns(lambda: [sampler.draw(1)[0] for _ in range(args.draws)], args.draws),
+        'alias_batch': per_draw_ns(lambda: sampler.draw(args.draws), args.draws)
+    }}
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""
+    Compara el registro de solicitudes una a una (POST /solicitud) contra la
+    carga masiva (POST /solicitudes/bulk).
+
+        python -m benchmarks.bench_bulk_intake --records 10000
+"""
+import argparse
+from .common import make_app, sample_application, timer, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=10000)
+    args = parser.parse_args()
+
+    records = [sample_application(i) for i in range(args.records)]
+    results = {'records': args.records}
+
+    app, _ = make_app()
+    client = app.test_client()
+    with timer(results, 'per_request_seconds'):
+        for record in records:
+            response = client.post('/solicitud', json=record)
+            assert response.status_code == 201, response.data
+
+    app, _ = make_app()
+    client = app.test_client()
+    with timer(results, 'bulk_seconds'):
+        response = client.post('/solicitudes/bulk', json=records)
+    assert response.get_json()['created'] == args.records, response.data
+
+    results['per_request_per_second'] = round(args.records / results['per_request_seconds'])
+    results['bulk_per_second'] = round(args.records / results['bulk_seconds'])
+    results['speedup'] = round(results['per_request_seconds'] / results['bulk_seconds'], 1)
+    report(results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+    Benchmark de carga de los endpoints de la API.
+
+    Para cada volumen indicado siembra una base SQLite en disco con ese número
+    de solicitudes (la fracción ``--approved`` aprobadas y con Grimorio),
+    arranca gunicorn con gunicorn.conf.py y ejecuta cada ruta durante
+    ``--duration`` segundos con ``--clients`` clientes concurrentes.
+
+    Por ruta se informa el rendimiento (peticiones por segundo), las latencias
+    p50/p95/p99 y el número de consultas SQL por petición, medido dentro del
+    proceso sobre la misma base antes de arrancar el servidor.
+
+        python -m benchmarks.bench_endpoints --sizes 1000 100000 1000000 --output resultados.json
+"""
+import argparse
+import itertools
+import json
+import random
+import shutil
+import time
+from app import db
+from .common import (AFFINITIES, count_queries, gunicorn_server, make_app, report, run_load,
+                     sample_application, seed_database)
+
+# Consultas a las que se añade un parámetro único para medir el servidor y no la caché de respuestas
+CACHE_BUSTER = 'bench'
+
+
+class Scenarios:
+    """
+        Peticiones de cada ruta sobre una base sembrada con ``size`` solicitudes.
+
+        Las solicitudes 1..approved están aprobadas. Las pendientes se reparten
+        en tercios: el primero se consume al aprobar, el último al eliminar y el
+        central se modifica con PUT, para que cada petición encuentre una
+        solicitud en el estado que espera. Si la carga agota un tercio, las
+        peticiones siguientes aparecen como 404 o 409 en ``status_codes``.
+    """
+
+    def __init__(self, size, approved, cached=False):
+        self.size = size
+        self.approved = approved
+        self.cached = cached
+        self.new_identities = itertools.count(size + 10 ** 8)
+        self.pending_to_approve = itertools.count(approved + 1)
+        self.pending_to_delete = itertools.count(size, -1)
+        self.unique = itertools.count()
+        third = (size - approved) // 3
+        self.updatable = (approved + third + 1, max(approved + third + 1, size - third))
+
+    def listing_path(self, path, query):
+        if not self.cached:
+            query += f'&{CACHE_BUSTER}={next(self.unique)}'
+        return f'{path}?{query}'
+
+    def create(self, client, sequence):
+        return 'POST', '/solicitud', sample_application(next(self.new_identities))
+
+    def update(self, client, sequence):
+        id = random.randint(*self.updatable)
+        record = dict(sample_application(id - 1), edad=random.randint(15, 40))
+        return 'PUT', f'/solicitud/{id}', record
+
+    def delete(self, client, sequence):
+        return 'DELETE', f'/solicitud/{next(self.pending_to_delete)}', None
+
+    def approve(self, client, sequence):
+        return 'PATCH', f'/solicitud/{next(self.pending_to_approve)}/estatus', {'estatus': 'aprobada'}
+
+    def list_applications(self, client, sequence):
+        affinity = AFFINITIES[sequence % len(AFFINITIES)]
+        return 'GET', self.listing_path('/solicitudes', f'limit=100&afinidad_magica={affinity}&orden=-created_at'), None
+
+    def list_assignments(self, client, sequence):
+        return 'GET', self.listing_path('/asignaciones', 'limit=100'), None
+
+    def statistics(self, client, sequence):
+        return 'GET', '/estadisticas', None
+
+    def swagger(self, client, sequence):
+        return 'GET', '/apidocs/swagger.json', None
+
+    def export_applications(self, client, sequence):
+        affinity = AFFINITIES[sequence % len(AFFINITIES)]
+        return 'GET', f'/solicitudes/export?afinidad_magica={affinity}', None
+
+    def export_assignments(self, client, sequence):
+        return 'GET', '/asignaciones/export', None
+
+
+ROUTES = {
+    'POST /solicitud': 'create',
+    'PUT /solicitud/<id>': 'update',
+    'PATCH /solicitud/<id>/estatus': 'approve',
+    'DELETE /solicitud/<id>': 'delete',
+    'GET /solicitudes': 'list_applications',
+    'GET /asignaciones': 'list_assignments',
+    'GET /estadisticas': 'statistics',
+    'GET /apidocs/swagger.json': 'swagger',
+    'GET /solicitudes/export': 'export_applications',
+    'GET /asignaciones/export': 'export_assignments'
+}
+
+# Las exportaciones recorren la tabla completa; se incluyen sólo si se piden con --routes
+DEFAULT_ROUTES = [name for name in ROUTES if not name.endswith('/export')]
+
+
+def measure_queries(app, make_request, samples):
+    """
+        Ejecuta ``samples`` peticiones con el cliente de pruebas y cuenta sus consultas SQL.
+        :return: Diccionario con el mínimo, la media y el máximo de consultas por petición
+    """
+    client = app.test_client()
+    counts = []
+    with app.app_context():
+        engine = db.engine
+    for sequence in range(samples):
+        method, path, body = make_request(0, sequence)
+        with count_queries(engine) as queries:
+            client.open(path, method=method, json=body)
+        counts.append(queries[0])
+    return {'min': min(counts), 'mean': round(sum(counts) / len(counts), 2), 'max': max(counts)}
+
+def benchmark_size(size, args):
+    """
+        Siembra una base con ``size`` solicitudes y mide cada ruta contra gunicorn.
+    """
+    app, tmpdir = make_app()
+    try:
+        approved = int(size * args.approved)
+        started = time.perf_counter()
+        seed_database(app, size, grimorios=approved)
+        result = {'seed_seconds': round(time.perf_counter() - started, 2), 'approved': approved, 'routes': {}}
+
+        scenarios = Scenarios(size, approved, cached=args.cached)
+        for name in args.routes:
+            make_request = getattr(scenarios, ROUTES[name])
+            result['routes'][name] = {'queries_per_request': measure_queries(app, make_request, args.query_samples)}
+        with app.app_context():
+            db.engine.dispose()
+
+        env = {
+            'SERVER_MODE': args.mode,
+            'DATABASE_URL': app.config['SQLALCHEMY_DATABASE_URI'],
+            'WEB_CONCURRENCY': str(args.workers),
+            'WEB_THREADS': str(args.threads)
+        }
+        with gunicorn_server(env) as base_url:
+            for name in args.routes:
+                make_request = getattr(scenarios, ROUTES[name])
+                result['routes'][name].update(run_load(base_url, make_request, concurrency=args.clients,
+                                                       duration=args.duration))
+        return result
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000])
+    parser.add_argument('--approved', type=float, default=0.5, help='Fracción de solicitudes aprobadas con Grimorio')
+    parser.add_argument('--routes', nargs='+', choices=list(ROUTES), default=DEFAULT_ROUTES, metavar='RUTA')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0, help='Segundos por ruta')
+    parser.add_argument('--mode', choices=['sync', 'gthread'], default='gthread')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--query-samples', type=int, default=10)
+    parser.add_argument('--cached', action='store_true', help='Repetir las mismas URLs de listado (mide la caché)')
+    parser.add_argument('--output', help='Archivo donde guardar también los resultados')
+    args = parser.parse_args()
+
+    results = {
+        'config': {name: value for name, value in vars(args).items() if name != 'output'},
+        'sizes': {str(size): benchmark_size(size, args) for size in args.sizes}
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2, ensure_ascii=False)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+    Costo por petición del registro estructurado.
+
+    Compara la misma petición (GET /estadisticas) con el registro desactivado,
+    con el handler de cola de la aplicación y con un handler síncrono que
+    formatea y escribe el JSON en el hilo de la petición. Los registros se
+    escriben en un archivo temporal.
+
+    Como la duración de una petición completa varía más que el costo del
+    registro, también se mide aparte el costo de emitir el registro de acceso
+    (``record_*_us``) dentro del contexto de una petición.
+
+        python -m benchmarks.bench_logging --requests 2000 --rounds 5
+"""
+import argparse
+import logging
+import os
+import shutil
+import time
+from contextlib import redirect_stdout
+from app.logs import ACCESS_LOGGER, JSONFormatter, RequestContextFilter, start_listener
+from .common import make_app, report
+
+
+def time_requests(client, requests):
+    """
+        Devuelve los microsegundos promedio por petición.
+    """
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get('/estadisticas')
+        assert response.status_code == 200, response.data
+    return (time.perf_counter() - start) / requests * 1e6
+
+def time_records(app, records):
+    """
+        Devuelve los microsegundos promedio por registro de acceso emitido.
+    """
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    with app.test_request_context('/estadisticas'):
+        start = time.perf_counter()
+        for _ in range(records):
+            access_logger.info('request', extra={'status': 200, 'latency_ms': 1.0, 'outcome': 'success'})
+        return (time.perf_counter() - start) / records * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    app, tmpdir = make_app()
+    client = app.test_client()
+    logger = logging.getLogger('app')
+    results = {'requests': args.requests, 'rounds': args.rounds}
+    log_path = os.path.join(tmpdir, 'app.log')
+
+    try:
+        with open(log_path, 'w', encoding='utf-8') as log_file, redirect_stdout(log_file):
+            sync_handler = logging.StreamHandler(log_file)
+            sync_handler.setFormatter(JSONFormatter())
+            sync_handler.addFilter(RequestContextFilter())
+
+            def disabled(measure):
+                logger.setLevel(logging.CRITICAL)
+                try:
+                    return measure()
+                finally:
+                    logger.setLevel(logging.INFO)
+
+            def queued(measure):
+                return measure()
+
+            def synchronous(measure):
+                queue_handler = start_listener()
+                logger.removeHandler(queue_handler)
+                logger.addHandler(sync_handler)
+                try:
+                    return measure()
+                finally:
+                    logger.removeHandler(sync_handler)
+                    logger.addHandler(queue_handler)
+
+            logger.setLevel(logging.INFO)
+            # Calentamiento: compila las consultas y llena la caché de sentencias
+            time_requests(client, 100)
+            # Las variantes se alternan en varias rondas y se toma el mejor tiempo de cada una
+            modes = {'disabled': disabled, 'queue': queued, 'sync': synchronous}
+            measures = {
+                'request': lambda: time_requests(client, args.requests),
+                'record': lambda: time_records(app, args.requests * 10)
+            }
+            timings = {f'{measure}_{mode}_us': [] for measure in measures for mode in modes}
+            for _ in range(args.rounds):
+                for mode, run in modes.items():
+                    for measure, function in measures.items():
+                        timings[f'{measure}_{mode}_us'].append(run(function))
+            results.update({name: round(min(values), 1) for name, values in timings.items()})
+
+        results['request_overhead_queue_us'] = round(results['request_queue_us'] - results['request_disabled_us'], 1)
+        results['request_overhead_sync_us'] = round(results['request_sync_us'] - results['request_disabled_us'], 1)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+    Memoria y asignaciones por fila al leer todas las solicitudes para
+    serializarlas, con cada una de las formas de lectura:
+
+        orm_objects    Application.query.all() y serialize() (instancias del ORM)
+        orm_columns    db.session.execute(select de columnas) (ORM, sin instancias)
+        core_rows      fetch_rows(select de columnas) (Core, filas Row)
+        dbapi_tuples   fetchall() del cursor del driver (referencia: tuplas sin procesar)
+
+    Se informan los bytes por fila retenidos y en el pico (tracemalloc), los
+    bloques de memoria vivos por fila y el tiempo de lectura y serialización.
+
+        python -m benchmarks.bench_read_model --rows 100000
+"""
+import argparse
+import gc
+import shutil
+import time
+import tracemalloc
+from app import db
+from app.controllers import APPLICATION_FIELDS
+from app.models import Application
+from app.read_model import fetch_rows
+from app.serialization import serialize_rows
+from .common import make_app, report, seed_database
+
+FIELDS = list(APPLICATION_FIELDS)
+QUERY = db.select(*APPLICATION_FIELDS.values())
+
+READERS = {
+    'orm_objects': lambda: Application.query.all(),
+    'orm_columns': lambda: db.session.execute(QUERY).all(),
+    'core_rows': lambda: fetch_rows(QUERY),
+    'dbapi_tuples': lambda: db.session.connection().execute(QUERY).cursor.fetchall()
+}
+
+
+def serialize(rows):
+    if rows and isinstance(rows[0], Application):
+        return [row.serialize() for row in rows]
+    return serialize_rows(FIELDS, rows)
+
+def measure(reader):
+    """
+        Lee y serializa todas las filas con ``reader`` midiendo memoria y tiempo.
+    """
+    db.session.expunge_all()
+    db.session.commit()
+    gc.collect()
+
+    traced = tracemalloc.get_traced_memory
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = reader()
+    read_seconds = time.perf_counter() - start
+    retained, _ = traced()
+    live_blocks = len(tracemalloc.take_snapshot().traces)
+    start = time.perf_counter()
+    serialize(rows)
+    total_seconds = read_seconds + time.perf_counter() - start
+    _, peak = traced()
+    tracemalloc.stop()
+
+    count = len(rows)
+    del rows
+    return {
+        'retained_bytes_per_row': round(retained / count, 1),
+        'peak_bytes_per_row': round(peak / count, 1),
+        'live_blocks_per_row': round(live_blocks / count, 2),
+        'read_ms': round(read_seconds * 1000, 1),
+        'read_and_serialize_ms': round(total_seconds * 1000, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    app, tmpdir = make_app()
+    try:
+        seed_database(app, args.rows)
+        results = {'rows': args.rows}
+        with app.app_context():
+            for name, reader in READERS.items():
+                results[name] = measure(reader)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
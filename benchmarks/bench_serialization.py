@@ -0,0 +1,78 @@
+"""
+    Compara los proveedores JSON (biblioteca estándar y orjson) al servir los
+    listados: la serialización de una página de 1000 filas, la petición
+    completa GET /solicitudes?limit=1000 y la exportación NDJSON.
+
+        python -m benchmarks.bench_serialization --rows 20000
+"""
+import argparse
+import shutil
+import time
+from flask.json.provider import DefaultJSONProvider
+from app import create_app, db
+from app.controllers import APPLICATION_FIELDS
+from app.serialization import serialize_rows
+from .common import make_app, report, seed_database
+
+PROVIDERS = ['stdlib', 'orjson']
+
+
+def best_of(function, repeat):
+    """
+        Mejor tiempo (en milisegundos) de ``repeat`` ejecuciones.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return round(min(timings), 3)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    seeded, tmpdir = make_app()
+    try:
+        seed_database(seeded, args.rows)
+        database_uri = seeded.config['SQLALCHEMY_DATABASE_URI']
+        fields = list(APPLICATION_FIELDS)
+        with seeded.app_context():
+            rows = db.session.execute(db.select(*APPLICATION_FIELDS.values()).limit(1000)).all()
+
+        # Ruta anterior: diccionarios por fila y jsonify con el proveedor por defecto de Flask
+        with seeded.test_request_context():
+            legacy = DefaultJSONProvider(seeded)
+            results = {'rows': args.rows, 'page_ms': {
+                'flask_default': best_of(lambda: legacy.response([dict(zip(fields, row)) for row in rows]), args.repeat)
+            }, 'request_ms': {}, 'export_ms': {}}
+
+        for provider in PROVIDERS:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': database_uri,
+                'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+                'RESPONSE_CACHE_ENABLED': False,
+                'LOG_LEVEL': 'WARNING',
+                'JSON_PROVIDER': provider
+            })
+            client = app.test_client()
+            with app.test_request_context():
+                results['page_ms'][provider] = best_of(lambda: app.json.response(serialize_rows(fields, rows)), args.repeat)
+            results['request_ms'][provider] = best_of(
+                lambda: client.get('/solicitudes?limit=1000').get_data(), args.repeat)
+            results['export_ms'][provider] = best_of(
+                lambda: client.get('/solicitudes/export').get_data(), max(1, args.repeat // 5))
+            with app.app_context():
+                db.engine.dispose()
+
+        for measure in ('page_ms', 'request_ms', 'export_ms'):
+            results[measure]['speedup'] = round(results[measure]['stdlib'] / results[measure]['orjson'], 2)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+    Compara los modos de servicio de gunicorn.conf.py (sync y gthread)
+    bajo la misma carga concurrente: una mezcla de lecturas paginadas de
+    GET /solicitudes y altas con POST /solicitud contra una base SQLite en disco.
+
+        python -m benchmarks.bench_serving --clients 32 --duration 10
+"""
+import argparse
+import itertools
+import shutil
+from app import db
+from .common import gunicorn_server, make_app, report, run_load, sample_application, seed_database
+
+MODES = ['sync', 'gthread']
+
+
+def request_mix(write_ratio, first_identity):
+    """
+        Genera las peticiones de la carga: una de cada ``1 / write_ratio`` es un alta.
+    """
+    identities = itertools.count(first_identity)
+    write_every = max(1, round(1 / write_ratio)) if write_ratio else None
+
+    def make_request(client, sequence):
+        if write_every and sequence % write_every == 0:
+            return 'POST', '/solicitud', sample_application(next(identities))
+        # ``page`` hace única cada URL para medir el servidor y no la caché de respuestas
+        return 'GET', f'/solicitudes?limit=50&orden=-created_at&estatus=pendiente&page={client}-{sequence}', None
+    return make_request
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    args = parser.parse_args()
+
+    results = {'rows': args.rows, 'clients': args.clients, 'duration': args.duration,
+               'workers': args.workers, 'threads': args.threads, 'write_ratio': args.write_ratio}
+    for number, mode in enumerate(args.modes):
+        app, tmpdir = make_app()
+        try:
+            seed_database(app, args.rows)
+            with app.app_context():
+                db.engine.dispose()
+            env = {
+                'SERVER_MODE': mode,
+                'DATABASE_URL': app.config['SQLALCHEMY_DATABASE_URI'],
+                'WEB_CONCURRENCY': str(args.workers),
+                'WEB_THREADS': str(args.threads)
+            }
+            with gunicorn_server(env) as base_url:
+                # Identificaciones nuevas por modo para que las altas no choquen con los datos sembrados
+                first_identity = args.rows + (number + 1) * 10 ** 7
+                results[mode] = run_load(base_url, request_mix(args.write_ratio, first_identity),
+                                         concurrency=args.clients, duration=args.duration)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+    Arranque de la aplicación y de los workers de gunicorn.
+
+    En un proceso nuevo se mide el tiempo de importar el paquete ``app`` y de
+    crear la aplicación con y sin preparar el esquema (DB_SETUP_ON_STARTUP).
+    Con gunicorn se comparan tres arranques sobre la misma base de datos:
+
+        per_worker_setup   sin preload, cada worker crea las tablas y migra (comportamiento anterior)
+        lazy_workers       sin preload, el esquema se prepara una vez en el maestro
+        preload            la aplicación se crea en el maestro y los workers la heredan
+
+    Para cada uno se informa el tiempo de cada worker desde el fork hasta que
+    acepta peticiones, el tiempo hasta la primera respuesta y hasta que todos
+    los workers están listos.
+
+        python -m benchmarks.bench_startup --workers 4 --repeat 5
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from .common import gunicorn_server, make_app, report, seed_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'per_worker_setup': {'PRELOAD_APP': 'false', 'DB_SETUP_ON_STARTUP': 'true'},
+    'lazy_workers': {'PRELOAD_APP': 'false', 'DB_SETUP_ON_STARTUP': 'false'},
+    'preload': {'PRELOAD_APP': 'true', 'DB_SETUP_ON_STARTUP': 'false'}
+}
+
+# Configuración de gunicorn que añade a gunicorn.conf.py el registro de los tiempos de cada worker
+TIMING_CONFIG = '''
+import time
+exec(compile(open({config!r}).read(), {config!r}, 'exec'))
+
+_post_fork = post_fork
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.time()
+    _post_fork(server, worker)
+
+
+def post_worker_init(worker):
+    with open({output!r}, 'a') as timings:
+        timings.write(f'{{worker.forked_at}} {{time.time()}}\\n')
+'''
+
+IMPORT_SCRIPT = '''
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+print(imported - start, time.perf_counter() - imported)
+'''
+
+
+def measure_import(env, repeat):
+    """
+        Mediana del tiempo de importación y de create_app en procesos nuevos.
+    """
+    imports, creates = [], []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], cwd=ROOT, env={**os.environ, **env},
+                                capture_output=True, text=True, check=True).stdout.split()
+        imports.append(float(output[0]) * 1000)
+        creates.append(float(output[1]) * 1000)
+    return {'import_ms': round(statistics.median(imports), 1), 'create_app_ms': round(statistics.median(creates), 1)}
+
+def measure_boot(env, workers, tmpdir):
+    """
+        Arranca gunicorn y mide los tiempos de arranque de cada worker.
+    """
+    output = os.path.join(tmpdir, 'workers.txt')
+    config = os.path.join(tmpdir, 'gunicorn_timing.conf.py')
+    with open(config, 'w') as config_file:
+        config_file.write(TIMING_CONFIG.format(config=os.path.join(ROOT, 'gunicorn.conf.py'), output=output))
+    if os.path.exists(output):
+        os.remove(output)
+
+    launched_at = time.time()
+    with gunicorn_server({**env, 'WEB_CONCURRENCY': str(workers)}, config=config, ready_path='/estadisticas'):
+        first_response = time.time() - launched_at
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            with open(output) as timings:
+                lines = timings.read().splitlines()
+            if len(lines) >= workers:
+                break
+            time.sleep(0.05)
+
+    timings = [tuple(map(float, line.split())) for line in lines]
+    ready = [(initialized - forked) * 1000 for forked, initialized in timings]
+    return {
+        'worker_ready_ms': {'mean': round(statistics.mean(ready), 1), 'max': round(max(ready), 1)},
+        'first_response_ms': round(first_response * 1000, 1),
+        'all_workers_ready_ms': round((max(initialized for _, initialized in timings) - launched_at) * 1000, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app, tmpdir = make_app()
+    try:
+        seed_database(app, args.rows)
+        env = {'DATABASE_URL': app.config['SQLALCHEMY_DATABASE_URI'], 'LOG_LEVEL': 'WARNING'}
+        results = {'workers': args.workers, 'rows': args.rows, 'process': {
+            'setup_on_startup': measure_import({**env, 'DB_SETUP_ON_STARTUP': 'true'}, args.repeat),
+            'no_setup': measure_import({**env, 'DB_SETUP_ON_STARTUP': 'false'}, args.repeat)
+        }, 'gunicorn': {}}
+        for name, scenario in SCENARIOS.items():
+            runs = [measure_boot({**env, **scenario}, args.workers, tmpdir) for _ in range(args.repeat)]
+            # Se informa la ejecución con la mediana del tiempo hasta que todos los workers están listos
+            runs.sort(key=lambda run: run['all_workers_ready_ms'])
+            results['gunicorn'][name] = runs[len(runs) // 2]
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    report(results)
+
+
+if __name__ == '__main__':
+    main()
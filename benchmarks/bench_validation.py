@@ -0,0 +1,56 @@
+"""
+    Compara el costo de validar una solicitud con jsonschema.validate (el
+    esquema se verifica y el validador se construye en cada llamada) contra el
+    validador compilado una sola vez de app.validators.
+
+    jsonschema.validate tarda milisegundos por llamada, por lo que se mide con
+    menos iteraciones (``--baseline-iterations``) que los validadores compilados.
+
+        python -m benchmarks.bench_validation --iterations 20000 --baseline-iterations 200
+"""
+import argparse
+import timeit
+from jsonschema import validate, ValidationError
+from app.schemas import solicitud_schema
+from app.validators import solicitud_validator
+from .common import sample_application, report
+
+
+def per_call(instance):
+    try:
+        validate(instance=instance, schema=solicitud_schema)
+    except ValidationError:
+        pass
+
+def compiled(instance):
+    try:
+        solicitud_validator.validate(instance)
+    except ValidationError:
+        pass
+
+def compiled_without_fast_path(instance):
+    solicitud_validator.validator.is_valid(instance)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--baseline-iterations', type=int, default=200,
+                        help='Iteraciones de jsonschema.validate, mucho más lento que los validadores compilados.')
+    args = parser.parse_args()
+
+    cases = {
+        'valid': sample_application(1),
+        'invalid': {**sample_application(1), 'edad': 150}
+    }
+    results = {'iterations': args.iterations, 'baseline_iterations': args.baseline_iterations}
+    for case, instance in cases.items():
+        for name, function, iterations in [('jsonschema_validate', per_call, args.baseline_iterations),
+                                           ('compiled_jsonschema', compiled_without_fast_path, args.iterations),
+                                           ('compiled_fast_path', compiled, args.iterations)]:
+            seconds = timeit.timeit(lambda: function(instance), number=iterations)
+            results[f'{case}_{name}_us'] = round(seconds / iterations * 1e6, 2)
+        results[f'{case}_speedup'] = round(results[f'{case}_jsonschema_validate_us'] / results[f'{case}_compiled_fast_path_us'], 1)
+    report(results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+    Utilidades compartidas por los benchmarks.
+
+    Los benchmarks se ejecutan desde la raíz del proyecto como módulos, por ejemplo:
+
+        python -m benchmarks.bench_bulk_intake --records 10000
+"""
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from flask import current_app
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Application, Grimorio
+from app.stats import reconcile_statistics
+
+AFFINITIES = ["Oscuridad", "Luz", "Fuego", "Agua", "Viento", "Tierra"]
+
+
+def make_app(database_uri=None):
+    """
+        Crea una aplicación sobre una base de datos SQLite temporal en disco.
+        :param database_uri: URI de la base de datos; por defecto un archivo temporal
+        :return: Tupla (app, ruta del directorio temporal o None)
+    """
+    tmpdir = None
+    if database_uri is None:
+        tmpdir = tempfile.mkdtemp(prefix='academia-bench-')
+        database_uri = 'sqlite:///' + os.path.join(tmpdir, 'bench.db')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # El registro de acceso se mezclaría con el JSON de resultados en la salida estándar
+        'LOG_LEVEL': 'WARNING'
+    })
+    return app, tmpdir
+
+def sample_application(i):
+    """
+        Genera los datos de una solicitud válida y única.
+        :param i: Número de la solicitud
+        :return: Diccionario con el formato de POST /solicitud
+    """
+    return {
+        "nombre": "Noelle",
+        "apellido": "Silva",
+        "identificacion": f"B{i:09d}",
+        "edad": 15 + i % 10,
+        "afinidad_magica": AFFINITIES[i % len(AFFINITIES)]
+    }
+
+@contextmanager
+def timer(results, name):
+    """
+        Mide el tiempo del bloque y lo guarda en ``results[name]`` en segundos.
+    """
+    start = time.perf_counter()
+    yield
+    results[name] = time.perf_counter() - start
+
+def report(results):
+    """
+        Imprime los resultados del benchmark como JSON.
+    """
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+def seed_database(app, applications, grimorios=0, batch_size=10000):
+    """
+        Inserta solicitudes (y Grimorios para las primeras) con inserciones en bloque.
+        :param app: Aplicación sobre la base de datos a poblar
+        :param applications: Número de solicitudes
+        :param grimorios: Número de solicitudes aprobadas con Grimorio
+    """
+    with app.app_context():
+        for start in range(0, applications, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, applications)):
+                record = sample_application(i)
+                rows.append({'name': record['nombre'], 'lastname': record['apellido'],
+                             'identity': record['identificacion'], 'age': record['edad'],
+                             'magical_affinity': record['afinidad_magica'],
+                             'status': 'aprobada' if i < grimorios else 'Pending'})
+            db.session.execute(db.insert(Application), rows)
+        for start in range(0, min(grimorios, applications), batch_size):
+            end = min(start + batch_size, grimorios, applications)
+            clover_types = draw_clover_types(end - start)
+            db.session.execute(db.insert(Grimorio), [
+                {'clover_type': clover_type, 'rarity': clover_type, 'assignment': sample_application(i)['identificacion']}
+                for i, clover_type in zip(range(start, end), clover_types)
+            ])
+        db.session.commit()
+        with db.engine.begin() as connection:
+            reconcile_statistics(connection)
+
+def draw_clover_types(k):
+    """
+        Sortea ``k`` tipos de trébol con el sorteador de la aplicación, sin descontar stock.
+    """
+    return current_app.extensions['grimorio_sampler'].draw(k)
+
+@contextmanager
+def count_queries(engine):
+    """
+        Cuenta las sentencias SQL que ejecuta el engine dentro del bloque.
+        :return: Lista cuyo único elemento es el número de sentencias, actualizado al salir
+    """
+    counter = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def free_port():
+    """
+        Devuelve un puerto TCP libre en localhost.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def gunicorn_server(env, timeout=30, config='gunicorn.conf.py', ready_path='/apidocs/swagger.json'):
+    """
+        Arranca gunicorn y espera a que acepte conexiones.
+        :param env: Variables de entorno adicionales (SERVER_MODE, DATABASE_URL, ...)
+        :param config: Archivo de configuración de gunicorn
+        :param ready_path: Ruta que debe responder para considerar arrancado el servidor
+        :return: URL base del servidor
+    """
+    port = free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', config], cwd=root,
+                               env={**os.environ, **env, 'PORT': str(port)},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # gunicorn abre el puerto antes de que arranquen los workers: se espera a una respuesta completa
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+                connection.request('GET', ready_path)
+                connection.getresponse().read()
+                connection.close()
+                break
+            except (OSError, http.client.HTTPException):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('El servidor no arrancó')
+                time.sleep(0.1)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        process.terminate()
+        process.wait(timeout=timeout)
+
+def percentile(values, fraction):
+    """
+        Percentil por el método del rango más cercano.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_load(base_url, make_request, concurrency=16, duration=10.0):
+    """
+        Ejecuta peticiones desde ``concurrency`` clientes durante ``duration`` segundos.
+
+        Cada cliente mantiene su propia conexión HTTP/1.1 (keep-alive).
+        :param base_url: URL base del servidor
+        :param make_request: Función (número de cliente, número de petición) -> (método, ruta, cuerpo o None[, cabeceras])
+        :return: Diccionario con peticiones, errores, peticiones por segundo y latencias en ms
+    """
+    target = urlsplit(base_url)
+    latencies = []
+    status_codes = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(number):
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+        local_latencies = []
+        local_codes = {}
+        sequence = 0
+        while time.monotonic() < deadline:
+            method, path, body, *extra = make_request(number, sequence)
+            sequence += 1
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            if extra:
+                headers.update(extra[0])
+            payload = json.dumps(body) if body is not None else None
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                code = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+                code = 'error'
+            local_latencies.append((time.perf_counter() - start) * 1000)
+            local_codes[code] = local_codes.get(code, 0) + 1
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for code, count in local_codes.items():
+                status_codes[code] = status_codes.get(code, 0) + count
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    return {
+        'requests': len(latencies),
+        'status_codes': {str(code): count for code, count in sorted(status_codes.items(), key=str)},
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 2) if latencies else None,
+            'p50': round(percentile(latencies, 0.50), 2) if latencies else None,
+            'p95': round(percentile(latencies, 0.95), 2) if latencies else None,
+            'p99': round(percentile(latencies, 0.99), 2) if latencies else None
+        }
+    }
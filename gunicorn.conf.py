@@ -0,0 +1,66 @@
+"""
+    Configuración de gunicorn. El modo de servicio se elige al arrancar con
+    la variable de entorno SERVER_MODE:
+
+        sync     Un proceso atiende una petición a la vez (por defecto).
+        gthread  Cada worker atiende WEB_THREADS peticiones en hilos, por lo que
+                 una consulta lenta ocupa un hilo y no el worker completo. Es
+                 el modo recomendado para atender peticiones concurrentes.
+
+        gunicorn -c gunicorn.conf.py
+
+    Con PRELOAD_APP (activo por defecto) la aplicación se crea una sola vez en
+    el proceso maestro y los workers la heredan con el fork. El esquema de la
+    base de datos se prepara una sola vez al arrancar, no en cada worker.
+"""
+import os
+import tempfile
+
+SERVER_MODES = {
+    'sync': {'worker_class': 'sync', 'wsgi_app': 'run:app'},
+    'gthread': {'worker_class': 'gthread', 'wsgi_app': 'run:app'},
+}
+
+server_mode = os.environ.get('SERVER_MODE', 'sync')
+if server_mode not in SERVER_MODES:
+    raise RuntimeError(f'SERVER_MODE debe ser uno de: {", ".join(SERVER_MODES)}')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+worker_class = SERVER_MODES[server_mode]['worker_class']
+wsgi_app = SERVER_MODES[server_mode]['wsgi_app']
+if server_mode == 'gthread':
+    threads = int(os.environ.get('WEB_THREADS', '8'))
+preload_app = os.environ.get('PRELOAD_APP', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Los workers no crean tablas ni aplican migraciones: lo hace on_starting una sola vez
+os.environ.setdefault('DB_SETUP_ON_STARTUP', 'false')
+
+# El control de admisión se comparte entre los workers a través de un archivo SQLite local
+os.environ.setdefault('ADMISSION_STORE', os.path.join(tempfile.gettempdir(), f"academia-admission-{os.environ.get('PORT', '8000')}.db"))
+
+
+def on_starting(server):
+    # Con preload_app la aplicación ya está creada en el maestro y se reutiliza
+    from app import create_app, load_config
+    from app.migrations import setup_database
+
+    if server.cfg.preload_app:
+        from run import app
+        with app.app_context():
+            setup_database()
+    else:
+        create_app({**load_config(), 'DB_SETUP_ON_STARTUP': True})
+
+
+def post_fork(server, worker):
+    # Número del worker, combinado con GRIMORIO_SEED para que cada uno tenga su secuencia de sorteos
+    os.environ['WORKER_ID'] = str(worker.age)
+    if server.cfg.preload_app:
+        from run import app
+        from app import after_fork
+        after_fork(app)
+    else:
+        # El hilo de registros del maestro no sobrevive al fork
+        from app.logs import restart_listener
+        restart_listener()
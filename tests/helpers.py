@@ -0,0 +1,63 @@
+"""
+    Utilidades compartidas por las pruebas.
+"""
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import TEST_CONFIG, create_app, db
+
+
+def solicitud(i):
+    """
+        Datos de una solicitud válida con la identificación ``ID{i}``.
+    """
+    return {"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 15, "afinidad_magica": "Agua"}
+
+@contextmanager
+def count_statements(engine):
+    """
+        Registra las sentencias SQL que ejecuta el engine dentro del bloque.
+        :return: Lista de sentencias, que se completa mientras dura el bloque
+    """
+    statements = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+
+class TempDatabaseTestCase(unittest.TestCase):
+    """
+        Pruebas sobre una base de datos SQLite en disco, para las que usan
+        varios hilos, procesos o aplicaciones: la base en memoria de las demás
+        pruebas comparte una sola conexión.
+
+        ``self.config`` es la configuración de pruebas sobre ese archivo. Si
+        ``app_config`` no es None, setUp crea además ``self.app`` con esa
+        configuración adicional y entra en su contexto.
+    """
+    app_config = {}
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.config = {**TEST_CONFIG, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(self.tmpdir.name, 'test.db')}
+        self.app = None
+        if self.app_config is not None:
+            self.app = create_app({**self.config, **self.app_config})
+            self.ctx = self.app.app_context()
+            self.ctx.push()
+
+    def tearDown(self):
+        if self.app is not None:
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+            self.ctx.pop()
+        self.tmpdir.cleanup()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from app import TEST_CONFIG, create_app, db
+from app.admission import MemoryAdmissionStore, SQLiteAdmissionStore, parse_rules, parse_rate, ADMISSION_SLOT_TIMEOUT
+
+def make_app(**config):
+    return create_app({**TEST_CONFIG, 'ADMISSION_CONTROL': True, **config})
+
+class AdmissionStoreTests:
+
+    def test_token_bucket(self):
+        # 2 peticiones por segundo con ráfaga de 3
+        self.assertEqual([self.store.take('a', 2.0, 3, 100.0)[0] for _ in range(4)], [True, True, True, False])
+        self.assertTrue(self.store.take('b', 2.0, 3, 100.0)[0])
+        self.assertFalse(self.store.take('a', 2.0, 3, 100.2)[0])
+        self.assertTrue(self.store.take('a', 2.0, 3, 100.5)[0])
+
+    def test_concurrency_slots(self):
+        tokens = [self.store.acquire('GET /solicitudes', 2, 100.0) for _ in range(3)]
+        self.assertIsNone(tokens[2])
+        self.store.release('GET /solicitudes', tokens[0])
+        self.assertIsNotNone(self.store.acquire('GET /solicitudes', 2, 100.0))
+        self.assertIsNotNone(self.store.acquire('GET /asignaciones', 2, 100.0))
+
+class TestMemoryAdmissionStore(AdmissionStoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryAdmissionStore()
+
+class TestSQLiteAdmissionStore(AdmissionStoreTests, unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'admission.db')
+        self.store = SQLiteAdmissionStore(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_state_is_shared_between_processes(self):
+        # Otra instancia sobre el mismo archivo equivale a otro worker
+        other = SQLiteAdmissionStore(self.path)
+        self.assertTrue(self.store.take('a', 1.0, 1, 100.0)[0])
+        self.assertFalse(other.take('a', 1.0, 1, 100.0)[0])
+
+        self.assertIsNotNone(self.store.acquire('GET /solicitudes', 1, 100.0))
+        self.assertIsNone(other.acquire('GET /solicitudes', 1, 100.0))
+        # El lugar de un worker detenido se libera al vencer
+        self.assertIsNotNone(other.acquire('GET /solicitudes', 1, 100.0 + ADMISSION_SLOT_TIMEOUT))
+
+class TestAdmissionControl(unittest.TestCase):
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_rate_limit_per_client(self):
+        self.app = make_app(ADMISSION_RATE_LIMITS='GET /estadisticas=0.5/2', ADMISSION_CLIENT_HEADER='X-Client-ID')
+        client = self.app.test_client()
+        codes = [client.get('/estadisticas', headers={'X-Client-ID': 'a'}).status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        response = client.get('/estadisticas', headers={'X-Client-ID': 'a'})
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertEqual(client.get('/estadisticas', headers={'X-Client-ID': 'b'}).status_code, 200)
+
+        # Las escrituras no tienen límite
+        for i in range(5):
+            self.assertEqual(client.post('/solicitud', json={
+                "nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 15, "afinidad_magica": "Agua"
+            }).status_code, 201)
+
+    def test_spoofed_forwarded_for_shares_the_bucket(self):
+        # El cliente elige los primeros valores de X-Forwarded-For; el proxy de confianza añade el último
+        self.app = make_app(ADMISSION_RATE_LIMITS='GET /estadisticas=0.5/2', TRUSTED_PROXIES=1)
+        client = self.app.test_client()
+        codes = [client.get('/estadisticas', headers={'X-Forwarded-For': f'10.0.0.{i}, 203.0.113.7'}).status_code
+                 for i in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+        self.assertEqual(client.get('/estadisticas', headers={'X-Forwarded-For': '203.0.113.8'}).status_code, 200)
+
+    def test_spoofed_client_header_shares_the_bucket(self):
+        self.app = make_app(ADMISSION_RATE_LIMITS='GET /estadisticas=0.5/2', ADMISSION_CLIENT_HEADER='X-Client-ID')
+        client = self.app.test_client()
+        codes = [client.get('/estadisticas', headers={'X-Client-ID': f'falso{i}, a'}).status_code for i in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
+
+    def test_concurrency_limit(self):
+        self.app = make_app(ADMISSION_CONCURRENCY='GET /solicitudes=1')
+        client = self.app.test_client()
+        store = self.app.extensions['admission']
+        self.assertEqual(client.get('/solicitudes').status_code, 200)
+        # Al terminar la petición su lugar queda libre
+        self.assertEqual(client.get('/solicitudes').status_code, 200)
+
+        token = store.acquire('GET /solicitudes', 1, 0)
+        response = client.get('/solicitudes')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        store.release('GET /solicitudes', token)
+        self.assertEqual(client.get('/solicitudes').status_code, 200)
+
+    def test_invalid_rules(self):
+        self.app = make_app()
+        self.assertEqual(parse_rules('GET /solicitudes=5/20, post /solicitud=1', parse_rate),
+                         {'GET /solicitudes': (5.0, 20), 'POST /solicitud': (1.0, 1)})
+        with self.assertRaises(ValueError):
+            parse_rules('/solicitudes=5', parse_rate)
+        with self.assertRaises(ValueError):
+            parse_rules('GET /solicitudes=0/5', parse_rate)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import random
+from collections import Counter
+from app import TEST_CONFIG, create_app, db
+from app.allocation import CLOVERS, AliasSampler, parse_quotas
+from app.models import Application, Grimorio
+from app.stats import get_statistics
+from helpers import solicitud
+
+class TestAliasSampler(unittest.TestCase):
+
+    def test_distribution_matches_weights(self):
+        sampler = AliasSampler(CLOVERS, random.Random(7))
+        draws = 200000
+        counts = Counter(sampler.draw(draws))
+        total = sum(CLOVERS.values())
+        for clover_type, weight in CLOVERS.items():
+            self.assertAlmostEqual(counts[clover_type] / draws, weight / total, delta=0.005)
+
+    def test_seeded_draws_are_reproducible(self):
+        self.assertEqual(AliasSampler(CLOVERS, random.Random('audit:1')).draw(100),
+                         AliasSampler(CLOVERS, random.Random('audit:1')).draw(100))
+        self.assertNotEqual(AliasSampler(CLOVERS, random.Random('audit:1')).draw(100),
+                            AliasSampler(CLOVERS, random.Random('audit:2')).draw(100))
+
+    def test_without(self):
+        sampler = AliasSampler({'a': 1, 'b': 1}).without({'a'})
+        self.assertEqual(set(sampler.draw(50)), {'b'})
+        self.assertIsNone(sampler.without({'b'}))
+
+    def test_invalid_quotas(self):
+        self.assertEqual(parse_quotas('Trébol cinco hojas=2, Trébol cuatro hojas=0'),
+                         {'Trébol cinco hojas': 2, 'Trébol cuatro hojas': 0})
+        with self.assertRaises(ValueError):
+            parse_quotas('Trébol seis hojas=1')
+        with self.assertRaises(ValueError):
+            parse_quotas({'Trébol una hoja': -1})
+
+class TestGrimorioQuotas(unittest.TestCase):
+
+    def setUp(self):
+        # Sólo quedan 3 Grimorios de cinco hojas y 2 de cuatro; los demás tipos están agotados
+        self.app = create_app({**TEST_CONFIG, 'GRIMORIO_SEED': 'pruebas', 'GRIMORIO_QUOTAS': {
+            'Trébol una hoja': 0, 'Trébol dos hojas': 0, 'Trébol tres hojas': 0,
+            'Trébol cuatro hojas': 2, 'Trébol cinco hojas': 3
+        }})
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        for i in range(8):
+            self.client.post('/solicitud', json=solicitud(i))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def clover_counts(self):
+        return Counter(db.session.execute(db.select(Grimorio.clover_type)).scalars())
+
+    def test_single_approvals_respect_quotas(self):
+        codes = [self.client.patch(f'/solicitud/{id}/estatus', json={'estatus': 'aprobada'}).status_code
+                 for id in range(1, 8)]
+        self.assertEqual(codes, [200] * 5 + [409] * 2)
+        self.assertEqual(self.clover_counts(), {'Trébol cuatro hojas': 2, 'Trébol cinco hojas': 3})
+        # La solicitud rechazada por falta de stock sigue pendiente
+        self.assertEqual(db.session.get(Application, 6).status, 'Pending')
+        self.assertEqual(get_statistics()['grimorios']['trebol']['Trébol cinco hojas'], 3)
+
+        # Eliminar una solicitud aprobada devuelve su Grimorio al stock
+        self.assertEqual(self.client.delete('/solicitud/1').status_code, 200)
+        self.assertEqual(self.client.patch('/solicitud/6/estatus', json={'estatus': 'aprobada'}).status_code, 200)
+        self.assertEqual(sum(self.clover_counts().values()), 5)
+
+    def test_batch_approval_is_all_or_nothing(self):
+        response = self.client.patch('/solicitudes/estatus', json={'estatus': 'aprobada', 'ids': list(range(1, 7))})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(sum(self.clover_counts().values()), 0)
+
+        response = self.client.patch('/solicitudes/estatus', json={'estatus': 'aprobada', 'ids': list(range(1, 6))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.clover_counts(), {'Trébol cuatro hojas': 2, 'Trébol cinco hojas': 3})
+
+class TestSeededAllocation(unittest.TestCase):
+
+    def approved_types(self, seed):
+        app = create_app({**TEST_CONFIG, 'GRIMORIO_SEED': seed})
+        with app.app_context():
+            client = app.test_client()
+            for i in range(20):
+                client.post('/solicitud', json=solicitud(i))
+            response = client.patch('/solicitudes/estatus', json={'estatus': 'aprobada', 'ids': list(range(1, 21))})
+            types = [grimorio['Grimorio'] for grimorio in response.get_json()['Grimorios']]
+            db.session.remove()
+            db.drop_all()
+        return types
+
+    def test_same_seed_same_grimorios(self):
+        self.assertEqual(self.approved_types('auditoria'), self.approved_types('auditoria'))
+
+if __name__ == '__main__':
+    unittest.main()
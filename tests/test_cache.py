@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+from app import create_app, db
+from sqlalchemy.exc import OperationalError
+from app.cache import MemoryCache, ResponseCache
+from app.models import Application
+from helpers import TempDatabaseTestCase, solicitud
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_ttl(self):
+        cache = MemoryCache()
+        with mock.patch('app.cache.time.monotonic', return_value=100):
+            cache.set('a', 1, ttl=10)
+            self.assertEqual(cache.get('a'), 1)
+        with mock.patch('app.cache.time.monotonic', return_value=110):
+            self.assertIsNone(cache.get('a'))
+
+    def test_lru_eviction(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', 1, ttl=60)
+        cache.set('b', 2, ttl=60)
+        # Leer 'a' la convierte en la más reciente, por lo que se desaloja 'b'
+        cache.get('a')
+        cache.set('c', 3, ttl=60)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_invalidate_changes_keys(self):
+        cache = ResponseCache(MemoryCache(max_entries=1))
+        key = cache.key('/solicitudes?')
+        cache.set(key, 'respuesta')
+        self.assertEqual(cache.get(cache.key('/solicitudes?')), 'respuesta')
+
+        cache.invalidate()
+        self.assertNotEqual(cache.key('/solicitudes?'), key)
+        self.assertIsNone(cache.get(cache.key('/solicitudes?')))
+
+class TestSharedInvalidation(TempDatabaseTestCase):
+    """
+        Dos aplicaciones sobre la misma base de datos, como dos workers de gunicorn.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.other_app = create_app(self.config)
+
+    def tearDown(self):
+        with self.other_app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        super().tearDown()
+
+    def test_write_in_one_app_invalidates_the_other(self):
+        client = self.app.test_client()
+        other_client = self.other_app.test_client()
+        self.assertEqual(client.get('/solicitudes').get_json(), [])
+        response = other_client.get('/solicitudes')
+        self.assertEqual(response.get_json(), [])
+        etag = response.headers['ETag']
+
+        client.post('/solicitud', json={"nombre": "Noelle", "apellido": "Silva", "identificacion": "ID123456",
+                                        "edad": 25, "afinidad_magica": "Luz"})
+
+        self.assertEqual(len(client.get('/solicitudes').get_json()), 1)
+        response = other_client.get('/solicitudes', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 1)
+
+    def test_failed_invalidation_keeps_the_committed_write(self):
+        locked = OperationalError('UPDATE cache_counter', {}, Exception('database is locked'))
+        with mock.patch('app.cache.DatabaseCounters.incr', side_effect=locked):
+            response = self.app.test_client().post('/solicitud', json=solicitud(1))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(db.session.execute(db.select(db.func.count()).select_from(Application)).scalar(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from app import db
+from app.models import Application, Grimorio
+from helpers import TempDatabaseTestCase
+
+class TestConcurrentWrites(TempDatabaseTestCase):
+
+    def test_concurrent_creates_same_identity(self):
+        solicitud_data = {
+            "nombre": "Noelle",
+            "apellido": "Silva",
+            "identificacion": "ID123456",
+            "edad": 25,
+            "afinidad_magica": "Luz"
+        }
+
+        def create(_):
+            return self.app.test_client().post('/solicitud', json=solicitud_data).status_code
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            status_codes = list(executor.map(create, range(200)))
+
+        self.assertEqual(status_codes.count(201), 1)
+        self.assertEqual(status_codes.count(409), 199)
+        self.assertEqual(db.session.query(Application).count(), 1)
+        self.assertEqual(self.app.test_client().get('/estadisticas').get_json()['solicitudes']['total'], 1)
+
+    def test_concurrent_approvals_same_application(self):
+        self.app.test_client().post('/solicitud', json={
+            "nombre": "Noelle",
+            "apellido": "Silva",
+            "identificacion": "ID123456",
+            "edad": 25,
+            "afinidad_magica": "Luz"
+        })
+        solicitud = db.session.query(Application).filter_by(identity="ID123456").first()
+
+        def approve(_):
+            return self.app.test_client().patch(f'/solicitud/{solicitud.id}/estatus', json={"estatus": "aprobada"}).status_code
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            status_codes = list(executor.map(approve, range(100)))
+
+        self.assertEqual(status_codes.count(200), 1)
+        self.assertEqual(status_codes.count(400), 99)
+        self.assertEqual(db.session.query(Grimorio).count(), 1)
+        statistics = self.app.test_client().get('/estadisticas').get_json()
+        self.assertEqual(statistics['solicitudes']['estatus'], {'Pending': 0, 'aprobada': 1})
+        self.assertEqual(statistics['grimorios']['total'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import random
+import tempfile
+import unittest
+from sqlalchemy import inspect, text
+from app import TEST_CONFIG, create_app, create_app_test, load_config, after_fork, db
+from app.config import database_config
+from app.migrations import setup_database
+from helpers import TempDatabaseTestCase, solicitud
+
+class TestDatabaseConfig(unittest.TestCase):
+
+    def test_defaults(self):
+        config = database_config({})
+        self.assertEqual(config['SQLALCHEMY_DATABASE_URI'], 'sqlite:///database.db')
+        self.assertEqual(config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'], 5)
+        self.assertTrue(config['SQLALCHEMY_ENGINE_OPTIONS']['pool_pre_ping'])
+        self.assertNotIn('connect_args', config['SQLALCHEMY_ENGINE_OPTIONS'])
+
+    def test_postgresql_from_environment(self):
+        config = database_config({
+            'DATABASE_URL': 'postgres://user:secret@db:5432/academia',
+            'DB_POOL_SIZE': '20',
+            'DB_MAX_OVERFLOW': '0',
+            'DB_POOL_RECYCLE': '300',
+            'DB_POOL_PRE_PING': 'false',
+            'DB_STATEMENT_TIMEOUT': '2000'
+        })
+        options = config['SQLALCHEMY_ENGINE_OPTIONS']
+        self.assertEqual(config['SQLALCHEMY_DATABASE_URI'], 'postgresql://user:secret@db:5432/academia')
+        self.assertEqual((options['pool_size'], options['max_overflow'], options['pool_recycle']), (20, 0, 300))
+        self.assertFalse(options['pool_pre_ping'])
+        self.assertEqual(options['connect_args'], {'options': '-c statement_timeout=2000'})
+
+    def test_sqlite_in_memory_has_no_pool_size(self):
+        options = database_config({'DATABASE_URL': 'sqlite:///:memory:'})['SQLALCHEMY_ENGINE_OPTIONS']
+        self.assertNotIn('pool_size', options)
+
+    def test_sqlite_pragmas(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            app = create_app({**TEST_CONFIG, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmpdir, 'test.db'),
+                              'SQLITE_BUSY_TIMEOUT': 2500})
+            with app.app_context():
+                with db.engine.connect() as connection:
+                    self.assertEqual(connection.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+                    self.assertEqual(connection.execute(text('PRAGMA synchronous')).scalar(), 1)
+                    self.assertEqual(connection.execute(text('PRAGMA busy_timeout')).scalar(), 2500)
+                db.engine.dispose()
+
+class TestAppFactory(TempDatabaseTestCase):
+    # Cada prueba crea sus propias aplicaciones sobre el archivo de self.config
+    app_config = None
+
+    def test_config_from_environment(self):
+        config = load_config({'DATABASE_URL': 'sqlite:///:memory:', 'DB_SETUP_ON_STARTUP': 'false',
+                              'ASYNC_APPROVALS': 'true', 'IDEMPOTENCY_TTL': '60'})
+        self.assertFalse(config['DB_SETUP_ON_STARTUP'])
+        self.assertTrue(config['ASYNC_APPROVALS'])
+        self.assertEqual(config['IDEMPOTENCY_TTL'], 60)
+        self.assertTrue(load_config({})['DB_SETUP_ON_STARTUP'])
+        self.assertEqual(create_app_test().config['SQLALCHEMY_DATABASE_URI'], 'sqlite:///:memory:')
+
+    def test_startup_without_schema_setup(self):
+        app = create_app({**self.config, 'DB_SETUP_ON_STARTUP': False})
+        with app.app_context():
+            self.assertEqual(inspect(db.engine).get_table_names(), [])
+            setup_database()
+            self.assertIn('application', inspect(db.engine).get_table_names())
+            # Una vez preparado el esquema no queda ninguna migración pendiente
+            self.assertEqual(setup_database(), [])
+            db.engine.dispose()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'Requiere os.fork')
+    def test_after_fork(self):
+        app = create_app({**self.config, 'GRIMORIO_SEED': 'semilla'})
+        client = app.test_client()
+        self.assertEqual(client.post('/solicitud', json=solicitud(1)).status_code, 201)
+
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                os.environ['WORKER_ID'] = '3'
+                after_fork(app)
+                # El worker usa conexiones propias y la secuencia de sorteos de su WORKER_ID
+                with app.app_context():
+                    reseeded = app.extensions['grimorio_sampler'].random.getstate() == random.Random('semilla:3').getstate()
+                    approved = client.patch('/solicitud/1/estatus', json={'estatus': 'aprobada'}).status_code == 200
+                status = 0 if approved and reseeded else 1
+            finally:
+                os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        with app.app_context():
+            self.assertEqual(client.get('/estadisticas').get_json()['grimorios']['total'], 1)
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
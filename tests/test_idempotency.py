@@ -0,0 +1,108 @@
+import datetime
+import unittest
+from unittest import mock
+from flask import jsonify
+from app import TEST_CONFIG, create_app, create_app_test, db
+from app.idempotency import purge_idempotency_keys, request_fingerprint
+from app.models import Application, Grimorio, IdempotencyKey
+
+solicitud = {"nombre": "Noelle", "apellido": "Silva", "identificacion": "ID1", "edad": 15, "afinidad_magica": "Agua"}
+
+class TestIdempotencyKeys(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app_test()
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def post(self, key, data=solicitud):
+        return self.client.post('/solicitud', json=data, headers={'Idempotency-Key': key})
+
+    def test_retry_replays_without_running_the_controller(self):
+        first = self.post('clave-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first.headers)
+
+        with mock.patch('app.routes.create_application') as create_application:
+            retry = self.post('clave-1')
+            create_application.assert_not_called()
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.get_json(), first.get_json())
+        self.assertEqual(db.session.query(Application).count(), 1)
+
+        # Sin clave el reintento sigue siendo un duplicado
+        self.assertEqual(self.client.post('/solicitud', json=solicitud).status_code, 409)
+
+    def test_approval_retry_returns_the_same_grimorio(self):
+        self.client.post('/solicitud', json=solicitud)
+        responses = [self.client.patch('/solicitud/1/estatus', json={'estatus': 'aprobada'},
+                                       headers={'Idempotency-Key': 'aprobar-1'}) for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [200] * 3)
+        self.assertEqual(len({response.get_json()['Grimorio'] for response in responses}), 1)
+        self.assertEqual(db.session.query(Grimorio).count(), 1)
+
+    def test_key_reused_with_another_request(self):
+        self.post('clave-1')
+        response = self.post('clave-1', dict(solicitud, identificacion='ID2'))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(db.session.query(Application).count(), 1)
+        self.assertEqual(self.post('x' * 256).status_code, 400)
+
+    def test_server_errors_release_the_key(self):
+        with mock.patch('app.routes.create_application', return_value=(jsonify({'message': 'Internal server error'}), 500)):
+            self.assertEqual(self.post('clave-1').status_code, 500)
+        self.assertEqual(self.post('clave-1').status_code, 201)
+
+    def test_request_in_progress(self):
+        db.session.add(IdempotencyKey(key='clave-1', fingerprint='otra', created_at=datetime.datetime.now()))
+        db.session.commit()
+        self.assertEqual(self.post('clave-1').status_code, 422)
+
+        db.session.query(IdempotencyKey).update({'fingerprint': self.fingerprint()})
+        db.session.commit()
+        response = self.post('clave-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+        # Una reserva abandonada deja de bloquear la clave
+        db.session.query(IdempotencyKey).update({'created_at': datetime.datetime.now() - datetime.timedelta(minutes=5)})
+        db.session.commit()
+        self.assertEqual(self.post('clave-1').status_code, 201)
+
+    def fingerprint(self):
+        with self.app.test_request_context('/solicitud', method='POST', json=solicitud):
+            return request_fingerprint()
+
+    def test_expired_keys_are_purged(self):
+        self.post('clave-1')
+        self.app.config['IDEMPOTENCY_TTL'] = 0
+        # La respuesta vencida ya no se repite: la petición se vuelve a ejecutar
+        self.assertEqual(self.post('clave-1').status_code, 409)
+
+        self.app.config['IDEMPOTENCY_TTL'] = 3600
+        self.app.config['IDEMPOTENCY_MAX_KEYS'] = 2
+        for i in range(2, 6):
+            self.post(f'clave-{i}', dict(solicitud, identificacion=f'ID{i}'))
+        self.assertEqual(purge_idempotency_keys(), 3)
+        self.assertEqual(db.session.execute(db.select(IdempotencyKey.key).order_by(IdempotencyKey.key)).scalars().all(),
+                         ['clave-4', 'clave-5'])
+
+        # Sin máximo sólo se purgan las vencidas
+        self.app.config['IDEMPOTENCY_MAX_KEYS'] = 0
+        self.post('clave-6', dict(solicitud, identificacion='ID6'))
+        self.assertEqual(purge_idempotency_keys(), 0)
+        self.assertEqual(db.session.query(IdempotencyKey).count(), 3)
+
+    def test_negative_max_keys_is_rejected(self):
+        with self.assertRaises(ValueError):
+            create_app({**TEST_CONFIG, 'IDEMPOTENCY_MAX_KEYS': -1})
+
+if __name__ == '__main__':
+    unittest.main()
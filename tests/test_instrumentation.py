@@ -0,0 +1,103 @@
+import unittest
+import os
+import tempfile
+from sqlalchemy.exc import OperationalError
+from app import TEST_CONFIG, create_app, create_app_test, db
+from app.instrumentation import Metrics, RequestTimings
+
+solicitud_data = {
+    "nombre": "Noelle",
+    "apellido": "Silva",
+    "identificacion": "ID123456",
+    "edad": 25,
+    "afinidad_magica": "Luz"
+}
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app_test()
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def server_timing(self, response):
+        entries = {}
+        for entry in response.headers['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_server_timing_header(self):
+        response = self.client.post('/solicitud', json=solicitud_data)
+        self.assertEqual(response.status_code, 201)
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'app', 'db', 'serialize'})
+        self.assertGreater(float(timing['app']['dur']), 0)
+        # INSERT de la solicitud, actualización de los contadores y de la generación de la caché
+        self.assertEqual(timing['db']['desc'], '"3 queries"')
+
+        response = self.client.get('/apidocs/swagger.json')
+        self.assertEqual(self.server_timing(response)['db']['desc'], '"0 queries"')
+
+    def test_metrics_endpoint(self):
+        self.client.post('/solicitud', json=solicitud_data)
+        self.client.get('/solicitud/1')
+        self.client.delete('/solicitud/1')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        body = response.get_data(as_text=True)
+        self.assertIn('http_requests_total{method="POST",route="/solicitud",status="201"} 1', body)
+        self.assertIn('http_requests_total{method="GET",route="unmatched",status="405"} 1', body)
+        self.assertIn('http_requests_total{method="DELETE",route="/solicitud/<int:id>",status="200"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{method="POST",route="/solicitud"} 1', body)
+        self.assertIn('db_queries_total{method="POST",route="/solicitud"} 3', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics.observe('GET', '/solicitudes', 200, RequestTimings(), 0.05)
+        metrics.observe('GET', '/solicitudes', 200, RequestTimings(), 0.5)
+        metrics.observe('GET', '/solicitudes', 200, RequestTimings(), 5)
+        body = metrics.render()
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/solicitudes",le="0.1"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/solicitudes",le="1"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/solicitudes",le="+Inf"} 3', body)
+
+    def test_failed_statements_leave_no_state_on_the_connection(self):
+        with db.engine.connect() as connection:
+            for _ in range(3):
+                with self.assertRaises(OperationalError):
+                    connection.exec_driver_sql('SELECT * FROM tabla_inexistente')
+            self.assertEqual(connection.exec_driver_sql('SELECT 1').scalar(), 1)
+            self.assertNotIn('query_start', connection.info)
+
+        # Las peticiones posteriores cuentan sus sentencias con normalidad
+        response = self.client.post('/solicitud', json=solicitud_data)
+        self.assertEqual(self.server_timing(response)['db']['desc'], '"3 queries"')
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_slow_requests_are_profiled(self):
+        profile_dir = tempfile.mkdtemp()
+        app = create_app({**TEST_CONFIG, 'PROFILE_THRESHOLD_MS': '0', 'PROFILE_DIR': profile_dir})
+        with app.app_context():
+            response = app.test_client().post('/solicitud', json=solicitud_data)
+            self.assertEqual(response.status_code, 201)
+            db.session.remove()
+            db.drop_all()
+
+        profiles = os.listdir(profile_dir)
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].endswith('.prof'))
+        self.assertIn('POST-solicitud', profiles[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+from app import db
+from app.jobs import run_worker, claim_jobs, requeue_stale
+from app.models import Application, Grimorio, Job
+from helpers import TempDatabaseTestCase, solicitud
+
+class TestStatusJobs(TempDatabaseTestCase):
+    """
+        El worker procesa los lotes en otros hilos, por lo que se usa una base
+        de datos SQLite en disco como en las pruebas de concurrencia.
+    """
+    app_config = {'ASYNC_APPROVALS': True}
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.app.test_client()
+        for i in range(1, 6):
+            self.client.post('/solicitud', json=solicitud(i))
+
+    def enqueue(self, id, estatus='aprobada'):
+        response = self.client.patch(f'/solicitud/{id}/estatus', json={'estatus': estatus})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.headers['Location'], f'/jobs/{response.get_json()["job_id"]}')
+        return response.get_json()['job_id']
+
+    def test_approval_is_enqueued_and_processed(self):
+        job_id = self.enqueue(1)
+        # Hasta que corre el worker la solicitud sigue pendiente
+        self.assertEqual(self.client.get(f'/jobs/{job_id}').get_json()['status'], 'pending')
+        self.assertEqual(db.session.get(Application, 1).status, 'Pending')
+
+        self.assertEqual(run_worker(self.app, threads=2, drain=True), 1)
+
+        job = self.client.get(f'/jobs/{job_id}').get_json()
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['status_code'], 200)
+        self.assertEqual(job['result']['message'], 'Solicitud Aprobada')
+        grimorio = db.session.execute(db.select(Grimorio).filter_by(assignment='ID1')).scalar_one()
+        self.assertEqual(job['result']['Grimorio'], grimorio.clover_type)
+        self.assertEqual(self.client.get('/estadisticas').get_json()['grimorios']['total'], 1)
+
+    def test_batches_match_synchronous_results(self):
+        jobs = [self.enqueue(1), self.enqueue(2), self.enqueue(1), self.enqueue(3, 'rechazada'),
+                self.enqueue(2, 'rechazada'), self.enqueue(4)]
+        self.client.delete('/solicitud/4')
+
+        self.assertEqual(run_worker(self.app, threads=1, batch_size=10, drain=True), len(jobs))
+
+        results = [self.client.get(f'/jobs/{id}').get_json() for id in jobs]
+        self.assertEqual([job['status_code'] for job in results], [200, 200, 400, 200, 400, 404])
+        self.assertEqual(results[2]['result']['message'], 'Esta solicitud ya fue aprobada.')
+        self.assertEqual(results[3]['result']['message'], 'Solicitud Rechazada')
+        self.assertEqual(db.session.execute(db.select(db.func.count()).select_from(Grimorio)).scalar(), 2)
+        self.assertEqual(db.session.get(Application, 3).status, 'rechazada')
+
+    def test_invalid_status_and_unknown_job(self):
+        self.assertEqual(self.client.patch('/solicitud/1/estatus', json={'estatus': 'x'}).status_code, 400)
+        self.assertEqual(self.client.patch('/solicitud/99/estatus', json={'estatus': 'aprobada'}).status_code, 404)
+        self.assertEqual(self.client.get('/jobs/99').status_code, 404)
+
+    def test_claims_are_exclusive_and_stale_jobs_requeued(self):
+        for id in range(1, 6):
+            self.enqueue(id)
+        first = claim_jobs(3)
+        second = claim_jobs(3)
+        self.assertEqual([job.id for job in first], [1, 2, 3])
+        self.assertEqual([job.id for job in second], [4, 5])
+        self.assertEqual(claim_jobs(3), [])
+
+        self.assertEqual(requeue_stale(older_than=0), 5)
+        self.assertEqual(run_worker(self.app, threads=4, batch_size=2, drain=True), 5)
+        statuses = db.session.execute(db.select(Job.status)).scalars().all()
+        self.assertEqual(statuses, ['done'] * 5)
+
+    def test_failed_batch_marks_its_jobs_failed(self):
+        jobs = [self.enqueue(1), self.enqueue(2)]
+        with mock.patch('app.jobs.process_batch', side_effect=RuntimeError('database is locked')):
+            self.assertEqual(run_worker(self.app, threads=1, batch_size=10, drain=True), 0)
+
+        for id in jobs:
+            job = self.client.get(f'/jobs/{id}').get_json()
+            self.assertEqual(job['status'], 'failed')
+            self.assertEqual(job['status_code'], 500)
+            self.assertEqual(job['result'], {'message': 'Internal server error'})
+        self.assertEqual(claim_jobs(10), [])
+
+if __name__ == '__main__':
+    unittest.main()
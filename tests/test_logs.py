@@ -0,0 +1,77 @@
+import unittest
+import io
+import json
+import logging
+from contextlib import redirect_stdout
+from unittest import mock
+from app import TEST_CONFIG, create_app, db
+from app.logs import parse_levels, stop_listener
+
+class TestStructuredLogging(unittest.TestCase):
+
+    def setUp(self):
+        # Escribe los registros pendientes de otras pruebas antes de capturar la salida
+        stop_listener()
+        self.output = io.StringIO()
+        self.redirect = redirect_stdout(self.output)
+        self.redirect.__enter__()
+        self.app = create_app({**TEST_CONFIG, 'LOG_LEVEL': 'INFO'})
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+        stop_listener()
+        self.redirect.__exit__(None, None, None)
+
+    def records(self):
+        # Detener el listener vacía la cola; la siguiente aplicación lo vuelve a arrancar
+        stop_listener()
+        return [json.loads(line) for line in self.output.getvalue().splitlines()]
+
+    def test_access_log(self):
+        response = self.client.get('/estadisticas', headers={'X-Request-ID': 'abc123'})
+        self.assertEqual(response.headers['X-Request-ID'], 'abc123')
+        response = self.client.delete('/solicitud/99')
+        request_id = response.headers['X-Request-ID']
+
+        records = [record for record in self.records() if record['logger'] == 'app.access']
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['request_id'], 'abc123')
+        self.assertEqual(records[0]['route'], '/estadisticas')
+        self.assertEqual(records[0]['method'], 'GET')
+        self.assertEqual(records[0]['status'], 200)
+        self.assertEqual(records[0]['outcome'], 'success')
+        self.assertGreaterEqual(records[0]['latency_ms'], 0)
+        self.assertEqual(records[1]['request_id'], request_id)
+        self.assertEqual(records[1]['route'], '/solicitud/<int:id>')
+        self.assertEqual(records[1]['outcome'], 'client_error')
+
+    def test_errors_are_logged_with_request_id(self):
+        with mock.patch('app.controllers.get_statistics', side_effect=RuntimeError('sin conexión')):
+            response = self.client.get('/estadisticas')
+        self.assertEqual(response.status_code, 500)
+
+        records = self.records()
+        error = next(record for record in records if record['logger'] == 'app.controllers')
+        self.assertEqual(error['level'], 'ERROR')
+        self.assertEqual(error['request_id'], response.headers['X-Request-ID'])
+        self.assertIn('RuntimeError: sin conexión', error['exception'])
+        access = next(record for record in records if record['logger'] == 'app.access')
+        self.assertEqual(access['outcome'], 'server_error')
+
+    def test_module_levels(self):
+        self.assertEqual(parse_levels('app.access=warning, sqlalchemy.engine=INFO'),
+                         {'app.access': 'WARNING', 'sqlalchemy.engine': 'INFO'})
+        logging.getLogger('app.access').setLevel('WARNING')
+        try:
+            self.client.get('/estadisticas')
+            self.assertFalse([record for record in self.records() if record['logger'] == 'app.access'])
+        finally:
+            logging.getLogger('app.access').setLevel(logging.NOTSET)
+
+if __name__ == '__main__':
+    unittest.main()
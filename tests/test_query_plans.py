@@ -0,0 +1,128 @@
+import re
+import unittest
+from sqlalchemy import event, inspect, text
+from app import create_app_test, db
+from app.models import Application
+from app.migrations import MIGRATIONS, schema_migrations, upgrade
+
+class TestQueryPlans(unittest.TestCase):
+    """
+        Ejecuta EXPLAIN QUERY PLAN sobre las consultas que emiten los
+        controladores y falla si alguna recorre una tabla completa.
+
+        Un ``SCAN`` sin índice sólo se admite cuando la consulta tiene LIMIT y
+        recorre la tabla en el orden de su clave primaria (sin B-tree
+        temporal), tenga o no filtros de rango: entonces se detiene tras LIMIT
+        filas. Un B-tree temporal sólo se admite tras una búsqueda por
+        igualdad; tras un recorrido o una búsqueda por rango ordenaría todas
+        las filas del rango antes de aplicar LIMIT.
+        Las exportaciones recorren las tablas completas a propósito y no se
+        incluyen.
+    """
+
+    def setUp(self):
+        self.app = create_app_test()
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.statements = []
+        self.capturing = True
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def capture(self, conn, cursor, statement, parameters, context, executemany):
+        if self.capturing and not executemany and not statement.lstrip().upper().startswith(('INSERT', 'EXPLAIN')):
+            self.statements.append((statement, parameters))
+
+    def run_scenario(self):
+        solicitudes = [
+            {"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 15 + i,
+             "afinidad_magica": "Fuego" if i % 2 else "Agua"}
+            for i in range(10)
+        ]
+        self.client.post('/solicitud', json={**solicitudes[0], "identificacion": "ID100"})
+        self.client.post('/solicitudes/bulk', json=solicitudes)
+        # La consulta de la propia prueba no se analiza
+        self.capturing = False
+        ids = [application.id for application in db.session.query(Application).order_by(Application.id)]
+        self.capturing = True
+
+        self.client.put(f'/solicitud/{ids[1]}', json={**solicitudes[1], "edad": 30})
+        self.client.patch(f'/solicitud/{ids[2]}/estatus', json={"estatus": "aprobada"})
+        self.client.patch('/solicitudes/estatus', json={"estatus": "aprobada", "ids": ids[3:5]})
+        self.client.patch('/solicitudes/estatus', json={"estatus": "rechazada", "filtro": {"afinidad_magica": "Fuego"}})
+        self.client.delete(f'/solicitud/{ids[2]}')
+
+        # Primera y segunda página de cada combinación de filtro y orden
+        filters = ['', 'estatus=pendiente', 'afinidad_magica=Agua', 'edad_min=15', 'edad_max=20',
+                   'desde=2020-01-01', 'hasta=2100-01-01', 'hasta=2100-01-01T00:00:00',
+                   'estatus=pendiente&afinidad_magica=Agua&edad_min=15&edad_max=20']
+        sorts = ['id', '-id', 'created_at', '-created_at', 'edad', '-edad']
+        searches = ['/solicitudes?' + '&'.join(filter(None, [query, f'orden={sort}'])) for query in filters for sort in sorts]
+        for path in ['/solicitudes', '/asignaciones', *searches]:
+            separator = '&' if '?' in path else '?'
+            response = self.client.get(f'{path}{separator}limit=1')
+            self.assertEqual(response.status_code, 200, path)
+            self.assertIn('X-Next-Cursor', response.headers, path)
+            response = self.client.get(f"{path}{separator}limit=1&cursor={response.headers['X-Next-Cursor']}")
+            self.assertEqual(response.status_code, 200, path)
+
+    def test_no_full_table_scans(self):
+        event.listen(db.engine, 'before_cursor_execute', self.capture)
+        try:
+            self.run_scenario()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', self.capture)
+
+        checked = 0
+        with db.engine.connect() as connection:
+            for statement, parameters in self.statements:
+                if not re.match(r'\s*(SELECT|UPDATE|DELETE)', statement, re.IGNORECASE):
+                    continue
+                plan = [row[3] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+                limited = re.search(r'\bLIMIT\b', statement, re.IGNORECASE)
+                temp_sort = any('TEMP B-TREE' in step for step in plan)
+                for step in plan:
+                    with self.subTest(statement=statement, step=step):
+                        full_scan = step.startswith('SCAN') and 'INDEX' not in step
+                        self.assertFalse(full_scan and (not limited or temp_sort), f'{step} en: {statement}')
+                        range_walk = step.startswith('SCAN') or (step.startswith('SEARCH') and re.search(r'[<>]', step))
+                        self.assertFalse(temp_sort and range_walk, f'{step} seguido de un B-tree temporal en: {statement}')
+                checked += 1
+        self.assertGreater(checked, 100)
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app_test()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_upgrade_adds_indexes_to_existing_tables(self):
+        # Simula una base de datos creada antes de declarar los índices
+        for index in ['ix_grimorio_assignment', 'ix_application_status', 'ix_application_magical_affinity',
+                      'ix_application_created_at', 'ix_application_age_id']:
+            db.session.execute(text(f'DROP INDEX {index}'))
+        db.session.execute(schema_migrations.delete())
+        db.session.commit()
+
+        self.assertEqual(upgrade(), [version for version, _ in MIGRATIONS])
+        indexes = {index['name'] for table in ['application', 'grimorio'] for index in inspect(db.engine).get_indexes(table)}
+        self.assertIn('ix_grimorio_assignment', indexes)
+        self.assertIn('ix_application_created_at', indexes)
+        self.assertIn('ix_application_age_id', indexes)
+
+        # Una segunda ejecución no aplica nada
+        self.assertEqual(upgrade(), [])
+
+if __name__ == '__main__':
+    unittest.main()
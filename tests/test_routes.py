@@ -1,8 +1,16 @@
 import unittest
+import base64
+import gzip
 import json
+import datetime
+import os
+import tempfile
+from unittest import mock
+from flask_swagger import swagger as flask_swagger
 from app import create_app_test, db
-from app.models import Application 
+from app.models import Application, Grimorio
 from app.utils import assign_grimorio
+from helpers import count_statements
 
 class TestSolicitudEndpoint(unittest.TestCase):
     
@@ -196,6 +204,398 @@ class TestSolicitudEndpoint(unittest.TestCase):
         self.assertEqual(data[0]['Nombre'], "Noelle")
         self.assertEqual(data[0]['Grimorio'], assigned_type)
 
+    def test_get_all_asignaciones_query_count(self):
+        def create_assignments(start, count):
+            for i in range(start, start + count):
+                self.client.post('/solicitud', json={
+                    "nombre": "Noelle",
+                    "apellido": "Silva",
+                    "identificacion": f"ID{i}",
+                    "edad": 25,
+                    "afinidad_magica": "Luz"
+                })
+                solicitud = db.session.query(Application).filter_by(identity=f"ID{i}").first()
+                assign_grimorio(solicitud)
+
+        # Cuenta las sentencias SQL emitidas durante cada petición
+        def count_request_statements():
+            with count_statements(db.engine) as statements:
+                response = self.client.get('/asignaciones')
+            self.assertEqual(response.status_code, 200)
+            return len(statements), len(response.get_json())
+
+        create_assignments(0, 2)
+        few_statements, few_rows = count_request_statements()
+
+        create_assignments(2, 20)
+        many_statements, many_rows = count_request_statements()
+
+        # El número de sentencias no depende del número de asignaciones
+        self.assertEqual(few_rows, 2)
+        self.assertEqual(many_rows, 22)
+        self.assertEqual(few_statements, many_statements)
+        # Lectura de la generación de la caché y consulta del listado
+        self.assertEqual(many_statements, 2)
+
+    def test_get_solicitudes_paginated(self):
+        # Crea cinco solicitudes
+        for i in range(5):
+            self.client.post('/solicitud', json={
+                "nombre": "Noelle",
+                "apellido": "Silva",
+                "identificacion": f"ID{i}",
+                "edad": 20 + i,
+                "afinidad_magica": "Agua"
+            })
+
+        # Recorre todas las páginas siguiendo el cursor
+        identities = []
+        response = self.client.get('/solicitudes?limit=2')
+        pages = 1
+        while 'X-Next-Cursor' in response.headers:
+            self.assertEqual(len(response.get_json()), 2)
+            identities.extend(item['identity'] for item in response.get_json())
+            response = self.client.get(f"/solicitudes?limit=2&cursor={response.headers['X-Next-Cursor']}")
+            pages += 1
+        identities.extend(item['identity'] for item in response.get_json())
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(identities, [f"ID{i}" for i in range(5)])
+
+    def test_get_solicitudes_fields(self):
+        self.client.post('/solicitud', json={
+            "nombre": "Noelle",
+            "apellido": "Silva",
+            "identificacion": "ID123456",
+            "edad": 25,
+            "afinidad_magica": "Luz"
+        })
+
+        response = self.client.get('/solicitudes?fields=identity,status')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), [{'identity': 'ID123456', 'status': 'Pending'}])
+
+        response = self.client.get('/asignaciones?fields=Nombre,Poder')
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_solicitudes_invalid_page_args(self):
+        self.assertEqual(self.client.get('/solicitudes?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/solicitudes?limit=5000').status_code, 400)
+        self.assertEqual(self.client.get('/solicitudes?limit=abc').status_code, 400)
+        self.assertEqual(self.client.get('/solicitudes?cursor=%%%').status_code, 400)
+
+    def test_invalid_cursor_values(self):
+        def encode(values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+        # Cursores bien codificados cuyos valores no son ids enteros
+        for values in [[{"a": 1}], [None], ["x"], [1.5], [True], [1, 2]]:
+            with self.subTest(values=values):
+                self.assertEqual(self.client.get(f'/asignaciones?cursor={encode(values)}').status_code, 400)
+                self.assertEqual(self.client.get(f'/solicitudes?cursor={encode(values)}').status_code, 400)
+        self.assertEqual(self.client.get(f'/asignaciones?cursor={encode([1])}').status_code, 200)
+
+    def test_export_solicitudes_ndjson(self):
+        for i in range(5):
+            self.client.post('/solicitud', json={
+                "nombre": "Noelle",
+                "apellido": "Silva",
+                "identificacion": f"ID{i}",
+                "edad": 25,
+                "afinidad_magica": "Luz"
+            })
+
+        # Lotes pequeños para que la exportación recorra varias particiones
+        with mock.patch('app.export.EXPORT_BATCH_SIZE', 2):
+            response = self.client.get('/solicitudes/export?fields=identity')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.mimetype, 'application/x-ndjson')
+            lines = response.data.decode('utf-8').splitlines()
+            self.assertEqual([json.loads(line) for line in lines], [{'identity': f"ID{i}"} for i in range(5)])
+
+            # Con Accept-Encoding: gzip el flujo llega comprimido
+            response = self.client.get('/solicitudes/export', headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+            lines = gzip.decompress(response.data).decode('utf-8').splitlines()
+            self.assertEqual(len(lines), 5)
+            self.assertEqual(json.loads(lines[0])['name'], "Noelle")
+
+    def test_export_asignaciones_ndjson(self):
+        self.client.post('/solicitud', json={
+            "nombre": "Noelle",
+            "apellido": "Silva",
+            "identificacion": "ID123456",
+            "edad": 25,
+            "afinidad_magica": "Luz"
+        })
+        solicitud = db.session.query(Application).filter_by(identity="ID123456").first()
+        assigned_type = assign_grimorio(solicitud)
+
+        response = self.client.get('/asignaciones/export')
+        self.assertEqual(response.status_code, 200)
+        lines = response.data.decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['Grimorio'], assigned_type)
+
+    def test_create_solicitudes_bulk(self):
+        # Una solicitud ya registrada
+        self.client.post('/solicitud', json={
+            "nombre": "Noelle",
+            "apellido": "Silva",
+            "identificacion": "ID0",
+            "edad": 25,
+            "afinidad_magica": "Luz"
+        })
+
+        solicitudes = [
+            {"nombre": "Astolfo", "apellido": "Klaus", "identificacion": "ID1", "edad": 30, "afinidad_magica": "Oscuridad"},
+            {"nombre": "Noelle", "apellido": "Silva", "identificacion": "ID0", "edad": 25, "afinidad_magica": "Luz"},
+            {"nombre": "Yuno", "apellido": "Grinberryall", "identificacion": "ID2", "edad": 150, "afinidad_magica": "Viento"},
+            {"nombre": "Asta", "apellido": "Staria", "identificacion": "ID1", "edad": 15, "afinidad_magica": "Tierra"},
+            {"nombre": "Mimosa", "apellido": "Vermillion", "identificacion": "ID3", "edad": 15, "afinidad_magica": "Tierra"}
+        ]
+        response = self.client.post('/solicitudes/bulk', json=solicitudes)
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['created'], 2)
+        self.assertEqual([result['status'] for result in data['results']], [201, 409, 400, 409, 201])
+
+        identities = {application.identity for application in db.session.query(Application).all()}
+        self.assertEqual(identities, {"ID0", "ID1", "ID3"})
+
+    def test_create_solicitudes_bulk_ndjson(self):
+        body = '\n'.join([
+            json.dumps({"nombre": "Noelle", "apellido": "Silva", "identificacion": "ID0", "edad": 25, "afinidad_magica": "Luz"}),
+            '{no es json',
+            json.dumps({"nombre": "Astolfo", "apellido": "Klaus", "identificacion": "ID1", "edad": 30, "afinidad_magica": "Oscuridad"}),
+            ''
+        ])
+        response = self.client.post('/solicitudes/bulk', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.get_json()['results']], [201, 400, 201])
+
+        response = self.client.post('/solicitudes/bulk', json={"nombre": "Noelle"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_update_solicitudes_status_by_ids(self):
+        solicitudes = [
+            {"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 25, "afinidad_magica": "Luz"}
+            for i in range(4)
+        ]
+        self.client.post('/solicitudes/bulk', json=solicitudes)
+        ids = [application.id for application in db.session.query(Application).order_by(Application.id)]
+
+        # Una solicitud ya rechazada se omite
+        self.client.patch(f'/solicitud/{ids[0]}/estatus', json={"estatus": "rechazada"})
+
+        response = self.client.patch('/solicitudes/estatus', json={"estatus": "aprobada", "ids": ids + [999]})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['updated'], 3)
+        self.assertEqual(data['skipped'], [ids[0], 999])
+        self.assertEqual([grimorio['id'] for grimorio in data['Grimorios']], ids[1:])
+
+        db.session.expire_all()
+        self.assertEqual(db.session.query(Grimorio).count(), 3)
+        statuses = [application.status for application in db.session.query(Application).order_by(Application.id)]
+        self.assertEqual(statuses, ['rechazada', 'aprobada', 'aprobada', 'aprobada'])
+
+    def test_update_solicitudes_status_by_filter(self):
+        solicitudes = [
+            {"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 25,
+             "afinidad_magica": "Fuego" if i % 2 else "Agua"}
+            for i in range(6)
+        ]
+        self.client.post('/solicitudes/bulk', json=solicitudes)
+
+        response = self.client.patch('/solicitudes/estatus', json={"estatus": "rechazada", "filtro": {"afinidad_magica": "Fuego"}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['updated'], 3)
+
+        db.session.expire_all()
+        self.assertEqual(db.session.query(Grimorio).count(), 0)
+        self.assertEqual(db.session.query(Application).filter_by(status='rechazada').count(), 3)
+        self.assertEqual(db.session.query(Application).filter_by(status='Pending', magical_affinity='Agua').count(), 3)
+
+        # Datos inválidos
+        self.assertEqual(self.client.patch('/solicitudes/estatus', json={"estatus": "aprobada"}).status_code, 400)
+        self.assertEqual(self.client.patch('/solicitudes/estatus', json={"estatus": "otra", "ids": [1]}).status_code, 400)
+        self.assertEqual(self.client.patch('/solicitudes/estatus', json={"estatus": "aprobada", "filtro": {"edad": 3}}).status_code, 400)
+        self.assertEqual(self.client.patch('/solicitudes/estatus', json={"estatus": "aprobada", "ids": [True]}).status_code, 400)
+
+    def test_swagger_spec_cached(self):
+        with mock.patch('flask_swagger.swagger', wraps=flask_swagger) as swagger:
+            response = self.client.get('/apidocs/swagger.json')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('/solicitud', response.get_json()['paths'])
+            self.assertIn('max-age', response.headers['Cache-Control'])
+            etag = response.headers['ETag']
+
+            # La revalidación con el mismo ETag devuelve 304 sin regenerar la especificación
+            response = self.client.get('/apidocs/swagger.json', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(self.client.get('/apidocs/swagger.json').status_code, 200)
+            self.assertEqual(swagger.call_count, 1)
+
+    def test_swagger_spec_static_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'swagger.json')
+            result = self.app.test_cli_runner().invoke(args=['swagger-export', path])
+            self.assertEqual(result.exit_code, 0)
+
+            # Una aplicación configurada con el archivo no procesa los docstrings
+            app = create_app_test()
+            app.config['SWAGGER_SPEC_PATH'] = path
+            with mock.patch('flask_swagger.swagger') as swagger:
+                response = app.test_client().get('/apidocs/swagger.json')
+                self.assertEqual(swagger.call_count, 0)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('/solicitud', response.get_json()['paths'])
+
+    def test_get_solicitudes_cached(self):
+        solicitud_data = {
+            "nombre": "Noelle",
+            "apellido": "Silva",
+            "identificacion": "ID123456",
+            "edad": 25,
+            "afinidad_magica": "Luz"
+        }
+        self.client.post('/solicitud', json=solicitud_data)
+
+        with count_statements(db.engine) as statements:
+            response = self.client.get('/solicitudes')
+            etag = response.headers['ETag']
+            # Lectura de la generación de la caché y consulta del listado
+            self.assertEqual(len(statements), 2)
+
+            # La segunda lectura y la revalidación se responden desde la caché:
+            # sólo se vuelve a leer la generación
+            self.assertEqual(self.client.get('/solicitudes').get_json(), response.get_json())
+            response = self.client.get('/solicitudes', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(len(statements), 4)
+
+        # Una escritura invalida el listado
+        self.client.post('/solicitud', json={**solicitud_data, "identificacion": "ID789012"})
+        response = self.client.get('/solicitudes', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 2)
+
+    def test_search_solicitudes(self):
+        solicitudes = [
+            {"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 12 + i,
+             "afinidad_magica": "Fuego" if i % 2 else "Agua"}
+            for i in range(12)
+        ]
+        self.client.post('/solicitudes/bulk', json=solicitudes)
+        # Fechas de creación conocidas: un día por solicitud
+        for i, application in enumerate(db.session.query(Application).order_by(Application.id)):
+            application.created_at = datetime.datetime(2024, 1, 1 + i, 12, 0)
+        db.session.commit()
+        self.client.patch('/solicitudes/estatus', json={"estatus": "rechazada", "ids": [4]})
+
+        # Pendientes con afinidad Fuego, de 15 a 20 años, más recientes primero, recorriendo páginas
+        query = 'estatus=pendiente&afinidad_magica=Fuego&edad_min=15&edad_max=20&orden=-created_at&limit=2'
+        response = self.client.get(f'/solicitudes?{query}')
+        identities = [item['identity'] for item in response.get_json()]
+        while 'X-Next-Cursor' in response.headers:
+            response = self.client.get(f"/solicitudes?{query}&cursor={response.headers['X-Next-Cursor']}")
+            identities.extend(item['identity'] for item in response.get_json())
+        # ID3 (15 años) está rechazada
+        self.assertEqual(identities, ["ID7", "ID5"])
+
+        response = self.client.get('/solicitudes?desde=2024-01-03&hasta=2024-01-05&fields=identity')
+        self.assertEqual(response.get_json(), [{'identity': f"ID{i}"} for i in range(2, 5)])
+
+        response = self.client.get('/solicitudes?orden=-edad&limit=3&fields=age')
+        self.assertEqual([item['age'] for item in response.get_json()], [23, 22, 21])
+
+    def test_search_solicitudes_invalid(self):
+        for query in ['estatus=otra', 'afinidad_magica=Rayo', 'edad_min=x', 'desde=ayer', 'orden=nombre']:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/solicitudes?{query}').status_code, 400)
+
+        # Un cursor generado con otro orden no es válido
+        self.client.post('/solicitudes/bulk', json=[
+            {"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 20, "afinidad_magica": "Luz"}
+            for i in range(2)
+        ])
+        cursor = self.client.get('/solicitudes?limit=1').headers['X-Next-Cursor']
+        self.assertEqual(self.client.get(f'/solicitudes?orden=-edad&cursor={cursor}').status_code, 400)
+
+    def test_get_estadisticas(self):
+        solicitudes = [
+            {"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}", "edad": 20,
+             "afinidad_magica": "Fuego" if i % 2 else "Agua"}
+            for i in range(6)
+        ]
+        self.client.post('/solicitudes/bulk', json=solicitudes[:4])
+        self.client.post('/solicitud', json=solicitudes[4])
+        self.client.post('/solicitud', json=solicitudes[5])
+        ids = [application.id for application in db.session.query(Application).order_by(Application.id)]
+
+        self.client.put(f'/solicitud/{ids[0]}', json={**solicitudes[0], "afinidad_magica": "Luz"})
+        self.client.patch(f'/solicitud/{ids[1]}/estatus', json={"estatus": "aprobada"})
+        self.client.patch(f'/solicitud/{ids[2]}/estatus', json={"estatus": "rechazada"})
+        self.client.patch('/solicitudes/estatus', json={"estatus": "aprobada", "ids": ids[3:5]})
+        self.client.delete(f'/solicitud/{ids[3]}')
+
+        with count_statements(db.engine) as statements:
+            response = self.client.get('/estadisticas')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(statements), 1)
+
+        data = response.get_json()
+        self.assertEqual(data['solicitudes']['total'], 5)
+        self.assertEqual(data['solicitudes']['estatus'], {'Pending': 2, 'aprobada': 2, 'rechazada': 1})
+        self.assertEqual(data['solicitudes']['afinidad_magica'], {'Agua': 2, 'Fuego': 2, 'Luz': 1})
+        self.assertEqual(data['grimorios']['total'], 2)
+        self.assertEqual(sum(data['grimorios']['trebol'].values()), 2)
+
+        # La reconciliación desde las tablas produce los mismos conteos
+        result = self.app.test_cli_runner().invoke(args=['stats-reconcile'])
+        self.assertEqual(result.exit_code, 0)
+        reconciled = self.client.get('/estadisticas').get_json()
+        self.assertEqual(reconciled['solicitudes'], data['solicitudes'])
+        self.assertEqual(reconciled['grimorios']['total'], data['grimorios']['total'])
+        self.assertEqual({key: count for key, count in reconciled['grimorios']['trebol'].items() if count},
+                         {key: count for key, count in data['grimorios']['trebol'].items() if count})
+
+    def test_update_solicitud_duplicate_identity(self):
+        solicitud_data = {
+            "nombre": "Noelle",
+            "apellido": "Silva",
+            "identificacion": "ID123456",
+            "edad": 25,
+            "afinidad_magica": "Luz"
+        }
+        self.client.post('/solicitud', json=solicitud_data)
+        self.client.post('/solicitud', json={**solicitud_data, "identificacion": "ID789012"})
+        solicitud = db.session.query(Application).filter_by(identity="ID789012").first()
+
+        response = self.client.put(f'/solicitud/{solicitud.id}', json=solicitud_data)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['message'], 'Ya existe una solicitud con esta identificación')
+
+        # La identificación se puede cambiar a una libre
+        response = self.client.put(f'/solicitud/{solicitud.id}', json={**solicitud_data, "identificacion": "ID000001"})
+        self.assertEqual(response.status_code, 200)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Application, solicitud.id).identity, "ID000001")
+
+    def test_listings_do_not_load_orm_instances(self):
+        for i, afinidad in enumerate(["Luz", "Agua"]):
+            self.client.post('/solicitud', json={"nombre": "Noelle", "apellido": "Silva", "identificacion": f"ID{i}",
+                                                 "edad": 15, "afinidad_magica": afinidad})
+        self.client.patch('/solicitud/1/estatus', json={"estatus": "aprobada"})
+        db.session.expunge_all()
+
+        self.assertEqual(len(self.client.get('/solicitudes').get_json()), 2)
+        self.assertEqual(len(self.client.get('/asignaciones').get_json()), 1)
+        self.assertEqual(self.client.get('/solicitudes/export').get_data(as_text=True).count('\n'), 2)
+        # Las lecturas se hacen por Core: ninguna instancia entra en el identity map
+        self.assertEqual(len(db.session.identity_map), 0)
+
 if __name__ == '__main__':
     unittest.main()
 
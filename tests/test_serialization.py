@@ -0,0 +1,77 @@
+import unittest
+import datetime
+import json
+from app import TEST_CONFIG, create_app, db
+from app.serialization import JSONProvider, OrjsonProvider, serialize_rows, orjson
+
+solicitudes = [
+    {"nombre": "Noelle", "apellido": "Silva", "identificacion": "ID1", "edad": 15, "afinidad_magica": "Agua"},
+    {"nombre": "Yuno", "apellido": "Grinberryall", "identificacion": "ID2", "edad": 16, "afinidad_magica": "Viento"},
+    {"nombre": "Asta", "apellido": "Ñañez", "identificacion": "ID3", "edad": 15, "afinidad_magica": "Oscuridad"}
+]
+
+def make_app(provider):
+    return create_app({**TEST_CONFIG, 'JSON_PROVIDER': provider})
+
+@unittest.skipIf(orjson is None, 'orjson no está instalado')
+class TestJSONProviders(unittest.TestCase):
+
+    def listing(self, provider):
+        app = make_app(provider)
+        with app.app_context():
+            client = app.test_client()
+            for solicitud in solicitudes:
+                self.assertEqual(client.post('/solicitud', json=solicitud).status_code, 201)
+            response = client.get('/solicitudes?limit=2&fields=identity,name,lastname')
+            next_response = client.get('/solicitudes?limit=2&cursor=' + response.headers['X-Next-Cursor'])
+            assignments = client.get('/asignaciones')
+            db.session.remove()
+            db.drop_all()
+        return response, next_response, assignments
+
+    def test_providers_return_the_same_listings(self):
+        for stdlib, fast in zip(self.listing('stdlib'), self.listing('orjson')):
+            self.assertEqual(stdlib.status_code, 200)
+            self.assertEqual(json.loads(stdlib.data), json.loads(fast.data))
+            self.assertEqual(stdlib.headers.get('X-Next-Cursor'), fast.headers.get('X-Next-Cursor'))
+
+        response = self.listing('orjson')[0]
+        # Las claves se devuelven en el orden pedido en ``fields``
+        self.assertEqual(list(json.loads(response.data)[0]), ['identity', 'name', 'lastname'])
+
+    def test_provider_selection(self):
+        self.assertIsInstance(make_app('orjson').json.provider, OrjsonProvider)
+        self.assertNotIsInstance(make_app('stdlib').json.provider, OrjsonProvider)
+        with self.assertRaises(ValueError):
+            make_app('ujson')
+
+    def test_same_output_for_special_types(self):
+        app = make_app('stdlib')
+        value = {'fecha': datetime.datetime(2024, 3, 1, 12, 30), 'dia': datetime.date(2024, 3, 1), 1: 'uno'}
+        expected = json.loads(JSONProvider(app).dumps(value))
+        self.assertEqual(json.loads(OrjsonProvider(app).dumps(value)), expected)
+        self.assertEqual(expected['fecha'], 'Fri, 01 Mar 2024 12:30:00 GMT')
+
+    def test_dumps_lines(self):
+        app = make_app('stdlib')
+        objs = [{'a': 1}, {'b': 'ñ'}]
+        for provider in (JSONProvider(app), OrjsonProvider(app)):
+            lines = provider.dumps_lines(objs).decode('utf-8').splitlines()
+            self.assertEqual([json.loads(line) for line in lines], objs)
+
+    def test_invalid_json_body(self):
+        app = make_app('orjson')
+        with app.app_context():
+            response = app.test_client().post('/solicitud', data='{"nombre": ', content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            db.drop_all()
+
+class TestSerializeRows(unittest.TestCase):
+
+    def test_trailing_key_columns_are_ignored(self):
+        rows = [('Noelle', 'Silva', 7), ('Asta', None, 9)]
+        self.assertEqual(serialize_rows(['name', 'lastname'], rows),
+                         [{'name': 'Noelle', 'lastname': 'Silva'}, {'name': 'Asta', 'lastname': None}])
+
+if __name__ == '__main__':
+    unittest.main()
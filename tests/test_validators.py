@@ -0,0 +1,55 @@
+import unittest
+from jsonschema import Draft7Validator
+from app.schemas import solicitud_schema
+from app.validators import CompiledValidator, compile_fast_check, solicitud_validator
+
+VALID = {
+    "nombre": "Noelle",
+    "apellido": "Silva",
+    "identificacion": "ID123456",
+    "edad": 25,
+    "afinidad_magica": "Luz"
+}
+
+class TestCompiledValidator(unittest.TestCase):
+
+    def test_matches_jsonschema(self):
+        # Casos válidos, inválidos y casos límite que sólo jsonschema resuelve
+        instances = [
+            VALID,
+            {**VALID, "edad": 25.0},
+            {**VALID, "edad": True},
+            {**VALID, "edad": 100},
+            {**VALID, "edad": -1},
+            {**VALID, "nombre": ""},
+            {**VALID, "nombre": "N" * 21},
+            {**VALID, "nombre": "Noelle1"},
+            {**VALID, "nombre": "Ñoño"},
+            {**VALID, "identificacion": "ID-1"},
+            {**VALID, "afinidad_magica": "Rayo"},
+            {**VALID, "extra": 1},
+            {key: value for key, value in VALID.items() if key != "edad"},
+            [],
+            None,
+            "Noelle"
+        ]
+        reference = Draft7Validator(solicitud_schema)
+        for instance in instances:
+            with self.subTest(instance=instance):
+                self.assertEqual(solicitud_validator.error_for(instance) is None, reference.is_valid(instance))
+
+    def test_fast_check_is_used(self):
+        self.assertIsNotNone(solicitud_validator.fast_check)
+        self.assertTrue(solicitud_validator.fast_check(VALID))
+        # Un entero escrito como 25.0 lo decide jsonschema
+        self.assertFalse(solicitud_validator.fast_check({**VALID, "edad": 25.0}))
+
+    def test_unsupported_keywords_fall_back(self):
+        schema = {"type": "object", "properties": {"tags": {"type": "array"}}}
+        self.assertIsNone(compile_fast_check(schema))
+        validator = CompiledValidator(schema)
+        self.assertIsNone(validator.error_for({"tags": []}))
+        self.assertIsNotNone(validator.error_for({"tags": 1}))
+
+if __name__ == '__main__':
+    unittest.main()